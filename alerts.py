@@ -0,0 +1,105 @@
+from math import ceil
+
+# ================== ПОРОГИ ЗАПАСОВ ==================
+DEFAULT_MIN_LEVEL = 5       # Минимальный уровень (точка заказа)
+DEFAULT_CRITICAL_LEVEL = 2  # Критический уровень
+HYSTERESIS_RATIO = 0.2      # Запас возврата в норму, доля от порога
+
+LEVEL_OK = 0
+LEVEL_LOW = 1
+LEVEL_CRITICAL = 2
+
+
+def min_level(product):
+    """Минимальный уровень запаса товара"""
+    return product.get('min_level', DEFAULT_MIN_LEVEL)
+
+
+def critical_level(product):
+    """Критический уровень запаса товара"""
+    return product.get('critical_level', DEFAULT_CRITICAL_LEVEL)
+
+
+def recommended_order(product):
+    """Рекомендуемый размер заказа"""
+    if product.get('reorder_qty'):
+        return product['reorder_qty']
+    # Без заданного размера заказа пополняем до двойного минимального уровня
+    return max(2 * min_level(product) - product['quantity'], min_level(product))
+
+
+def is_low_stock(product):
+    """Остаток ниже минимального уровня"""
+    return product['quantity'] < min_level(product)
+
+
+def _raw_level(product):
+    quantity = product['quantity']
+    if quantity < critical_level(product):
+        return LEVEL_CRITICAL
+    if quantity < min_level(product):
+        return LEVEL_LOW
+    return LEVEL_OK
+
+
+def _recovery_level(threshold):
+    """Остаток, при котором тревога снимается (гистерезис)"""
+    return threshold + max(1, ceil(threshold * HYSTERESIS_RATIO))
+
+
+class StockAlertEngine:
+    """Проверка остатков по событиям изменения количества.
+
+    Проверяется только изменившийся товар. Уведомление отправляется при
+    переходе на более тяжелый уровень; снятие тревоги требует подъема
+    остатка выше порога с запасом, поэтому колебания около порога не
+    порождают повторных уведомлений.
+    """
+
+    def __init__(self):
+        self._levels = {}
+
+    def evaluate(self, product):
+        """Возвращает текст уведомления или None"""
+        # Один артикул в разных магазинах - разные позиции
+        key = (product.get('store'), product['sku'])
+        current = self._levels.get(key, LEVEL_OK)
+        raw = _raw_level(product)
+
+        if raw > current:
+            self._levels[key] = raw
+            return self._render(product, raw)
+
+        # Понижение уровня тревоги только после выхода из зоны гистерезиса
+        quantity = product['quantity']
+        if current == LEVEL_CRITICAL and quantity >= _recovery_level(critical_level(product)):
+            current = LEVEL_LOW
+        if current == LEVEL_LOW and quantity >= _recovery_level(min_level(product)):
+            current = LEVEL_OK
+
+        if current == LEVEL_OK:
+            self._levels.pop(key, None)
+        else:
+            self._levels[key] = current
+        return None
+
+    def forget(self, sku, store=None):
+        """Сброс состояния товара"""
+        self._levels.pop((store, sku), None)
+
+    def _render(self, product, level):
+        if level == LEVEL_CRITICAL:
+            header = "🚨 <b>СРОЧНО: критический запас</b>"
+            threshold = f"<b>Критический уровень:</b> {critical_level(product)} шт.\n"
+        else:
+            header = "⚠️ <b>Достигнута точка заказа</b>"
+            threshold = ""
+        return (
+            f"{header}\n\n"
+            f"<b>Товар:</b> {product['name']} ({product['sku']})\n"
+            f"<b>Текущий остаток:</b> {product['quantity']} шт.\n"
+            f"<b>Минимальный уровень:</b> {min_level(product)} шт.\n"
+            f"{threshold}"
+            f"<b>Рекомендуемый заказ:</b> {recommended_order(product)} шт.\n"
+            f"<b>Ответственный:</b> {product.get('manager', 'Не назначен')}"
+        )
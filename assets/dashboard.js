@@ -0,0 +1,58 @@
+// Оформление дашборда в браузере: тип графика, карточки KPI и полосы
+// прогресса строятся из данных dcc.Store без обращения к серверу.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: {
+        chart_type: function (figure, chartType) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            // Переключаются только ряды доходов и расходов, прогноз остается линией
+            var data = figure.data.map(function (trace) {
+                if (trace.meta !== 'series' || chartType !== 'bar') {
+                    return trace;
+                }
+                var bar = Object.assign({}, trace, {type: 'bar', marker: {color: trace.line.color}});
+                delete bar.mode;
+                delete bar.line;
+                return bar;
+            });
+            return Object.assign({}, figure, {data: data});
+        },
+
+        kpi: function (kpi, revenueMax, profitMax, marginMax) {
+            if (!kpi) {
+                return Array(8).fill(window.dash_clientside.no_update);
+            }
+            function money(value) {
+                return '$' + Math.round(value).toLocaleString('en-US');
+            }
+            function card(title, value, note, color) {
+                return [
+                    {namespace: 'dash_html_components', type: 'H4', props: {children: title, style: {color: color}}},
+                    {namespace: 'dash_html_components', type: 'H2', props: {children: value, style: {color: color, margin: '10px 0'}}},
+                    {namespace: 'dash_html_components', type: 'P', props: {children: note}}
+                ];
+            }
+            // Значение полосы ограничивается шкалой слайдера
+            function progress(value, max) {
+                return Math.min(Math.max(value, 0), max);
+            }
+            var growth = kpi.growth || 0;
+            var growthNote = 'в месяц';
+            if (kpi.forecast_next !== null && kpi.forecast_next !== undefined) {
+                growthNote += ' · прогноз на след. месяц: ' + money(kpi.forecast_next);
+            }
+            var transactions = kpi.transactions + ' транзакций';
+            return [
+                card('Общая выручка', money(kpi.revenue), transactions, '#27ae60'),
+                card('Общие расходы', money(kpi.expenses), transactions, '#e74c3c'),
+                card('Общая прибыль', money(kpi.profit), 'Чистая прибыль', '#3498db'),
+                card('Маржа прибыли', kpi.margin.toFixed(1) + '%', 'Рентабельность', '#9b59b6'),
+                card('Средний рост', (growth >= 0 ? '+' : '') + growth.toFixed(1) + '%', growthNote, '#f39c12'),
+                progress(kpi.revenue, revenueMax),
+                progress(kpi.profit, profitMax),
+                progress(kpi.margin, marginMax)
+            ];
+        }
+    }
+});
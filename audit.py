@@ -0,0 +1,327 @@
+import bisect
+import gzip
+import json
+import os
+import queue
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+# ================== ЖУРНАЛ ИЗМЕНЕНИЙ ==================
+SEGMENT_ENTRIES = 10000   # записей в файле журнала
+KEEP_SEGMENTS = 50        # сжатых файлов на диске; более старые удаляются
+BLOCK_ENTRIES = 64        # записей в блоке сжатого файла (отдельный член gzip)
+CACHED_BLOCKS = 256       # распакованных блоков в памяти для запросов к старой истории
+SEGMENT_PREFIX = 'audit-'
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class AuditJournal:
+    """Журнал изменений товаров: кто, когда и какое поле изменил.
+
+    Запись только добавляется. Команда бота кладет ее в память и в
+    очередь, а файл пишет фоновый поток, поэтому запись не задерживает
+    ответ. Журнал на диске разбит на файлы по SEGMENT_ENTRIES записей
+    (имя - номер первой записи); заполненный файл сжимается gzip, самые
+    старые удаляются. Незаполненный файл при остановке не сжимается, и
+    следующий запуск дописывает его: перезапуски не плодят маленьких
+    файлов и не сокращают хранимую историю.
+
+    Индексы по товару и по сотруднику - возрастающие списки номеров
+    записей: последние N изменений находятся бинарным поиском границы
+    хранимой истории и срезом хвоста, O(log n + N). Записи текущего и
+    предыдущего файла читаются из памяти, более старые - из сжатых
+    файлов. Сжатый файл состоит из блоков по BLOCK_ENTRIES записей
+    (каждый - отдельный член gzip, файл читается обычным zcat), смещения
+    блоков хранятся в памяти, поэтому запись из старого файла стоит
+    распаковки одного блока.
+    """
+
+    def __init__(self, directory, segment_entries=SEGMENT_ENTRIES, keep_segments=KEEP_SEGMENTS):
+        self.directory = directory
+        self.segment_entries = segment_entries
+        self.keep_segments = keep_segments
+        # Файлы читаются в start(): создание журнала (в том числе при импорте
+        # модуля процессом пула) не трогает каталог
+        self._next = self._tail_start = self._first = 0
+        self._tail = []
+        self._segments = []
+        self._blocks = {}   # начало файла -> смещения блоков в сжатом файле
+        self._by_sku = {}
+        self._by_user = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.written = 0
+
+    # ---------- запись ----------
+
+    def record(self, user, product, field, old, new):
+        """Изменение поля товара пользователем Telegram user"""
+        entry = {
+            'seq': 0,
+            'date': datetime.now().strftime(DATE_FORMAT),
+            'user_id': user.id,
+            'user': user.full_name,
+            'store': product.get('store'),
+            'sku': product['sku'],
+            'field': field,
+            'old': old,
+            'new': new,
+        }
+        with self._lock:
+            seq = entry['seq'] = self._next
+            self._next += 1
+            self._tail.append(entry)
+            self._by_sku.setdefault((entry['store'], entry['sku']), []).append(seq)
+            self._by_user.setdefault(entry['user_id'], []).append(seq)
+        self._queue.put(entry)
+        return entry
+
+    @property
+    def pending(self):
+        """Записей, ожидающих записи на диск"""
+        return self._queue.qsize()
+
+    # ---------- запросы ----------
+
+    def history(self, store, sku, limit=10):
+        """Последние изменения товара, новые первыми"""
+        return self._latest(self._by_sku.get((store, sku)), limit)
+
+    def by_user(self, user_id, limit=10):
+        """Последние изменения, сделанные сотрудником"""
+        return self._latest(self._by_user.get(user_id), limit)
+
+    def recent(self, limit=10):
+        """Последние изменения текущего запуска"""
+        with self._lock:
+            return self._tail[:-limit - 1:-1]
+
+    def _latest(self, seqs, limit):
+        if not seqs:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(seqs, self._first)
+            if start > 1024 and start * 2 > len(seqs):
+                # Номера удаленных файлов вычищаются из индекса пачкой
+                del seqs[:start]
+                start = 0
+            picked = seqs[max(start, len(seqs) - limit):]
+        entries = (self._entry(seq) for seq in reversed(picked))
+        return [entry for entry in entries if entry is not None]
+
+    def _entry(self, seq):
+        with self._lock:
+            if seq >= self._tail_start:
+                return self._tail[seq - self._tail_start]
+            i = bisect.bisect_right(self._segments, seq) - 1
+            if i < 0:
+                return None
+            start = self._segments[i]
+            offsets = self._blocks[start]
+            block = min((seq - start) // BLOCK_ENTRIES, len(offsets) - 1)
+            key = (start, block)
+            entries = self._cache.get(key)
+            if entries is not None:
+                self._cache.move_to_end(key)
+        if entries is None:
+            try:
+                entries = self._read_block(start, offsets, block)
+            except (OSError, EOFError, zlib.error):
+                return None  # файл удален ротацией во время запроса
+            with self._lock:
+                self._cache[key] = entries
+                while len(self._cache) > CACHED_BLOCKS:
+                    self._cache.popitem(last=False)
+        for entry in entries:
+            if entry['seq'] == seq:
+                return entry
+        return None
+
+    # ---------- файлы ----------
+
+    def _segment_starts(self):
+        starts = set()
+        if not os.path.isdir(self.directory):
+            return []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and (name.endswith('.jsonl') or name.endswith('.jsonl.gz')):
+                starts.add(int(name[len(SEGMENT_PREFIX):].split('.', 1)[0]))
+        return sorted(starts)
+
+    def _path(self, start, suffix='.jsonl.gz'):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{start:012d}{suffix}")
+
+    @staticmethod
+    def _parse(lines):
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break  # строка, недописанная при аварийной остановке
+        return entries
+
+    def _resume(self, start):
+        """Записи незаполненного несжатого файла start или None, если его нужно сжать.
+
+        Недописанная при аварийной остановке строка обрезается, чтобы
+        следующие записи начинались с новой строки.
+        """
+        source = self._path(start, '.jsonl')
+        if not os.path.exists(source) or os.path.exists(self._path(start)):
+            return None
+        entries, size = [], 0
+        with open(source, 'rb') as f:
+            for line in f:
+                parsed = self._parse([line]) if line.endswith(b'\n') else []
+                if not parsed or parsed[0].get('seq') != start + len(entries):
+                    break
+                entries.append(parsed[0])
+                size += len(line)
+        if len(entries) >= self.segment_entries:
+            return None
+        if size != os.path.getsize(source):
+            os.truncate(source, size)
+        return entries
+
+    def _read_block(self, start, offsets, block):
+        with open(self._path(start), 'rb') as f:
+            f.seek(offsets[block])
+            data = f.read(offsets[block + 1] - offsets[block]) if block + 1 < len(offsets) else f.read()
+        return self._parse(gzip.decompress(data).splitlines())
+
+    def _read_segment(self, start):
+        """Все записи сжатого файла и смещения его блоков"""
+        with open(self._path(start), 'rb') as f:
+            data = f.read()
+        entries, offsets, position = [], [], 0
+        while position < len(data):
+            decompressor = zlib.decompressobj(31)
+            lines = decompressor.decompress(data[position:]).splitlines()
+            if not decompressor.eof:
+                break  # файл, недописанный при аварийной остановке
+            offsets.append(position)
+            entries += self._parse(lines)
+            position = len(data) - len(decompressor.unused_data)
+        return entries, offsets
+
+    def _compress(self, start):
+        """Сжимает файл блоками по BLOCK_ENTRIES записей; возвращает смещения блоков"""
+        source = self._path(start, '.jsonl')
+        tmp = self._path(start, '.jsonl.gz.tmp')
+        with open(source, 'rb') as f:
+            lines = f.readlines()
+        offsets, position = [], 0
+        with open(tmp, 'wb') as out:
+            for i in range(0, len(lines), BLOCK_ENTRIES):
+                block = gzip.compress(b''.join(lines[i:i + BLOCK_ENTRIES]), mtime=0)
+                offsets.append(position)
+                out.write(block)
+                position += len(block)
+        os.replace(tmp, self._path(start))
+        os.remove(source)
+        return offsets
+
+    def _seal(self, start):
+        """Сжатие заполненного файла и удаление самых старых"""
+        offsets = self._compress(start)
+        with self._lock:
+            self._segments.append(start)
+            self._blocks[start] = offsets
+            # В памяти остаются записи только что сжатого и текущего файла
+            drop = max(start - self._tail_start, 0)
+            del self._tail[:drop]
+            self._tail_start += drop
+            expired = self._segments[:-self.keep_segments] if len(self._segments) > self.keep_segments else []
+            del self._segments[:len(expired)]
+            for old in expired:
+                del self._blocks[old]
+            if expired:
+                self._cache = OrderedDict((key, entries) for key, entries in self._cache.items() if key[0] in self._blocks)
+            if self._segments:
+                self._first = max(self._first, self._segments[0])
+        for old in expired:
+            os.remove(self._path(old))
+
+    def _load(self):
+        """Индексы по файлам прошлых запусков; недописанные файлы сжимаются"""
+        starts = [start for start in self._segment_starts() if start < self._tail_start]
+        by_sku, by_user, blocks = {}, {}, {}
+        for start in list(starts):
+            try:
+                if os.path.exists(self._path(start, '.jsonl')):
+                    self._compress(start)
+                entries, blocks[start] = self._read_segment(start)
+            except (OSError, zlib.error):
+                starts.remove(start)
+                continue
+            if not blocks[start]:
+                del blocks[start]
+                starts.remove(start)
+                continue
+            for entry in entries:
+                by_sku.setdefault((entry['store'], entry['sku']), []).append(entry['seq'])
+                by_user.setdefault(entry['user_id'], []).append(entry['seq'])
+        with self._lock:
+            for index, loaded in ((self._by_sku, by_sku), (self._by_user, by_user)):
+                for key, seqs in loaded.items():
+                    index[key] = seqs + index.get(key, [])
+            self._segments[:0] = starts
+            self._blocks.update(blocks)
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+        start = self._tail_start
+        out = None
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            if out is None:
+                out = open(self._path(start, '.jsonl'), 'a', encoding='utf-8')
+            out.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.written += 1
+            if entry['seq'] + 1 - start >= self.segment_entries:
+                out.close()
+                out = None
+                self._seal(start)
+                start += self.segment_entries
+            elif self._queue.empty():
+                out.flush()
+        if out is not None:
+            out.close()
+
+    def _open(self):
+        """Номер следующей записи и хвост по файлам прошлых запусков"""
+        starts = self._segment_starts()
+        tail = self._resume(starts[-1]) if starts else None
+        with self._lock:
+            if tail is not None:
+                # Запуск продолжает незаполненный файл прошлого запуска
+                self._tail_start = starts[-1]
+                self._tail = tail
+                self._next = self._tail_start + len(tail)
+            else:
+                self._next = self._tail_start = starts[-1] + self.segment_entries if starts else 0
+            self._first = starts[0] if starts else self._next
+            for entry in self._tail:
+                self._by_sku.setdefault((entry['store'], entry['sku']), []).append(entry['seq'])
+                self._by_user.setdefault(entry['user_id'], []).append(entry['seq'])
+
+    def start(self):
+        """Чтение журнала с диска и запуск записи; вызывается до первой записи"""
+        self._open()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=10):
+        """Дописывает очередь; текущий файл продолжит следующий запуск"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
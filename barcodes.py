@@ -0,0 +1,113 @@
+from datetime import datetime
+
+# ================== ШТРИХ-КОДЫ GTIN ==================
+GTIN_LENGTHS = (8, 12, 13, 14)  # EAN-8, UPC-A, EAN-13, GTIN-14
+EXPIRY_FORMAT = '%Y-%m-%d'
+
+
+def gtin_check_digit(body):
+    """Контрольная цифра GTIN для кода без последней цифры"""
+    total = 0
+    # Веса 3 и 1 чередуются справа налево, начиная с 3
+    for position, digit in enumerate(reversed(body)):
+        total += int(digit) * (3 if position % 2 == 0 else 1)
+    return (10 - total % 10) % 10
+
+
+def is_valid_gtin(code):
+    """Проверка длины и контрольной цифры"""
+    return (
+        code.isdigit()
+        and len(code) in GTIN_LENGTHS
+        and gtin_check_digit(code[:-1]) == int(code[-1])
+    )
+
+
+def normalize_gtin(code):
+    """Приведение к GTIN-14: UPC-A и EAN-13 одного товара дают один ключ"""
+    return code.strip().zfill(14)
+
+
+class BarcodeIndex:
+    """Хеш-индекс штрих-код -> товар"""
+
+    def __init__(self):
+        self._products = {}
+
+    def __len__(self):
+        return len(self._products)
+
+    def add(self, code, product):
+        """Регистрация штрих-кода; ValueError при неверном коде или дубликате"""
+        code = code.strip()
+        if not is_valid_gtin(code):
+            raise ValueError(f"Неверный штрих-код {code}: ошибка длины или контрольной цифры")
+        key = normalize_gtin(code)
+        owner = self._products.get(key)
+        if owner is not None and owner is not product:
+            raise ValueError(f"Штрих-код {code} уже привязан к товару {owner['sku']}")
+        if product.get('barcode') and normalize_gtin(product['barcode']) != key:
+            self._products.pop(normalize_gtin(product['barcode']), None)
+        self._products[key] = product
+        product['barcode'] = code
+
+    def lookup(self, code):
+        return self._products.get(normalize_gtin(code))
+
+
+# ================== СЕССИЯ ПРИЕМКИ ==================
+class ReceivingSession:
+    """Приемка по накладной: сканы копятся в памяти до завершения"""
+
+    def __init__(self, user_id, invoice):
+        self.user_id = user_id
+        self.invoice = invoice
+        self.started_at = datetime.now()
+        self.lines = {}   # sku -> строка приемки
+        self.scans = 0
+
+    def scan(self, product, quantity=1, expiry=None, quality=None):
+        """Добавление отсканированного товара, возвращает строку приемки.
+
+        ValueError при неположительном количестве или сроке годности не в
+        формате ГГГГ-ММ-ДД; сессия при этом не меняется.
+        """
+        if quantity <= 0:
+            raise ValueError("Количество должно быть больше нуля")
+        if expiry:
+            try:
+                datetime.strptime(expiry, EXPIRY_FORMAT)
+            except ValueError:
+                raise ValueError(f"Неверный срок годности {expiry}: ожидается ГГГГ-ММ-ДД") from None
+        line = self.lines.get(product['sku'])
+        if line is None:
+            line = self.lines[product['sku']] = {
+                'product': product,
+                'quantity': 0,
+                'expiry': None,
+                'quality': None,
+            }
+        line['quantity'] += quantity
+        if expiry:
+            line['expiry'] = expiry
+        if quality:
+            line['quality'] = quality
+        self.scans += 1
+        return line
+
+    @property
+    def total_quantity(self):
+        return sum(line['quantity'] for line in self.lines.values())
+
+    def commit(self):
+        """Проведение приемки одним пакетом; возвращает измененные товары"""
+        changed = []
+        for line in self.lines.values():
+            product = line['product']
+            product['quantity'] += line['quantity']
+            if line['expiry']:
+                product['expiry'] = line['expiry']
+            if product['quantity'] > 0 and product['status'] == 'Нет в наличии':
+                product['status'] = 'В наличии'
+            changed.append(product)
+        return changed
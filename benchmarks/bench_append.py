@@ -0,0 +1,90 @@
+"""Время дозагрузки дневного файла продаж в накопленный набор дашборда.
+
+История из --rows строк загружается в SalesDataset, после чего
+замеряется добавление файла за следующий день (--day строк): разбор
+CSV, сверка с историей по хешам ключа и пополнение помесячных сумм по
+категориям и товарам. Для сравнения - прежний путь: разбор всей истории
+вместе с новым днем и пересчет тех же сумм. Повторная загрузка того же
+дня должна пропустить все строки.
+
+    python benchmarks/bench_append.py --rows 1000000 --day 5000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datasets import SalesDataset  # noqa: E402
+from forecasting import period_matrix  # noqa: E402
+
+CATEGORIES = ['Электроника', 'Одежда и обувь', 'Бытовая техника', 'Мебель', 'Красота и здоровье', 'Продукты', 'Игрушки']
+LEVELS = (['category'], ['category', 'product_id'])
+
+
+def sales_csv(rows, day, days, products, seed):
+    """CSV продаж: rows строк за days дней начиная с day"""
+    rng = np.random.default_rng(seed)
+    product = rng.integers(0, products, rows)
+    revenue = rng.integers(100, 5000, rows)
+    expenses = (revenue * rng.uniform(0.6, 0.8, rows)).round(2)
+    df = pd.DataFrame({
+        'date': np.datetime64(day, 'D') + np.sort(rng.integers(0, days, rows)),
+        'category': np.array(CATEGORIES)[product % len(CATEGORIES)],
+        'product_id': product,
+        'revenue': revenue,
+        'expenses': expenses,
+        'profit': revenue - expenses,
+    })
+    return df.drop_duplicates(['date', 'category', 'product_id']).to_csv(index=False)
+
+
+def parse(text):
+    df = pd.read_csv(io.StringIO(text))
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Дозагрузка дневного файла продаж")
+    parser.add_argument('--rows', type=int, default=1000000, help="Строк в истории")
+    parser.add_argument('--day', type=int, default=5000, help="Строк в дневном файле")
+    parser.add_argument('--products', type=int, default=20000, help="Число товаров")
+    args = parser.parse_args()
+
+    history = sales_csv(args.rows, '2022-01-01', 3 * 365, args.products, 0)
+    last = pd.read_csv(io.StringIO(history))['date'].max()
+    day = sales_csv(args.day, str((pd.Timestamp(last) + pd.Timedelta(days=1)).date()), 1, args.products, 1)
+
+    dataset = SalesDataset()
+    dataset.append(parse(history))
+    for keys in LEVELS:
+        dataset.rollup(keys)
+    print(f"История: {len(dataset):,} строк, день: {args.day:,} строк")
+
+    frame, parse_seconds = timed(parse, day)
+    (added, duplicates), append_seconds = timed(dataset.append, frame)
+    _, rollup_seconds = timed(lambda: [dataset.rollup(keys) for keys in LEVELS])
+    print(f"Дозагрузка: разбор {parse_seconds * 1000:.0f} мс, добавление {append_seconds * 1000:.0f} мс, "
+          f"суммы {rollup_seconds * 1000:.0f} мс ({added:,} строк)")
+    (added, duplicates), repeat_seconds = timed(dataset.append, frame)
+    print(f"Повтор того же дня: {repeat_seconds * 1000:.0f} мс, пропущено {duplicates:,}, добавлено {added:,}")
+
+    full, full_parse_seconds = timed(parse, history + day.split('\n', 1)[1])
+    _, full_rollup_seconds = timed(lambda: [period_matrix(full, keys) for keys in LEVELS])
+    print(f"Полная перезагрузка: разбор {full_parse_seconds * 1000:.0f} мс, "
+          f"суммы {full_rollup_seconds * 1000:.0f} мс ({len(full):,} строк)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Задержка записи в журнал изменений и время запросов истории.
+
+В журнал (временный каталог) пишется --entries изменений по --sku
+товарам от --users сотрудников. Замеряется время record() в потоке
+команды - перцентили p50/p99 - и время запросов последних N изменений
+товара и сотрудника: из памяти (текущий файл) и из сжатых файлов.
+
+    python benchmarks/bench_audit.py --entries 1000000 --sku 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audit import AuditJournal  # noqa: E402
+
+
+class User:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.full_name = f"Сотрудник {user_id}"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def timed_queries(func, keys, limit):
+    samples = []
+    for key in keys:
+        started = time.perf_counter()
+        func(key, limit)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Журнал изменений")
+    parser.add_argument('--entries', type=int, default=1000000, help="Записей в журнале")
+    parser.add_argument('--sku', type=int, default=100000, help="Число товаров")
+    parser.add_argument('--users', type=int, default=50, help="Число сотрудников")
+    parser.add_argument('--limit', type=int, default=10, help="Записей в ответе на запрос")
+    parser.add_argument('--queries', type=int, default=1000, help="Запросов каждого вида")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    users = [User(i) for i in range(args.users)]
+    products = [{'store': '1', 'sku': f"SKU{i:07d}"} for i in range(args.sku)]
+    with tempfile.TemporaryDirectory() as directory:
+        journal = AuditJournal(directory)
+        journal.start()
+        samples = []
+        started = time.perf_counter()
+        for i in range(args.entries):
+            product = rng.choice(products)
+            t = time.perf_counter()
+            journal.record(rng.choice(users), product, 'quantity', i, i + 1)
+            samples.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - started
+        print(f"Запись {args.entries:,}: p50 {percentile(samples, 0.5) * 1e6:.1f} мкс, "
+              f"p99 {percentile(samples, 0.99) * 1e6:.1f} мкс, {args.entries / elapsed:,.0f} записей/с")
+        while journal.pending:
+            time.sleep(0.05)
+        print(f"Файлы: {len(os.listdir(directory))}, {sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 2 ** 20:.1f} МБ")
+
+        def sku_history(product, limit):
+            return journal.history(product['store'], product['sku'], limit)
+
+        sample = rng.sample(products, min(args.queries, len(products)))
+        for name, func, keys in (("Товар", sku_history, sample),
+                                 ("Сотрудник", journal.by_user, [rng.randrange(args.users) for _ in range(args.queries)])):
+            times = timed_queries(func, keys, args.limit)
+            print(f"{name}, последние {args.limit}: p50 {percentile(times, 0.5) * 1e3:.2f} мс, "
+                  f"p99 {percentile(times, 0.99) * 1e3:.2f} мс")
+        journal.close()
+
+
+if __name__ == '__main__':
+    main()
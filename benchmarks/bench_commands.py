@@ -0,0 +1,282 @@
+"""Воспроизводимые замеры команд бота и колбэков дашбордов.
+
+Настоящие обработчики main.py вызываются с объектами types.Message,
+привязанными к боту-заглушке (без обращений к Telegram). Каждый размер
+каталога замеряется в отдельном процессе, чтобы пиковая память (RSS)
+относилась только к нему.
+
+    python benchmarks/bench_commands.py --sizes 1000,100000,1000000
+    python benchmarks/bench_commands.py --sizes 1000,100000 --save benchmarks/baseline.json
+    python benchmarks/bench_commands.py --baseline benchmarks/baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RETAIL_CSV = os.path.join(ROOT, 'retail_products.csv')
+DEFAULT_SIZES = '1000,100000,1000000'
+CATEGORIES = ['Электроника', 'Одежда и обувь', 'Бытовая техника', 'Мебель', 'Красота и здоровье', 'Продукты', 'Игрушки']
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def measure(func, args_list, min_time, max_ops):
+    """Повтор операции по заранее подготовленным аргументам; задержки в секундах"""
+    latencies = []
+    started = time.perf_counter()
+    for args in args_list[:max_ops]:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+        if len(latencies) >= 3 and time.perf_counter() - started >= min_time:
+            break
+    total = sum(latencies)
+    return {
+        'ops': len(latencies),
+        'ops_per_sec': len(latencies) / total if total else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+# ================== ПОДГОТОВКА ДАННЫХ ==================
+def retail_csv(rows):
+    """CSV в формате retail_products.csv заданного размера (base64 для dcc.Upload)"""
+    if rows is None:
+        with open(RETAIL_CSV, 'rb') as f:
+            data = f.read()
+    else:
+        rng = random.Random(rows)
+        buffer = io.StringIO()
+        buffer.write('date,category,revenue,expenses,profit,product_id,product_name,month,quarter,year\n')
+        start = datetime(2022, 1, 1)
+        for i in range(rows):
+            day = start + timedelta(days=i % 1095)
+            revenue = rng.randint(3000, 20000)
+            expenses = int(revenue * rng.uniform(0.6, 0.8))
+            buffer.write(
+                f"{day:%Y-%m-%d},{CATEGORIES[i % len(CATEGORIES)]},{revenue},{expenses},{revenue - expenses},"
+                f"{i % 500},Товар {i % 500},{day:%B},Q{(day.month - 1) // 3 + 1},{day.year}\n"
+            )
+        data = buffer.getvalue().encode('utf-8')
+    return 'data:text/csv;base64,' + base64.b64encode(data).decode('ascii')
+
+
+def uploaded(dashboard, contents, filename):
+    """Колбэк дашборда сразу после загрузки файла: разбор и пересчет на каждый вызов"""
+    def run(*args):
+        dataset, _ = dashboard.sessions.get('bench', create=True)
+        dashboard.load_uploads(dataset, [contents], [filename], 'replace')
+        return dashboard.update_dashboard(None, *args, session_id='bench')
+    return run
+
+
+def fill_catalog(main, size, rng):
+    """Синтетический каталог и история продаж за 90 дней"""
+    store = main.stores.get(main.DEFAULT_STORE)
+    now = datetime.now()
+    for i in range(size):
+        main.add_product(store, main.make_product(
+            f"Товар {i}", f"SKU-{i}", rng.randint(0, 500), float(rng.randint(100, 50000)),
+            (now + timedelta(days=rng.randint(-10, 400))).strftime('%Y-%m-%d'),
+            category=CATEGORIES[i % len(CATEGORIES)]
+        ))
+    for i in range(size // 2):
+        product = store.products[rng.randrange(size)]
+        quantity = rng.randint(1, 5)
+        price = product['price'] * 1.3
+        sale = {
+            'sku': product['sku'],
+            'name': product['name'],
+            'quantity': quantity,
+            'price': price,
+            'total': quantity * price,
+            'date': (now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))).strftime("%Y-%m-%d %H:%M:%S"),
+            'profit': quantity * (price - product['price']),
+        }
+        main.sales_history.append(sale)
+        store.record_sale(sale)
+
+
+def run_worker(size, min_time, max_ops):
+    """Замеры для одного размера каталога; результат - JSON в stdout"""
+    os.environ.setdefault('TOKEN', '123456:' + 'A' * 35)
+    os.environ.pop('MANAGER_CHAT_ID', None)
+    os.environ.pop('WEBHOOK_URL', None)
+    sys.path.insert(0, ROOT)
+
+    from aiogram import Bot, types
+
+    class StubBot(Bot):
+        """Бот без сети: все методы API завершаются успешно"""
+        calls = 0
+
+        async def __call__(self, method, request_timeout=None):
+            StubBot.calls += 1
+            return True
+
+    import main
+    import dashboard
+    import live_dashboard
+
+    bot = StubBot(token=os.environ['TOKEN'])
+    main.bot = main.notifier.bot = bot
+
+    rng = random.Random(size)
+    started = time.perf_counter()
+    fill_catalog(main, size, rng)
+    setup_seconds = time.perf_counter() - started
+
+    count = max_ops
+    update_id = iter(range(1, 10 ** 9))
+
+    def message(text, user_id=1):
+        n = next(update_id)
+        command = text.split()[0]
+        return types.Message.model_validate({
+            'message_id': n,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+        }, context={'bot': bot})
+
+    def sku():
+        return f"SKU-{rng.randrange(size)}"
+
+    loop = asyncio.new_event_loop()
+
+    def handler(func):
+        return lambda msg: loop.run_until_complete(func(msg))
+
+    cases = {
+        'cmd_add_new': (handler(main.cmd_add), [
+            (message(f"/add Новый товар {i}, NEW-{i}, 10, 1000, 2030-12-31"),) for i in range(count)]),
+        'cmd_add_existing': (handler(main.cmd_add), [
+            (message(f"/add Товар, {sku()}, 5, 1000, 2030-12-31"),) for _ in range(count)]),
+        'cmd_sell': (handler(main.cmd_sell), [(message(f"/sell {sku()}, 1, 1500"),) for _ in range(count)]),
+        'cmd_info': (handler(main.cmd_info), [(message(f"/info {sku()}"),) for _ in range(count)]),
+        'cmd_list': (handler(main.cmd_list), [(message("/list"),) for _ in range(count)]),
+        'cmd_report': (handler(main.cmd_report), [(message("/report"),) for _ in range(count)]),
+        'cmd_stores': (handler(main.cmd_stores), [(message("/stores"),) for _ in range(count)]),
+        'cmd_dashboard': (handler(main.cmd_dashboard), [(message("/dashboard"),) for _ in range(count)]),
+        'live_dashboard.render_dashboard': (live_dashboard.render_dashboard, [
+            (main.products_db, main.stores, main.classifier)] * count),
+    }
+    retail_file = retail_csv(None)
+    retail_synthetic = retail_csv(size)
+    cases['dashboard.update_dashboard[file]'] = (uploaded(dashboard, retail_file, 'retail_products.csv'), [
+        ('month', [], None, None, None)] * count)
+    cases['dashboard.update_dashboard[synthetic]'] = (uploaded(dashboard, retail_synthetic, 'synthetic.csv'), [
+        ('month', [], None, None, None)] * count)
+
+    results = {}
+    for name, (func, args_list) in cases.items():
+        results[name] = measure(func, args_list, min_time, max_ops)
+    loop.close()
+
+    return {
+        'size': size,
+        'setup_seconds': setup_seconds,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'cases': results,
+    }
+
+
+# ================== СРАВНЕНИЕ С БАЗОВОЙ ЛИНИЕЙ ==================
+def compare(results, baseline, tolerance, min_delta_ms=1.0):
+    """Список регрессий: рост p50/p99 или памяти больше допуска.
+
+    Рост задержки меньше min_delta_ms не считается регрессией: для быстрых
+    команд он сравним с шумом планировщика ОС.
+    """
+    regressions = []
+    for size, result in results.items():
+        base = baseline.get(size)
+        if base is None:
+            continue
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{size}: peak RSS {base['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} МБ")
+        for name, case in result['cases'].items():
+            base_case = base['cases'].get(name)
+            if base_case is None:
+                continue
+            for metric in ('p50_ms', 'p99_ms'):
+                if (case[metric] > base_case[metric] * (1 + tolerance)
+                        and case[metric] - base_case[metric] > min_delta_ms):
+                    regressions.append(
+                        f"{size} {name}: {metric} {base_case[metric]:.2f} -> {case[metric]:.2f} мс"
+                    )
+    return regressions
+
+
+def print_report(results):
+    for size, result in results.items():
+        print(f"\n=== {int(size):,} SKU: подготовка {result['setup_seconds']:.1f} с, "
+              f"peak RSS {result['peak_rss_mb']:.0f} МБ ===")
+        print(f"{'операция':40} {'ops':>6} {'ops/s':>10} {'p50, мс':>10} {'p99, мс':>10}")
+        for name, case in result['cases'].items():
+            print(f"{name:40} {case['ops']:>6} {case['ops_per_sec']:>10.1f} "
+                  f"{case['p50_ms']:>10.2f} {case['p99_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры команд бота и колбэков дашбордов")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Размеры каталога через запятую")
+    parser.add_argument('--min-time', type=float, default=1.0, help="Минимальное время замера операции, с")
+    parser.add_argument('--max-ops', type=int, default=1000, help="Максимум повторов операции")
+    parser.add_argument('--save', help="Сохранить результаты как базовую линию (JSON)")
+    parser.add_argument('--baseline', help="Сравнить с сохраненной базовой линией")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Допустимое ухудшение (доля)")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="Минимальный значимый рост задержки, мс")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_worker(args.worker, args.min_time, args.max_ops)))
+        return
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(',')):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(size),
+             '--min-time', str(args.min_time), '--max-ops', str(args.max_ops)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            sys.exit(f"Ошибка замера для {size} SKU:\n{proc.stderr}")
+        results[str(size)] = json.loads(proc.stdout.strip().splitlines()[-1])
+    print_report(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nБазовая линия сохранена: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\nРЕГРЕССИИ:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nРегрессий нет")
+
+
+if __name__ == '__main__':
+    main()
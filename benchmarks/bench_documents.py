@@ -0,0 +1,92 @@
+"""Отрисовка актов: время и задержка цикла событий бота.
+
+Формируется --docs актов приемки по --lines строк тремя способами:
+прямо в цикле событий, по одному акту в пуле процессов (как команды
+бота) и одной пачкой в пуле (как итоговые документы дня). Параллельно
+корутина-пульс раз в 10 мс замеряет, насколько цикл событий опаздывает -
+столько же ждали бы ответа другие пользователи бота.
+
+    python benchmarks/bench_documents.py --docs 200 --lines 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from documents import DocumentRegistry, render_documents  # noqa: E402
+
+TICK = 0.01
+
+
+def make_specs(docs, lines, directory):
+    registry = DocumentRegistry(directory)
+    return [
+        registry.issue('receiving', 'Кладовщик', '1', invoice=f"INV-{i:05d}", lines=[
+            {'name': f"Товар {j}", 'sku': f"SKU-{j:05d}", 'quantity': j + 1, 'expiry': '2030-12-31', 'quality': 'Отличное'}
+            for j in range(lines)
+        ])
+        for i in range(docs)
+    ]
+
+
+async def heartbeat(lags, stop):
+    """Опоздание цикла событий относительно ожидаемого пульса"""
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(time.perf_counter() - expected, 0))
+
+
+async def measure(name, work):
+    lags, stop = [], asyncio.Event()
+    pulse = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await pulse
+    lags.sort()
+    p99 = lags[min(int(len(lags) * 0.99), len(lags) - 1)] if lags else elapsed
+    worst = lags[-1] if lags else elapsed
+    print(f"{name}: {elapsed * 1000:.0f} мс, задержка цикла p99 {p99 * 1000:.1f} мс, макс. {worst * 1000:.1f} мс")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Отрисовка актов")
+    parser.add_argument('--docs', type=int, default=200, help="Число актов")
+    parser.add_argument('--lines', type=int, default=50, help="Строк в акте")
+    parser.add_argument('--workers', type=int, default=2, help="Процессов в пуле")
+    args = parser.parse_args()
+
+    loop = asyncio.get_running_loop()
+    with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(args.workers) as pool:
+        specs = make_specs(args.docs, args.lines, directory)
+        # Номерной акт не перезаписывается: каждый способ пишет в свой каталог
+        targets = {name: os.path.join(directory, name) for name in ('warmup', 'pool-warmup', 'inline', 'one', 'batch')}
+        # Запуск процессов и первая компиляция шаблонов - вне замеров
+        await loop.run_in_executor(pool, render_documents, specs[:1], targets['pool-warmup'])
+        await loop.run_in_executor(None, render_documents, specs[:1], targets['warmup'])
+
+        async def inline():
+            for spec in specs:
+                render_documents([spec], targets['inline'])
+
+        async def one_by_one():
+            await asyncio.gather(*(loop.run_in_executor(pool, render_documents, [spec], targets['one']) for spec in specs))
+
+        async def batch():
+            await loop.run_in_executor(pool, render_documents, specs, targets['batch'])
+
+        print(f"Актов: {args.docs}, строк в акте: {args.lines}")
+        await measure("В цикле событий", inline)
+        await measure("Пул, по одному", one_by_one)
+        await measure("Пул, одной пачкой", batch)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
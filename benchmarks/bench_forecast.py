@@ -0,0 +1,68 @@
+"""Время прогноза для большого числа рядов (категория, товар).
+
+Синтетическая таблица продаж в длинном формате, как у загружаемого в
+дашборд CSV, прогоняется через forecast_frame: построение матрицы рядов
+и подбор моделей. Повторный вызов через VersionCache должен быть
+мгновенным. При превышении бюджета скрипт завершается с кодом 1.
+
+    python benchmarks/bench_forecast.py --series 100000 --months 36 --budget-s 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import VersionCache  # noqa: E402
+from forecasting import forecast_frame  # noqa: E402
+
+CATEGORIES = ['Электроника', 'Одежда и обувь', 'Бытовая техника', 'Мебель', 'Красота и здоровье', 'Продукты', 'Игрушки']
+
+
+def sales_table(series, months, seed=0):
+    """Помесячная выручка: сезонность, шум и пропуски продаж"""
+    rng = np.random.default_rng(seed)
+    product = np.repeat(np.arange(series), months)
+    month = np.tile(np.arange(months), series)
+    seasonal = 1 + 0.3 * np.sin(2 * np.pi * month / 12) * rng.random(series)[product]
+    revenue = rng.gamma(2.0, 500.0, series)[product] * seasonal * rng.uniform(0.7, 1.3, len(product))
+    sold = rng.random(len(product)) > 0.2
+    return pd.DataFrame({
+        'date': (np.datetime64('2022-01', 'M') + month[sold]).astype('datetime64[ns]'),
+        'category': pd.Categorical.from_codes(product[sold] % len(CATEGORIES), CATEGORIES),
+        'product_id': product[sold],
+        'revenue': revenue[sold].round(2),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время прогноза спроса")
+    parser.add_argument('--series', type=int, default=100000, help="Число рядов (товаров)")
+    parser.add_argument('--months', type=int, default=36, help="Длина истории, месяцев")
+    parser.add_argument('--budget-s', type=float, default=10.0, help="Бюджет на расчет прогноза, с")
+    args = parser.parse_args()
+
+    df = sales_table(args.series, args.months)
+    cache = VersionCache()
+
+    started = time.perf_counter()
+    forecast = cache.get('bench', forecast_frame, df, ['category', 'product_id'])
+    elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    cache.get('bench', forecast_frame, df, ['category', 'product_id'])
+    cached = time.perf_counter() - started
+
+    models = np.bincount(forecast['model'], minlength=2)
+    print(f"Ряды: {len(forecast['series']):,} x {args.months} мес. ({len(df):,} строк)")
+    print(f"Прогноз: {elapsed:.2f} с, из кеша {cached * 1e6:.0f} мкс")
+    print(f"Модели: сглаживание {models[0]:,}, сезонная {models[1]:,}")
+    print(f"Бюджет: {args.budget_s:.0f} с")
+    if elapsed > args.budget_s:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Память каталога на миллион SKU и стоимость построения DataFrame дашборда.
+
+Каталог строится теми же функциями, что и команды бота (make_product,
+add_product) и замеряется по частям: текст (названия и артикулы - сами
+данные), карточки Product (строки таблицы столбцов) и индексы магазина.
+Для сравнения замеряются те же товары в виде словарей.
+
+Бюджет - на карточки без индексов и текста: карточка-словарь занимала
+несколько сотен байт на SKU еще до индексов, целевой уровень - меньше
+200 Б, т.е. 190 МБ на 1 млн SKU. При превышении скрипт завершается с кодом 1.
+
+    python benchmarks/bench_memory.py --sku 200000 --budget-mb 190
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES = ['Электроника', 'Одежда и обувь', 'Бытовая техника', 'Мебель', 'Красота и здоровье', 'Продукты', 'Игрушки']
+MANAGERS = ['Не назначен', 'Иванов И.И.', 'Петрова А.С.', 'Сидоров П.П.']
+
+
+def catalog_rows(count):
+    today = datetime.now()
+    for i in range(count):
+        yield (f"Товар {i}", f"SKU-{i:07d}", i % 500, float(100 + i % 50000),
+               (today + timedelta(days=i % 400)).strftime('%Y-%m-%d'), CATEGORIES[i % len(CATEGORIES)])
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, used, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память каталога товаров")
+    parser.add_argument('--sku', type=int, default=200000, help="Размер замеряемого каталога")
+    parser.add_argument('--budget-mb', type=float, default=190.0, help="Бюджет карточек на 1 млн SKU, МБ")
+    args = parser.parse_args()
+
+    os.environ.setdefault('TOKEN', '123456:' + 'A' * 35)
+    sys.path.insert(0, ROOT)
+    import main as bot
+    import pandas as pd
+    from live_dashboard import products_frame
+
+    store = bot.stores.get(bot.DEFAULT_STORE)
+
+    def build_text():
+        return list(catalog_rows(args.sku))
+
+    def build_cards():
+        cards = []
+        for number, (name, sku, quantity, price, expiry, category) in enumerate(rows):
+            product = bot.make_product(name, sku, quantity, price, expiry, category=category)
+            product['manager'] = MANAGERS[number % len(MANAGERS)]
+            cards.append(product)
+        return cards
+
+    def build_indexes():
+        for product in cards:
+            bot.add_product(store, product)
+        return store.products
+
+    def build_dicts():
+        return [product.to_dict() for product in store.products]
+
+    rows, _, _ = measure(build_text)
+    # Текст: только названия и артикулы, остальные значения строк повторяются
+    text_bytes = sum(sys.getsizeof(row[0]) + sys.getsizeof(row[1]) for row in rows)
+    cards, card_bytes, card_seconds = measure(build_cards)
+    products, index_bytes, index_seconds = measure(build_indexes)
+    del rows
+    dicts, dict_bytes, _ = measure(build_dicts)
+
+    started = time.perf_counter()
+    products_frame(products)
+    columns_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    pd.DataFrame(dicts)
+    dicts_seconds = time.perf_counter() - started
+
+    def per_sku(size):
+        return f"{size / args.sku:5.0f} Б/SKU, {size / args.sku * 1_000_000 / 2 ** 20:5.0f} МБ на 1 млн SKU"
+
+    per_million = card_bytes / args.sku * 1_000_000 / 2 ** 20
+    print(f"Каталог: {args.sku:,} SKU за {card_seconds + index_seconds:.1f} с")
+    print(f"  текст (названия, артикулы): {per_sku(text_bytes)}")
+    print(f"  карточки Product:           {per_sku(card_bytes)}")
+    print(f"  индексы магазина:           {per_sku(index_bytes)}")
+    print(f"  всего:                      {per_sku(text_bytes + card_bytes + index_bytes)}")
+    print(f"  карточки словарями:         {per_sku(dict_bytes)} (строки общие с карточками)")
+    print(f"DataFrame дашборда: по столбцам {columns_seconds * 1000:.0f} мс, из словарей {dicts_seconds * 1000:.0f} мс")
+    print(f"Бюджет карточек: {args.budget_mb:.0f} МБ на 1 млн SKU")
+    if per_million > args.budget_mb:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
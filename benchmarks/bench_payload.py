@@ -0,0 +1,112 @@
+"""Размер и время сериализации ответов колбэков дашбордов.
+
+Ответ колбэка сериализуется так же, как это делает Dash
+(plotly.io.json), в трех вариантах: стандартный json, orjson по
+исходным выходам и orjson по выходам после native_output (фигуры и
+компоненты заранее развернуты, числа - типизированными массивами).
+Для последнего варианта замеряется сжатие gzip и brotli (если
+установлен). Каждый размер считается в отдельном процессе.
+
+    python benchmarks/bench_payload.py --sizes 10000,1000000
+"""
+import argparse
+import gzip
+import inspect
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_commands import ROOT, fill_catalog, retail_csv  # noqa: E402
+
+MODES = (('json', False), ('orjson', False), ('orjson', True))
+
+
+def serialize(outputs, engine):
+    """Ответ колбэка в форме Dash; (байты, секунды)"""
+    import plotly.io as pio
+    from dash._utils import to_json
+
+    pio.json.config.default_engine = engine
+    response = {'multi': True, 'response': {f"output-{i}": {'value': value} for i, value in enumerate(outputs)}}
+    started = time.perf_counter()
+    body = to_json(response).encode('utf-8')
+    return body, time.perf_counter() - started
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def run_worker(size):
+    os.environ.setdefault('TOKEN', '123456:' + 'A' * 35)
+    sys.path.insert(0, ROOT)
+    import main
+    import dashboard
+    import live_dashboard
+    from serialization import brotli, native_output
+
+    fill_catalog(main, size, random.Random(size))
+    dataset, _ = dashboard.sessions.get('bench', create=True)
+    dashboard.load_uploads(dataset, [retail_csv(size)], ['bench.csv'], 'replace')
+    callbacks = {
+        'dashboard': (inspect.unwrap(dashboard.update_dashboard), (None, 'month', [], None, None, None, 'replace', 'bench')),
+        'live_dashboard': (live_dashboard.render_dashboard, (main.products_db, main.stores, main.classifier)),
+    }
+    rows = []
+    for name, (callback, args) in callbacks.items():
+        outputs, callback_seconds = timed(callback, *args)
+        prepared, prepare_seconds = timed(lambda: tuple(native_output(value) for value in outputs))
+        for engine, native in MODES:
+            body, seconds = serialize(prepared if native else outputs, engine)
+            row = {
+                'callback': name,
+                'mode': f"{engine}{' + native' if native else ''}",
+                'callback_ms': callback_seconds * 1000,
+                'serialize_ms': (seconds + (prepare_seconds if native else 0)) * 1000,
+                'bytes': len(body),
+            }
+            if native:
+                compressed, seconds = timed(gzip.compress, body, 6)
+                row.update(gzip_bytes=len(compressed), gzip_ms=seconds * 1000)
+                if brotli is not None:
+                    compressed, seconds = timed(lambda: brotli.compress(body, quality=4))
+                    row.update(br_bytes=len(compressed), br_ms=seconds * 1000)
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Размер и сериализация ответов дашбордов")
+    parser.add_argument('--sizes', default='10000,1000000', help="Строк CSV / товаров через запятую")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_worker(args.worker)))
+        return
+
+    print(f"{'строк':>9} {'колбэк':15} {'режим':16} {'колбэк, мс':>11} {'сериализ., мс':>14} "
+          f"{'байт':>12} {'gzip, байт':>11} {'gzip, мс':>9} {'br, байт':>11} {'br, мс':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', str(size)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.exit(f"Ошибка замера для {size} строк:\n{proc.stderr}")
+        for row in json.loads(proc.stdout.strip().splitlines()[-1]):
+            compressed = ''
+            if 'gzip_bytes' in row:
+                compressed = f"{row['gzip_bytes']:>11,} {row['gzip_ms']:>9.0f}"
+                if 'br_bytes' in row:
+                    compressed += f" {row['br_bytes']:>11,} {row['br_ms']:>8.0f}"
+            print(f"{size:>9,} {row['callback']:15} {row['mode']:16} {row['callback_ms']:>11.0f} "
+                  f"{row['serialize_ms']:>14.0f} {row['bytes']:>12,} {compressed}")
+
+
+if __name__ == '__main__':
+    main()
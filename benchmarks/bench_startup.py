@@ -0,0 +1,106 @@
+"""Холодный старт бота: профиль импорта и время до первого ответа.
+
+Профиль строится по `python -X importtime -c "import main"`. Затем бот
+запускается против локального Bot API, в очереди которого уже лежит
+команда /start; замеряется время от запуска процесса до ответа. При
+превышении бюджета скрипт завершается с кодом 1.
+
+    python benchmarks/bench_startup.py --budget-ms 8000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_bot_api import FakeBotAPI, serve  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Пакеты, которые бот не должен загружать до первого обращения к дашборду
+HEAVY_PACKAGES = ('dash', 'plotly', 'pandas', 'flask')
+CHAT_ID = 42
+
+
+def bot_env(**extra):
+    env = dict(os.environ)
+    env['TOKEN'] = env.get('TOKEN') or '123456:' + 'A' * 35
+    env.pop('WEBHOOK_URL', None)
+    env.update(extra)
+    return env
+
+
+def import_profile(top):
+    """Суммарное время импорта по корневым пакетам, мс"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         f"import main, sys; print(','.join(m for m in {HEAVY_PACKAGES!r} if m in sys.modules))"],
+        cwd=ROOT, env=bot_env(), capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        sys.exit(f"Ошибка импорта main:\n{proc.stderr[-2000:]}")
+    packages = defaultdict(int)
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        packages[name.split('.')[0]] += int(self_us)
+        if name == 'main':
+            total = int(cumulative_us)
+    heavy = [m for m in proc.stdout.strip().split(',') if m]
+    return total / 1000, sorted(((us / 1000, name) for name, us in packages.items()), reverse=True)[:top], heavy
+
+
+async def first_update_latency(port, timeout):
+    """Время от запуска процесса бота до ответа на /start, с"""
+    replied = asyncio.Event()
+    api = FakeBotAPI(on_reply=lambda method, chat_id, payload: chat_id == CHAT_ID and replied.set())
+    runner = await serve(api, '127.0.0.1', port)
+    api.push_message(CHAT_ID, '/start')
+    started = time.perf_counter()
+    bot = subprocess.Popen(
+        [sys.executable, 'main.py'], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=bot_env(TELEGRAM_API_BASE=f"http://127.0.0.1:{port}"),
+    )
+    try:
+        await asyncio.wait_for(replied.wait(), timeout)
+        return time.perf_counter() - started
+    finally:
+        bot.terminate()
+        try:
+            bot.wait(10)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер холодного старта бота")
+    parser.add_argument('--budget-ms', type=float, default=8000.0, help="Бюджет времени до первого ответа, мс")
+    parser.add_argument('--runs', type=int, default=3, help="Число запусков бота")
+    parser.add_argument('--top', type=int, default=10, help="Пакетов в профиле импорта")
+    parser.add_argument('--api-port', type=int, default=8998, help="Порт локального Bot API")
+    args = parser.parse_args()
+
+    total_ms, packages, heavy = import_profile(args.top)
+    print(f"Импорт main: {total_ms:.0f} мс")
+    for ms, name in packages:
+        print(f"  {name:30} {ms:8.0f} мс")
+    if heavy:
+        print(f"ВНИМАНИЕ: при импорте main загружены {', '.join(heavy)}")
+
+    latencies = [asyncio.run(first_update_latency(args.api_port, args.budget_ms / 1000 * 3)) * 1000
+                 for _ in range(args.runs)]
+    best = min(latencies)
+    print(f"\nДо первого ответа: {', '.join(f'{ms:.0f}' for ms in latencies)} мс (лучший {best:.0f} мс)")
+    print(f"Бюджет: {args.budget_ms:.0f} мс")
+    if best > args.budget_ms or heavy:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
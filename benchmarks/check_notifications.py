@@ -0,0 +1,146 @@
+"""Проверка очереди уведомлений против локального Bot API с ошибками.
+
+NotificationQueue отправляет сообщения настоящим aiogram-ботом в
+FakeBotAPI, который по команде отвечает 429 (retry_after) и 5xx.
+Проверяются:
+
+- склейка подряд идущих уведомлений в один чат и отдельная отправка
+  отчетов (send) без склейки;
+- порядок сообщений чата после 429 и ожидание retry_after;
+- повтор после 5xx с экспоненциальной задержкой и отказ после
+  MAX_RETRIES попыток без потери следующих сообщений чата;
+- ошибка в одном чате не задерживает остальные.
+
+Задержка повторов уменьшается параметром --backoff, чтобы проверка шла
+секунды. При нарушении скрипт завершается с кодом 1.
+
+    python benchmarks/check_notifications.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+
+import notifications  # noqa: E402
+from fake_bot_api import FakeBotAPI, serve  # noqa: E402
+from notifications import NotificationQueue  # noqa: E402
+
+TOKEN = '123456:' + 'A' * 35
+COALESCED, LIMITED, FLAKY, BROKEN, BYSTANDER = 101, 102, 103, 104, 105
+
+
+class Deliveries:
+    """Сообщения, принятые Bot API, по чатам с временем приема"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.chats = {}
+
+    def __call__(self, method, chat_id, payload):
+        self.chats.setdefault(chat_id, []).append((payload.get('text'), time.monotonic() - self.started))
+
+    def texts(self, chat_id):
+        return [text for text, _ in self.chats.get(chat_id, [])]
+
+    def first_at(self, chat_id):
+        return self.chats[chat_id][0][1]
+
+
+def check(condition, message, failures):
+    print(f"{'OK  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+async def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+    return predicate()
+
+
+async def run(args):
+    notifications.BACKOFF_BASE = args.backoff
+    deliveries = Deliveries()
+    api = FakeBotAPI(on_reply=deliveries, retry_after=args.retry_after)
+    runner = await serve(api, '127.0.0.1', args.port)
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{args.port}")))
+    queue = NotificationQueue(bot)
+    failures = []
+    try:
+        # Сообщения ставятся в очередь до запуска: уведомления одного чата склеиваются
+        for i in range(5):
+            queue.notify(COALESCED, f"Низкий запас {i}")
+        queue.send(COALESCED, "Отчет")
+        queue.notify(COALESCED, "После отчета")
+
+        api.inject(LIMITED, 429)
+        for i in range(3):
+            queue.send(LIMITED, f"Заявка {i}")
+
+        api.inject(FLAKY, 500, times=2)
+        queue.send(FLAKY, "Акт")
+
+        api.inject(BROKEN, 502, times=notifications.MAX_RETRIES + 1)
+        queue.send(BROKEN, "Потерянное")
+        queue.send(BROKEN, "Следующее")
+
+        queue.send(BYSTANDER, "Соседний чат")
+
+        queue.start()
+        expected = {COALESCED: 3, LIMITED: 3, FLAKY: 1, BROKEN: 1, BYSTANDER: 1}
+        done = await wait_for(
+            lambda: all(len(deliveries.texts(chat)) >= count for chat, count in expected.items()), args.timeout
+        )
+        check(done, "все ожидаемые сообщения доставлены", failures)
+
+        texts = deliveries.texts(COALESCED)
+        check(texts == ["\n\n".join(f"Низкий запас {i}" for i in range(5)), "Отчет", "После отчета"],
+              f"5 уведомлений склеены в одно, отчет не склеивается: {len(texts)} сообщений", failures)
+
+        check(deliveries.texts(LIMITED) == [f"Заявка {i}" for i in range(3)],
+              "после 429 порядок сообщений чата сохранен", failures)
+        check(LIMITED in deliveries.chats and deliveries.first_at(LIMITED) >= args.retry_after * 0.9,
+              f"после 429 повтор не раньше retry_after={args.retry_after} с", failures)
+
+        backoff = args.backoff * (1 + 2)
+        check(deliveries.texts(FLAKY) == ["Акт"] and deliveries.first_at(FLAKY) >= backoff * 0.9,
+              f"после двух 500 доставлено с третьей попытки, задержка не меньше {backoff:.2f} с", failures)
+
+        check(deliveries.texts(BROKEN) == ["Следующее"] and queue.failed == 1,
+              f"после {notifications.MAX_RETRIES} повторов сообщение отброшено, следующее доставлено", failures)
+
+        check(BYSTANDER in deliveries.chats and deliveries.first_at(BYSTANDER) < args.retry_after / 2,
+              "ошибки других чатов не задерживают соседний чат", failures)
+
+        check(api.errors[429] == 1 and api.errors[500] == 2 and api.errors[502] == notifications.MAX_RETRIES + 1,
+              f"Bot API вернул ошибки: {dict(api.errors)}", failures)
+        check(queue.pending == 0 and queue.sent == sum(expected.values()), f"очередь пуста, отправлено {queue.sent}", failures)
+    finally:
+        await queue.stop(timeout=1)
+        await bot.session.close()
+        await runner.cleanup()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Очередь уведомлений против Bot API с ошибками 429 и 5xx")
+    parser.add_argument('--port', type=int, default=8998)
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after в ответе 429, с")
+    parser.add_argument('--backoff', type=float, default=0.05, help="BACKOFF_BASE на время проверки, с")
+    parser.add_argument('--timeout', type=float, default=30, help="Предельное время проверки, с")
+    args = parser.parse_args()
+    failures = asyncio.run(run(args))
+    print(f"\n{'Нарушений: ' + str(len(failures)) if failures else 'Все проверки пройдены'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""Локальная замена Telegram Bot API для нагрузочных проверок.
+
+Поддерживает getUpdates (long polling), sendMessage, answerCallbackQuery,
+sendDocument и отвечает успехом на остальные методы. Обновления ставятся
+в очередь методами push_message/push_callback, ответы бота передаются
+в обработчик on_reply(method, chat_id, payload).
+
+Ошибки Telegram имитируются для отправок в чат: inject(chat_id, 429 или
+5xx, times) отвечает ошибкой на следующие times отправок (429 - с
+retry_after), --error-rate - на случайную долю всех отправок.
+
+    python benchmarks/fake_bot_api.py --port 8999
+    python benchmarks/fake_bot_api.py --port 8999 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter, deque
+
+from aiohttp import web
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+class FakeBotAPI:
+    def __init__(self, on_reply=None, error_rate=0.0, retry_after=1):
+        self.on_reply = on_reply
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.faults = {}     # id чата -> deque кодов ошибок для следующих отправок
+        self.errors = Counter()
+        self.updates = deque()
+        self.calls = Counter()
+        self.polling = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+        self._callback_chats = {}
+        self._new = asyncio.Event()
+
+    # ---------- очередь обновлений ----------
+    def _user(self, chat_id):
+        return {'id': chat_id, 'is_bot': False, 'first_name': f'user{chat_id}'}
+
+    def _chat(self, chat_id):
+        return {'id': chat_id, 'type': 'private'}
+
+    def _push(self, update):
+        update['update_id'] = next(self._update_ids)
+        self.updates.append(update)
+        self._new.set()
+        return update['update_id']
+
+    def push_message(self, chat_id, text):
+        entities = []
+        if text.startswith('/'):
+            entities.append({'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])})
+        return self._push({'message': {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': self._chat(chat_id),
+            'from': self._user(chat_id),
+            'text': text,
+            'entities': entities,
+        }})
+
+    def push_callback(self, chat_id, data):
+        callback_id = str(next(self._callback_ids))
+        self._callback_chats[callback_id] = chat_id
+        return self._push({'callback_query': {
+            'id': callback_id,
+            'from': self._user(chat_id),
+            'chat_instance': str(chat_id),
+            'data': data,
+            'message': {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': self._chat(chat_id),
+                'from': BOT_USER,
+                'text': 'Аналитический дашборд',
+            },
+        }})
+
+    # ---------- имитация ошибок ----------
+    def inject(self, chat_id, status, times=1):
+        """Следующие times отправок в чат получат ошибку status (429 или 5xx)"""
+        self.faults.setdefault(chat_id, deque()).extend([status] * times)
+
+    def _fault(self, chat_id):
+        faults = self.faults.get(chat_id)
+        if faults:
+            return faults.popleft()
+        if self.error_rate and random.random() < self.error_rate:
+            return random.choice((429, 500, 502))
+        return None
+
+    def _error(self, status):
+        self.errors[status] += 1
+        if status == 429:
+            return web.json_response({
+                'ok': False, 'error_code': 429,
+                'description': f"Too Many Requests: retry after {self.retry_after}",
+                'parameters': {'retry_after': self.retry_after},
+            }, status=429)
+        return web.json_response({'ok': False, 'error_code': status, 'description': 'Internal Server Error'}, status=status)
+
+    # ---------- методы Bot API ----------
+    async def get_updates(self, payload):
+        offset = int(payload.get('offset') or 0)
+        limit = int(payload.get('limit') or 100)
+        timeout = float(payload.get('timeout') or 0)
+        self.polling.set()
+        while self.updates and self.updates[0]['update_id'] < offset:
+            self.updates.popleft()
+        if not self.updates and timeout:
+            self._new.clear()
+            try:
+                await asyncio.wait_for(self._new.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self.updates, limit))
+
+    def _sent_message(self, chat_id, **fields):
+        return dict(fields, message_id=next(self._message_ids), date=int(time.time()),
+                    chat=self._chat(chat_id), **{'from': BOT_USER})
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            payload = await request.json()
+        else:
+            payload = await request.post()
+        name = method.lower()
+        self.calls[method] += 1
+
+        if name == 'getupdates':
+            result = await self.get_updates(payload)
+        elif name == 'getme':
+            result = BOT_USER
+        elif name in ('sendmessage', 'senddocument', 'sendphoto'):
+            chat_id = int(payload['chat_id'])
+            status = self._fault(chat_id)
+            if status is not None:
+                return self._error(status)
+            if name == 'sendmessage':
+                result = self._sent_message(chat_id, text=payload.get('text', ''))
+            elif name == 'senddocument':
+                result = self._sent_message(chat_id, document={'file_id': 'doc', 'file_unique_id': 'doc'})
+            else:
+                result = self._sent_message(chat_id, photo=[{'file_id': 'photo', 'file_unique_id': 'photo', 'width': 1, 'height': 1}])
+            self._reply(method, chat_id, payload)
+        elif name == 'answercallbackquery':
+            result = True
+            self._reply(method, self._callback_chats.pop(payload.get('callback_query_id'), None), payload)
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    def _reply(self, method, chat_id, payload):
+        if self.on_reply is not None:
+            self.on_reply(method, chat_id, payload)
+
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+
+
+async def serve(api, host, port):
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена Telegram Bot API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8999)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Доля отправок, получающих 429 или 5xx")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after в ответах 429, с")
+    args = parser.parse_args()
+    web.run_app(FakeBotAPI(error_rate=args.error_rate, retry_after=args.retry_after).app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""Сквозная нагрузочная проверка бота через локальный Bot API.
+
+Бот (main.py) запускается отдельным процессом и получает обновления от
+FakeBotAPI. Генератор имитирует тысячи пользователей: каждый отправляет
+команду из смеси сценария и ждет ответа, поэтому задержка измеряется от
+постановки обновления до ответа бота. Одновременно клиенты опрашивают
+колбэк дашборда. Частота запросов растет ступенями до точки насыщения.
+
+    python benchmarks/load_test.py --scenario benchmarks/scenarios/mixed.json
+    python benchmarks/load_test.py --stages 20,50,100 --stage-seconds 10 --json result.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import deque
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_bot_api import FakeBotAPI, serve  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCENARIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios', 'mixed.json')
+MANAGER_CHAT_ID = -100  # уведомления о запасах не смешиваются с ответами пользователям
+SEED_WORKERS = 50
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class ProcessCPU:
+    """Загрузка CPU процесса бота по /proc (только Linux)"""
+
+    def __init__(self, pid):
+        self.path = f"/proc/{pid}/stat"
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self._last = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.ticks, time.monotonic()
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def percent(self):
+        current = self._read()
+        if current is None or self._last is None:
+            return None
+        (cpu, wall), (last_cpu, last_wall) = current, self._last
+        self._last = current
+        return (cpu - last_cpu) / (wall - last_wall) * 100 if wall > last_wall else 0.0
+
+
+class LoadGenerator:
+    def __init__(self, api, scenario, timeout):
+        self.api = api
+        self.scenario = scenario
+        self.timeout = timeout
+        self.catalog = scenario['catalog']
+        self.waiting = {}  # id чата -> (начало, тип, future)
+        self.idle = deque(range(1000, 1000 + scenario['users']))
+        self.actions = scenario['mix']
+        self.weights = [action['weight'] for action in self.actions]
+        self.dash_latencies = []
+        self.dash_errors = 0
+        self.stray = 0
+        api.on_reply = self.on_reply
+
+    def on_reply(self, method, chat_id, payload):
+        entry = self.waiting.get(chat_id)
+        if entry is None:
+            self.stray += 1
+            return
+        start, kind, future = entry
+        # Для кнопок запрос завершает answerCallbackQuery, для команд - первое сообщение
+        if (kind == 'callback') != (method == 'answerCallbackQuery'):
+            return
+        del self.waiting[chat_id]
+        if not future.done():
+            future.set_result(time.perf_counter() - start)
+
+    async def request(self, chat_id, action):
+        future = asyncio.get_running_loop().create_future()
+        if 'callback' in action:
+            self.waiting[chat_id] = (time.perf_counter(), 'callback', future)
+            self.api.push_callback(chat_id, action['callback'])
+        else:
+            self.waiting[chat_id] = (time.perf_counter(), 'message', future)
+            self.api.push_message(chat_id, action['text'].format(sku=random.randrange(self.catalog)))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.waiting.pop(chat_id, None)
+            return None
+
+    async def seed(self):
+        """Заполнение каталога командами /add"""
+        skus = iter(range(self.catalog))
+
+        async def worker(chat_id):
+            for sku in skus:
+                await self.request(chat_id, {'text': f"/add Товар {sku}, SKU-{sku}, 100000, 1000, 2030-12-31"})
+
+        await asyncio.gather(*(worker(chat_id) for chat_id in range(1, SEED_WORKERS + 1)))
+
+    async def _user_request(self, chat_id, latencies, counters):
+        action = random.choices(self.actions, self.weights)[0]
+        latency = await self.request(chat_id, action)
+        if latency is None:
+            counters['timeouts'] += 1
+        else:
+            latencies.append(latency)
+        self.idle.append(chat_id)
+
+    async def run_stage(self, rate, seconds):
+        """Открытая нагрузка: rate запросов в секунду от свободных пользователей"""
+        latencies, counters, tasks = [], {'timeouts': 0, 'skipped': 0}, set()
+        self.dash_latencies, self.dash_errors = [], 0
+        started = next_at = time.perf_counter()
+        end = started + seconds
+        offered = 0
+        while next_at < end:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            offered += 1
+            next_at += 1 / rate
+            if not self.idle:
+                counters['skipped'] += 1
+                continue
+            task = asyncio.create_task(self._user_request(self.idle.popleft(), latencies, counters))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        return {
+            'rate': rate,
+            'offered': offered,
+            'completed': len(latencies),
+            'throughput': len(latencies) / elapsed,
+            'timeouts': counters['timeouts'],
+            'skipped': counters['skipped'],
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'dash_polls': len(self.dash_latencies),
+            'dash_errors': self.dash_errors,
+            'dash_p50_ms': percentile(self.dash_latencies, 0.5) * 1000,
+            'dash_p99_ms': percentile(self.dash_latencies, 0.99) * 1000,
+        }
+
+
+# ================== КЛИЕНТЫ ДАШБОРДА ==================
+async def dash_request_body(session, base_url, timeout=60):
+    """Тело запроса колбэка с dcc.Interval по описанию зависимостей Dash"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(f"{base_url}/_dash-dependencies") as response:
+                dependencies = await response.json()
+            break
+        except (aiohttp.ClientError, ValueError):
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+    for dependency in dependencies:
+        inputs = dependency['inputs']
+        if any(i['property'] == 'n_intervals' for i in inputs):
+            outputs = [
+                dict(zip(('id', 'property'), part.rsplit('.', 1)))
+                for part in dependency['output'].strip('.').split('...')
+            ]
+            return {
+                'output': dependency['output'],
+                'outputs': outputs,
+                'inputs': [dict(i, value=1) for i in inputs],
+                'changedPropIds': [f"{i['id']}.{i['property']}" for i in inputs],
+                'state': [],
+            }
+    raise RuntimeError("Колбэк с dcc.Interval не найден")
+
+
+async def dash_client(generator, session, base_url, body, interval):
+    while True:
+        start = time.perf_counter()
+        try:
+            async with session.post(f"{base_url}/_dash-update-component", json=body) as response:
+                await response.read()
+                if response.status == 200:
+                    generator.dash_latencies.append(time.perf_counter() - start)
+                else:
+                    generator.dash_errors += 1
+        except aiohttp.ClientError:
+            generator.dash_errors += 1
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+
+# ================== ЗАПУСК ==================
+def start_bot(api_port, log_path):
+    env = dict(os.environ)
+    env.update({
+        'TOKEN': env.get('TOKEN') or '123456:' + 'A' * 35,
+        'TELEGRAM_API_BASE': f"http://127.0.0.1:{api_port}",
+        'MANAGER_CHAT_ID': str(MANAGER_CHAT_ID),
+    })
+    env.pop('WEBHOOK_URL', None)
+    log = open(log_path, 'w') if log_path else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def print_stage(stage, cpu):
+    print(
+        f"{stage['rate']:>7} {stage['throughput']:>9.1f} {stage['p50_ms']:>9.1f} {stage['p99_ms']:>9.1f} "
+        f"{stage['timeouts']:>8} {stage['skipped']:>8} {stage['dash_p50_ms']:>9.1f} {stage['dash_p99_ms']:>9.1f} "
+        f"{cpu if cpu is not None else '—':>6}", flush=True
+    )
+
+
+async def run(args, scenario):
+    api = FakeBotAPI()
+    runner = await serve(api, '127.0.0.1', args.api_port)
+    generator = LoadGenerator(api, scenario, args.timeout)
+    bot = None if args.external else start_bot(args.api_port, args.bot_log)
+    cpu = ProcessCPU(bot.pid) if bot is not None else None
+    clients = []
+    try:
+        await asyncio.wait_for(api.polling.wait(), 60)
+        print(f"Бот подключен, заполнение каталога: {generator.catalog} SKU...", flush=True)
+        started = time.perf_counter()
+        await generator.seed()
+        print(f"Каталог заполнен за {time.perf_counter() - started:.1f} с\n", flush=True)
+
+        session = aiohttp.ClientSession()
+        body = await dash_request_body(session, args.dash_url)
+        clients = [
+            asyncio.create_task(dash_client(generator, session, args.dash_url, body, scenario['dash_interval']))
+            for _ in range(scenario['dash_clients'])
+        ]
+
+        print(f"{'rate':>7} {'ответов/с':>9} {'p50, мс':>9} {'p99, мс':>9} {'таймаут':>8} {'пропуск':>8} "
+              f"{'dash p50':>9} {'dash p99':>9} {'CPU %':>6}")
+        stages, saturation = [], None
+        if cpu is not None:
+            cpu.percent()
+        for rate in scenario['stages']:
+            stage = await generator.run_stage(rate, scenario['stage_seconds'])
+            stage['cpu_percent'] = round(cpu.percent(), 1) if cpu is not None else None
+            stages.append(stage)
+            print_stage(stage, stage['cpu_percent'])
+            if stage['completed'] < 0.9 * stage['offered'] or stage['p99_ms'] > args.slo_ms:
+                saturation = rate
+                break
+
+        if saturation is None:
+            print(f"\nНасыщение не достигнуто (до {scenario['stages'][-1]} запросов/с)")
+        else:
+            print(f"\nТочка насыщения: {saturation} запросов/с "
+                  f"(ответов меньше 90% или p99 выше {args.slo_ms:.0f} мс)")
+        print(f"Вызовы Bot API: {dict(api.calls)}; сообщений вне ожидания: {generator.stray}")
+
+        for task in clients:
+            task.cancel()
+        await session.close()
+        return {'scenario': scenario, 'stages': stages, 'saturation_rate': saturation, 'api_calls': dict(api.calls)}
+    finally:
+        for task in clients:
+            task.cancel()
+        if bot is not None:
+            bot.terminate()
+            try:
+                bot.wait(10)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сквозная нагрузочная проверка бота")
+    parser.add_argument('--scenario', default=DEFAULT_SCENARIO, help="JSON-файл сценария")
+    parser.add_argument('--stages', help="Ступени частоты запросов через запятую (переопределяет сценарий)")
+    parser.add_argument('--stage-seconds', type=float, help="Длительность ступени, с")
+    parser.add_argument('--users', type=int, help="Число имитируемых пользователей")
+    parser.add_argument('--catalog', type=int, help="Размер каталога")
+    parser.add_argument('--api-port', type=int, default=8999, help="Порт локального Bot API")
+    parser.add_argument('--dash-url', default='http://127.0.0.1:8050', help="Адрес дашборда бота")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Ожидание ответа, с")
+    parser.add_argument('--slo-ms', type=float, default=1000.0, help="Допустимая p99 задержка, мс")
+    parser.add_argument('--external', action='store_true', help="Бот уже запущен с TELEGRAM_API_BASE на этот порт")
+    parser.add_argument('--bot-log', help="Файл для вывода процесса бота")
+    parser.add_argument('--json', help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    with open(args.scenario, encoding='utf-8') as f:
+        scenario = json.load(f)
+    if args.stages:
+        scenario['stages'] = [int(s) for s in args.stages.split(',')]
+    for key in ('stage_seconds', 'users', 'catalog'):
+        if getattr(args, key) is not None:
+            scenario[key] = getattr(args, key)
+
+    result = asyncio.run(run(args, scenario))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
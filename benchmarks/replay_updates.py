@@ -0,0 +1,121 @@
+"""Воспроизведение обновлений Telegram на webhook бота с заданной частотой.
+
+Обновления берутся из JSONL-файла (по одному Update на строку) или
+генерируются синтетически. По окончании выводятся время ответа webhook
+и пропускная способность обработки по данным /stats.
+
+    python benchmarks/replay_updates.py --url http://127.0.0.1:8080/webhook --rate 500 --count 5000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+import aiohttp
+
+COMMANDS = ['/list', '/report', '/info SKU-{n}', '/sell SKU-{n}, 1, 1500', '/add Товар {n}, SKU-{n}, 10, 1000, 2025-12-31']
+
+
+def synthetic_updates(count, chats):
+    """Синтетическая смесь команд от chats пользователей"""
+    for update_id in range(1, count + 1):
+        chat_id = random.randint(1, chats)
+        text = random.choice(COMMANDS).format(n=random.randint(1, 100))
+        command = text.split()[0]
+        yield {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': f'user{chat_id}'},
+                'text': text,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+            },
+        }
+
+
+def recorded_updates(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)] if ordered else 0.0
+
+
+async def replay(url, updates, rate, concurrency, secret=None):
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    latencies, statuses = [], {}
+    slots = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async def post(update):
+            async with slots:
+                started = time.perf_counter()
+                async with session.post(url, json=update) as response:
+                    await response.read()
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+                latencies.append(time.perf_counter() - started)
+
+        async with session.get(url + '/stats') as response:
+            before = (await response.json())['processed']
+
+        started = time.perf_counter()
+        tasks = []
+        for i, update in enumerate(updates):
+            # Равномерная подача с частотой rate обновлений в секунду
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(post(update)))
+        await asyncio.gather(*tasks)
+        sent_time = time.perf_counter() - started
+
+        accepted = statuses.get(200, 0)
+        while True:
+            async with session.get(url + '/stats') as response:
+                stats = await response.json()
+            if stats['processed'] + stats['failed'] - before >= accepted or time.perf_counter() - started > 300:
+                break
+            await asyncio.sleep(0.05)
+        total_time = time.perf_counter() - started
+
+    return {
+        'sent': len(latencies),
+        'statuses': statuses,
+        'send_seconds': round(sent_time, 3),
+        'offered_rate': round(len(latencies) / sent_time, 1) if sent_time else 0,
+        'processed_rate': round(accepted / total_time, 1) if total_time else 0,
+        'webhook_p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'webhook_p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'handler_failures': stats['failed'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080/webhook')
+    parser.add_argument('--file', help='JSONL с записанными обновлениями')
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--chats', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=200, help='обновлений в секунду')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--secret')
+    args = parser.parse_args()
+
+    if args.file:
+        updates = itertools.islice(recorded_updates(args.file), args.count)
+    else:
+        updates = synthetic_updates(args.count, args.chats)
+    result = asyncio.run(replay(args.url, updates, args.rate, args.concurrency, args.secret))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
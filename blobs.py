@@ -0,0 +1,60 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+# ================== ФАЙЛОВОЕ ХРАНИЛИЩЕ ==================
+CHUNK_SIZE = 1 << 16
+
+
+class BlobStore:
+    """Файлы (фотоотчеты) в каталоге по хешу содержимого.
+
+    Имя файла - sha256 содержимого, разложенный по подкаталогам из первых
+    двух символов. Повторная загрузка того же файла ничего не пишет, а
+    возвращает тот же ключ. Запись идет через временный файл рядом с
+    итоговым, поэтому недописанный файл никогда не виден под ключом.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put_file(self, source):
+        """Переносит файл source в хранилище; возвращает ключ (hex sha256)"""
+        digest = hashlib.sha256()
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        target = self.path(digest)
+        if os.path.exists(target):
+            os.remove(source)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+        return digest
+
+    def put(self, fileobj):
+        """Сохраняет поток fileobj частями, не читая его в память целиком"""
+        tmp = self.temp_path()
+        try:
+            with open(tmp, 'wb') as f:
+                shutil.copyfileobj(fileobj, f, CHUNK_SIZE)
+            return self.put_file(tmp)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def temp_path(self):
+        """Путь для загрузки файла перед put_file (на том же диске, что и хранилище)"""
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        os.close(fd)
+        return tmp
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+# ================== КЕШ ОТВЕТОВ ==================
+DEFAULT_TTL = 60.0
+DEFAULT_MAXSIZE = 256
+
+
+class ResponseCache:
+    """Кеш отрисованных ответов с TTL и вытеснением давно неиспользуемых.
+
+    Ключ включает версию данных магазина, поэтому любое изменение остатков
+    или продаж сразу дает промах; TTL ограничивает устаревание того, что
+    версией не отслеживается (например, сроков годности). Одновременные
+    запросы с одинаковым ключом ждут один общий расчет.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, maxsize=DEFAULT_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # ключ -> (истекает, значение)
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key, compute, *args):
+        """Значение из кеша или результат await compute(*args)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await compute(*args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # ожидающих может не быть
+            raise
+        finally:
+            del self._inflight[key]
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+        }
+
+
+class VersionCache:
+    """Результаты расчетов по версии набора данных (прогнозы, сравнения периодов).
+
+    Значение считается один раз на версию; хранятся несколько последних версий.
+    """
+
+    def __init__(self, maxsize=4):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, version, compute, *args, **kwargs):
+        entry = self._entries.get(version)
+        if entry is None:
+            entry = self._entries[version] = compute(*args, **kwargs)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(version)
+        return entry
@@ -0,0 +1,94 @@
+import json
+import re
+from functools import lru_cache
+
+# ================== СЛОВАРЬ КАТЕГОРИЙ ==================
+DEFAULT_CATEGORY = 'Другое'
+
+# Внутри одного совпадения побеждает самое длинное слово: "кофеварка" -
+# бытовая техника, хотя в ней есть "кофе". Порядок категорий решает только
+# между разными словами названия ("кофе и чайник" - продукты)
+DEFAULT_CATEGORIES = {
+    'Электроника': ['телефон', 'смартфон', 'ноутбук', 'планшет', 'наушник', 'iphone', 'samsung', 'телевизор', 'монитор'],
+    'Продукты': ['кофе', 'чай', 'молоко', 'сок', 'хлеб', 'сыр', 'шоколад', 'вода'],
+    'Одежда': ['футболка', 'джинсы', 'куртка', 'кроссовки', 'платье', 'рубашка', 'nike', 'adidas'],
+    'Бытовая техника': ['кофеварка', 'миксер', 'пылесос', 'чайник', 'холодильник', 'утюг', 'микроволнов'],
+    'Мебель': ['стол', 'стул', 'шкаф', 'диван', 'кресло', 'полка', 'ikea'],
+}
+
+
+def _normalize(name):
+    return ' '.join(name.lower().split())
+
+
+def _trie_pattern(words):
+    """Регулярное выражение в виде префиксного дерева слов.
+
+    Общие префиксы проверяются один раз, поэтому стоимость поиска почти не
+    зависит от числа слов. Необязательные хвосты жадные - совпадает самое
+    длинное слово ("кофеварка", а не "кофе").
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+class CategoryClassifier:
+    """Определение категории по ключевым словам в названии.
+
+    Все ключевые слова компилируются в одно регулярное выражение-дерево,
+    поэтому название просматривается один раз независимо от размера словаря.
+    finditer возвращает непересекающиеся совпадения, каждое - самое длинное
+    слово в своем месте; более короткое слово внутри него ("кофе" в
+    "кофеварка") не рассматривается, даже если его категория выше по
+    порядку. Между найденными словами выбирается категория, стоящая в
+    словаре раньше. Результаты кешируются по нормализованному названию.
+    """
+
+    def __init__(self, categories=None, cache_size=65536):
+        categories = categories or DEFAULT_CATEGORIES
+        self._category = {}
+        self._rank = {}
+        for rank, (category, keywords) in enumerate(categories.items()):
+            for keyword in keywords:
+                keyword = _normalize(keyword)
+                if keyword and keyword not in self._category:
+                    self._category[keyword] = category
+                    self._rank[keyword] = rank
+        self._pattern = re.compile(_trie_pattern(self._category)) if self._category else None
+        self._cached = lru_cache(maxsize=cache_size)(self._classify)
+
+    @classmethod
+    def from_file(cls, path):
+        """Словарь из JSON-файла вида {"Категория": ["слово", ...]}"""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _classify(self, normalized):
+        if self._pattern is None:
+            return DEFAULT_CATEGORY
+        best = None
+        # Только самые длинные непересекающиеся слова; из них - по порядку категорий
+        for match in self._pattern.finditer(normalized):
+            keyword = match.group()
+            if best is None or self._rank[keyword] < self._rank[best]:
+                best = keyword
+        return self._category[best] if best else DEFAULT_CATEGORY
+
+    def classify(self, name):
+        return self._cached(_normalize(name))
+
+    def classify_many(self, names):
+        return [self.classify(name) for name in names]
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from forecasting import period_matrix
+
+# ================== СРАВНЕНИЕ ПЕРИОДОВ ==================
+# Частота -> {сравнение: сдвиг в периодах этой частоты}
+COMPARISONS = {
+    'M': {'mom': 1, 'yoy': 12},
+    'Q': {'qoq': 1, 'yoy': 4},
+    'Y': {'yoy': 1},
+}
+COMPARISON_NAMES = {'mom': 'м/м', 'qoq': 'кв/кв', 'yoy': 'г/г'}
+# Период анализа дашборда -> частота
+PERIOD_FREQ = {'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+
+
+def shifted_change(Y, lag):
+    """Изменение к тому же ряду lag периодов назад: (прошлое, дельта, рост %).
+
+    Сдвиг идет по столбцам плотной матрицы, поэтому пропущенный в данных
+    месяц дает ноль, а не соседний месяц. Рост не определен (NaN), если
+    прошлого периода нет в наборе или в нем не было продаж.
+    """
+    previous = np.full(Y.shape, np.nan)
+    if lag < Y.shape[1]:
+        previous[:, lag:] = Y[:, :-lag]
+    delta = Y - previous
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(previous > 0, delta / previous * 100, np.nan)
+    return previous, delta, growth
+
+
+class PeriodComparison:
+    """Сравнения периодов (м/м, кв/кв, г/г), рассчитанные один раз на набор данных.
+
+    Для каждого уровня (например, категория; категория и товар) и частоты
+    суммы лежат в матрице ряды x периоды, а сравнения - ее сдвиги. Чтение
+    (последний период, значения для строк таблицы) идет по этим массивам
+    без повторной группировки исходных строк.
+    """
+
+    def __init__(self, df, levels, value='revenue', date='date'):
+        self.levels = {}
+        for level, keys in levels.items():
+            for freq, comparisons in COMPARISONS.items():
+                series, periods, Y = period_matrix(df, keys, value, date, freq)
+                columns = {'value': Y.astype(np.float32)}
+                for name, lag in comparisons.items():
+                    _, delta, growth = shifted_change(Y, lag)
+                    columns[name] = delta.astype(np.float32)
+                    columns[f"{name}_pct"] = growth.astype(np.float32)
+                self.levels[level, freq] = (keys, series, periods, columns)
+
+    def latest(self, level, freq):
+        """Последний период набора по всем рядам уровня: (период, DataFrame)"""
+        keys, series, periods, columns = self.levels[level, freq]
+        frame = series.copy()
+        for name, values in columns.items():
+            frame[name] = values[:, -1]
+        return periods[-1], frame
+
+    def lookup(self, level, freq, column, df, date='date'):
+        """Значение column для каждой строки df по ее ряду и периоду (NaN, если нет)"""
+        keys, series, periods, columns = self.levels[level, freq]
+        index = pd.MultiIndex.from_frame(series).get_indexer(pd.MultiIndex.from_frame(df[keys]))
+        offset = pd.PeriodIndex(df[date].dt.to_period(freq)).asi8 - periods[0].ordinal
+        found = (index >= 0) & (offset >= 0) & (offset < len(periods))
+        result = np.full(len(df), np.nan, dtype=np.float32)
+        result[found] = columns[column][index[found], offset[found]]
+        return result
@@ -0,0 +1,152 @@
+# ================== СЕБЕСТОИМОСТЬ ==================
+FIFO = 'fifo'
+AVERAGE = 'average'
+COST_METHODS = (FIFO, AVERAGE)
+
+
+class FifoLayers:
+    """Партии одного SKU в порядке прихода.
+
+    Партии хранятся плоским списком [количество, цена, ...] с указателем
+    на самую старую; израсходованные партии отрезаются пачкой, поэтому
+    каждая партия добавляется и удаляется один раз - списание стоит
+    амортизированно O(1).
+    """
+
+    __slots__ = ('lots', 'head', 'quantity', 'value')
+
+    def __init__(self):
+        self.lots = []
+        self.head = 0
+        self.quantity = 0
+        self.value = 0.0
+
+    def receive(self, quantity, unit_cost):
+        if quantity <= 0:
+            return
+        lots = self.lots
+        if len(lots) > self.head and lots[-1] == unit_cost:
+            lots[-2] += quantity
+        else:
+            lots += (quantity, unit_cost)
+        self.quantity += quantity
+        self.value += quantity * unit_cost
+
+    def consume(self, quantity):
+        """Списание из самых старых партий; возвращает себестоимость"""
+        lots, head = self.lots, self.head
+        taken = remaining = min(quantity, self.quantity)
+        cost = 0.0
+        while remaining > 0:
+            available, unit_cost = lots[head], lots[head + 1]
+            if available > remaining:
+                lots[head] = available - remaining
+                cost += remaining * unit_cost
+                break
+            cost += available * unit_cost
+            remaining -= available
+            head += 2
+        self.quantity -= taken
+        if not self.quantity:
+            # Пустой остаток заодно сбрасывает накопленную ошибку округления
+            lots.clear()
+            self.head = 0
+            self.value = 0.0
+            return cost
+        if head > 32 and head * 2 > len(lots):
+            del lots[:head]
+            head = 0
+        self.head = head
+        self.value -= cost
+        return cost
+
+
+class AverageLayers:
+    """Средневзвешенная себестоимость: только остаток и его стоимость"""
+
+    __slots__ = ('quantity', 'value')
+
+    def __init__(self):
+        self.quantity = 0
+        self.value = 0.0
+
+    def receive(self, quantity, unit_cost):
+        if quantity <= 0:
+            return
+        self.quantity += quantity
+        self.value += quantity * unit_cost
+
+    def consume(self, quantity):
+        quantity = min(quantity, self.quantity)
+        if not quantity:
+            return 0.0
+        cost = self.value * quantity / self.quantity
+        self.quantity -= quantity
+        self.value = self.value - cost if self.quantity else 0.0
+        return cost
+
+
+_LAYERS = {FIFO: FifoLayers, AVERAGE: AverageLayers}
+
+
+class CostBook:
+    """Себестоимость остатков магазина по партиям.
+
+    Пока весь остаток SKU куплен по одной цене, партии не заводятся:
+    стоимость равна количеству, умноженному на цену закупки карточки.
+    Слои создаются при первом приходе по другой цене или перед сменой
+    цены закупки. Изменения количества в обход receive/consume
+    (списания, инвентаризация, приемка) учитываются в sync().
+    """
+
+    def __init__(self, method=FIFO):
+        if method not in _LAYERS:
+            raise ValueError(f"Неизвестный метод учета себестоимости: {method}")
+        self.method = method
+        self.layers = {}
+
+    def _layers(self, product, quantity):
+        """Слои SKU, сверенные с остатком quantity до текущей операции"""
+        layers = self.layers.get(product['sku'])
+        if layers is None:
+            layers = self.layers[product['sku']] = _LAYERS[self.method]()
+            layers.receive(quantity, product['price'])
+        elif layers.quantity > quantity:
+            layers.consume(layers.quantity - quantity)
+        elif layers.quantity < quantity:
+            layers.receive(quantity - layers.quantity, product['price'])
+        return layers
+
+    def receive(self, product, quantity, unit_cost):
+        """Приход партии; вызывается после увеличения остатка карточки"""
+        if product['sku'] not in self.layers and unit_cost == product['price']:
+            return
+        self._layers(product, product['quantity'] - quantity).receive(quantity, unit_cost)
+        product['price'] = unit_cost
+
+    def consume(self, product, quantity):
+        """Себестоимость проданного; вызывается после уменьшения остатка"""
+        layers = self.layers.get(product['sku'])
+        if layers is None:
+            return quantity * product['price']
+        return self._layers(product, product['quantity'] + quantity).consume(quantity)
+
+    def freeze(self, product):
+        """Фиксация партий по текущей цене перед ее изменением"""
+        if product['quantity'] > 0:
+            self._layers(product, product['quantity'])
+
+    def sync(self, product):
+        """Сверка слоев с остатком карточки после изменения в обход receive/consume"""
+        layers = self.layers.get(product['sku'])
+        if layers is not None and layers.quantity != product['quantity']:
+            self._layers(product, product['quantity'])
+
+    def value(self, product):
+        """Стоимость остатка SKU по себестоимости"""
+        layers = self.layers.get(product['sku'])
+        return layers.value if layers is not None else product['quantity'] * product['price']
+
+    def unit_cost(self, product):
+        quantity = product['quantity']
+        return self.value(product) / quantity if quantity else product['price']
@@ -1,15 +1,35 @@
 import dash
-from dash import dcc, html, dash_table, Input, Output, State, callback
+from dash import dcc, html, dash_table, Input, Output, State, callback, ClientsideFunction
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import base64
 import io
+import uuid
+from contextlib import nullcontext
+
+from metrics import MetricsRegistry, add_metrics_route
+from cache import VersionCache
+from comparisons import COMPARISON_NAMES, COMPARISONS, PERIOD_FREQ, PeriodComparison
+from datasets import SessionDatasets
+from forecasting import aggregate_forecast, forecast_frame
+from serialization import add_compression, native_outputs, table_records
 
 # Инициализация приложения Dash
 app = dash.Dash(__name__)
 app.title = "Процесс менеджмента товаров для розничной торговли"
+metrics = MetricsRegistry()
+add_metrics_route(app.server, metrics)
+add_compression(app.server)
+# Прогнозы и сравнения периодов считаются один раз на набор данных,
+# фильтры только выбирают и суммируют готовые ряды
+forecasts = VersionCache()
+comparisons = VersionCache()
+# Загруженные продажи по сессиям браузера; новые файлы дописываются к набору
+# сессии без повторного разбора истории
+sessions = SessionDatasets()
 
 # Стили
 styles = {
@@ -42,7 +62,7 @@ styles = {
 }
 
 # Макет приложения
-app.layout = html.Div(style=styles['container'], children=[
+layout = html.Div(style=styles['container'], children=[
     html.Div(style=styles['header'], children=[
         html.H1("📊 Процесс менеджмента товаров для розничной торговли"),
         html.P("Интерактивная панель анализа финансовых показателей розничной торговли")
@@ -55,7 +75,7 @@ app.layout = html.Div(style=styles['container'], children=[
             id='upload-data',
             children=html.Div([
                 'Перетащите или ',
-                html.A('выберите CSV файл')
+                html.A('выберите CSV файлы')
             ]),
             style={
                 'width': '100%',
@@ -67,7 +87,16 @@ app.layout = html.Div(style=styles['container'], children=[
                 'textAlign': 'center',
                 'margin': '10px 0'
             },
-            multiple=False
+            multiple=True
+        ),
+        dcc.RadioItems(
+            id='upload-mode',
+            options=[
+                {'label': 'Заменить данные', 'value': 'replace'},
+                {'label': 'Добавить к загруженным', 'value': 'append'}
+            ],
+            value='replace',
+            inline=True
         ),
         html.Div(id='output-data-upload'),
     ]),
@@ -147,6 +176,10 @@ app.layout = html.Div(style=styles['container'], children=[
         ], style={'width': '19%', 'display': 'inline-block'}),
     ]),
     
+    # Рассчитанные на сервере данные; оформление строится в браузере (assets/dashboard.js)
+    dcc.Store(id='kpi-store'),
+    dcc.Store(id='time-series-store'),
+    
     # Прогресс-бары для индикаторов
     html.Div(style=styles['card'], children=[
         html.H4("📈 Прогресс по целям"),
@@ -211,6 +244,11 @@ app.layout = html.Div(style=styles['container'], children=[
         ], style={'width': '49%', 'display': 'inline-block'}),
     ]),
     
+    # Сравнение с прошлыми периодами
+    html.Div(style=styles['card'], children=[
+        dcc.Graph(id='comparison-chart'),
+    ]),
+    
     # Таблица с финансовыми показателями
     html.Div(style=styles['card'], children=[
         html.H3("📋 Детальные финансовые показатели"),
@@ -244,6 +282,18 @@ app.layout = html.Div(style=styles['container'], children=[
     ]),
 ])
 
+
+def serve_layout():
+    """Макет с идентификатором сессии.
+
+    Идентификатор новый при каждой отрисовке, но хранится в sessionStorage
+    вкладки: после перезагрузки страницы Store восстанавливает прежний.
+    """
+    return html.Div([dcc.Store(id='session-id', storage_type='session', data=uuid.uuid4().hex), layout])
+
+
+app.layout = serve_layout
+
 # Функция для парсинга загруженного файла
 def parse_contents(contents, filename):
     content_type, content_string = contents.split(',')
@@ -263,46 +313,86 @@ def parse_contents(contents, filename):
     
     return df
 
+def load_uploads(dataset, contents, filenames, mode):
+    """Разбор загруженных файлов в набор dataset; возвращает строки отчета о загрузке"""
+    if mode == 'replace':
+        dataset.clear()
+    notes = []
+    for content, filename in zip(contents, filenames):
+        df = parse_contents(content, filename)
+        if isinstance(df, html.Div):
+            notes.append(html.P(f"Файл '{filename}' пропущен: {df.children[0]}"))
+            continue
+        try:
+            added, duplicates = dataset.append(df)
+        except ValueError as e:
+            notes.append(html.P(f"Файл '{filename}' пропущен: {e}"))
+            continue
+        note = f"Файл '{filename}': добавлено {added} записей"
+        if duplicates:
+            note += f", пропущено повторов: {duplicates}"
+        notes.append(html.P(note))
+    return notes
+
 # Колбэки
 @app.callback(
     [Output('output-data-upload', 'children'),
      Output('category-filter', 'options'),
-     Output('time-series-chart', 'figure'),
+     Output('time-series-store', 'data'),
      Output('expenses-pie-chart', 'figure'),
      Output('profit-histogram', 'figure'),
      Output('correlation-scatter', 'figure'),
      Output('financial-table', 'data'),
      Output('financial-table', 'columns'),
-     Output('total-revenue-indicator', 'children'),
-     Output('total-expenses-indicator', 'children'),
-     Output('total-profit-indicator', 'children'),
-     Output('profit-margin-indicator', 'children'),
-     Output('avg-monthly-growth', 'children'),
-     Output('revenue-progress', 'value'),
-     Output('profit-progress', 'value'),
-     Output('margin-progress', 'value')],
+     Output('kpi-store', 'data'),
+     Output('comparison-chart', 'figure')],
     [Input('upload-data', 'contents'),
      Input('period-filter', 'value'),
      Input('category-filter', 'value'),
      Input('date-range', 'start_date'),
-     Input('date-range', 'end_date'),
-     Input('chart-type', 'value')],
-    [State('upload-data', 'filename')]
+     Input('date-range', 'end_date')],
+    [State('upload-data', 'filename'),
+     State('upload-mode', 'value'),
+     State('session-id', 'data')]
 )
-def update_dashboard(contents, period, selected_categories, start_date, end_date, chart_type, filename):
+@metrics.timed('dash_callback')
+@native_outputs
+def update_dashboard(contents, period, selected_categories, start_date, end_date, filename, upload_mode='replace',
+                     session_id=None):
     ctx = dash.callback_context
     
+    # Файлы разбираются только при загрузке; смена фильтров читает готовый набор сессии
+    upload_notes = []
+    sales, created = sessions.get(session_id, create=bool(contents))
+    if contents and ctx.triggered_id == 'upload-data':
+        upload_notes = load_uploads(sales, contents, filename, upload_mode)
+    elif created:
+        # Набора нет (перезапуск сервера или вытеснен), а страница еще показывает
+        # загруженные файлы: разбираем их заново, вместо подмены демо-данными
+        upload_notes = [html.P("Данные восстановлены из последней загрузки"),
+                        *load_uploads(sales, contents, filename, 'replace')]
+    
+    # Размер, кадр и версия читаются вместе: в это время может идти загрузка.
+    # Прогноз и сравнения ниже считаются под той же блокировкой по текущей версии
+    lock = sales.lock if sales is not None else nullcontext()
+    with lock:
+        loaded = len(sales) if sales is not None else 0
+        if loaded:
+            df = sales.frame
+            version = sales.version
+    
     # Если данные не загружены, используем демо-данные
-    if contents is None:
-        # Создаем демо-данные
-        dates = pd.date_range(start='2024-01-01', end='2024-12-01', freq='MS')
+    if not loaded:
+        # Создаем демо-данные (одинаковые при каждом вызове, чтобы работал кеш прогноза)
+        rng = np.random.default_rng(2024)
+        dates = pd.date_range(start='2023-01-01', end='2024-12-01', freq='MS')
         categories = ['Электроника', 'Одежда и обувь', 'Бытовая техника', 'Мебель', 'Красота и здоровье', 'Продукты', 'Игрушки']
         
         demo_data = []
         for date in dates:
             for category in categories:
-                revenue = np.random.randint(3000, 20000)
-                expenses = revenue * np.random.uniform(0.6, 0.8)
+                revenue = rng.integers(3000, 20000)
+                expenses = revenue * rng.uniform(0.6, 0.8)
                 profit = revenue - expenses
                 demo_data.append({
                     'date': date,
@@ -316,19 +406,21 @@ def update_dashboard(contents, period, selected_categories, start_date, end_date
                 })
         
         df = pd.DataFrame(demo_data)
+        dataset = df
+        version = 'demo'
         upload_message = html.Div([
             html.H5("Используются демо-данные"),
-            html.P("Загрузите CSV файл для работы с реальными данными")
+            html.P("Загрузите CSV файлы для работы с реальными данными"),
+            *upload_notes
         ])
     else:
-        df = parse_contents(contents, filename)
-        if isinstance(df, html.Div):
-            return df, [], {}, {}, {}, {}, [], [], [], [], [], [], [], 0, 0, 0
+        dataset = sales
         upload_message = html.Div([
-            html.H5(f"Файл '{filename}' успешно загружен"),
-            html.P(f"Загружено {len(df)} записей")
+            html.H5(f"Загружено {loaded} записей"),
+            *upload_notes
         ])
     
+    
     # Применяем фильтры дат
     if start_date and end_date:
         start_date = pd.to_datetime(start_date)
@@ -343,54 +435,67 @@ def update_dashboard(contents, period, selected_categories, start_date, end_date
     # Обновляем опции фильтров
     category_options = [{'label': cat, 'value': cat} for cat in df['category'].unique()]
     
-    # Агрегируем данные по выбранному периоду
-    if period == 'month':
-        period_col = 'month'
-        group_cols = ['month', 'year']
-    elif period == 'quarter':
-        period_col = 'quarter'
-        group_cols = ['quarter', 'year']
-    else:  # year
-        period_col = 'year'
-        group_cols = ['year']
+    # Агрегируем данные по выбранному периоду в хронологическом порядке
+    period_col = 'period'
+    period_freq = {'month': 'M', 'quarter': 'Q'}.get(period, 'Y')
+    period_start = filtered_df['date'].dt.to_period(period_freq).dt.start_time.rename(period_col)
     
     # Создаем агрегированные данные для графиков
-    aggregated = filtered_df.groupby(group_cols).agg({
+    aggregated = filtered_df.groupby(period_start).agg({
         'revenue': 'sum',
         'expenses': 'sum',
         'profit': 'sum'
     }).reset_index()
     
-    # 1. График временного ряда (доходы и расходы)
-    if chart_type == 'line':
-        time_series_fig = go.Figure()
+    # 1. График временного ряда (доходы и расходы); тип графика
+    # переключается в браузере по отметке meta='series'
+    time_series_fig = go.Figure()
+    time_series_fig.add_trace(go.Scatter(
+        x=aggregated[period_col],
+        y=aggregated['revenue'],
+        mode='lines+markers',
+        name='Доходы',
+        meta='series',
+        line=dict(color='#27ae60', width=3)
+    ))
+    time_series_fig.add_trace(go.Scatter(
+        x=aggregated[period_col],
+        y=aggregated['expenses'],
+        mode='lines+markers',
+        name='Расходы',
+        meta='series',
+        line=dict(color='#e74c3c', width=3)
+    ))
+    
+    # Прогноз доходов по всем рядам (категория, товар) набора данных
+    forecast_next = None
+    if period == 'month' and len(aggregated) > 0:
+        keys = ['category', 'product_id'] if 'product_id' in dataset.columns else ['category']
+        with lock:
+            forecast = forecasts.get(sales.version if loaded else version, forecast_frame, dataset, keys)
+        mask = None
+        if selected_categories:
+            mask = forecast['series']['category'].isin(selected_categories).to_numpy()
+        mean, lower, upper = aggregate_forecast(forecast, mask)
+        forecast_next = mean[0]
+        # Линия прогноза продолжает последнюю фактическую точку
+        x = [aggregated[period_col].iloc[-1], *forecast['dates']]
+        last = aggregated['revenue'].iloc[-1]
         time_series_fig.add_trace(go.Scatter(
-            x=aggregated[period_col],
-            y=aggregated['revenue'],
-            mode='lines+markers',
-            name='Доходы',
-            line=dict(color='#27ae60', width=3)
+            x=x + x[::-1],
+            y=[last, *upper] + [last, *lower][::-1],
+            fill='toself',
+            fillcolor='rgba(39, 174, 96, 0.15)',
+            line=dict(width=0),
+            hoverinfo='skip',
+            name='Интервал прогноза 95%'
         ))
         time_series_fig.add_trace(go.Scatter(
-            x=aggregated[period_col],
-            y=aggregated['expenses'],
-            mode='lines+markers',
-            name='Расходы',
-            line=dict(color='#e74c3c', width=3)
-        ))
-    else:  # bar chart
-        time_series_fig = go.Figure()
-        time_series_fig.add_trace(go.Bar(
-            x=aggregated[period_col],
-            y=aggregated['revenue'],
-            name='Доходы',
-            marker_color='#27ae60'
-        ))
-        time_series_fig.add_trace(go.Bar(
-            x=aggregated[period_col],
-            y=aggregated['expenses'],
-            name='Расходы',
-            marker_color='#e74c3c'
+            x=x,
+            y=[last, *mean],
+            mode='lines',
+            name='Прогноз доходов',
+            line=dict(color='#27ae60', width=2, dash='dash')
         ))
     
     time_series_fig.update_layout(
@@ -440,8 +545,42 @@ def update_dashboard(contents, period, selected_categories, start_date, end_date
     scatter_fig.update_traces(marker=dict(opacity=0.7))
     
     # 5. Таблица с финансовыми показателями
-    table_data = filtered_df.to_dict('records')
-    table_columns = [{"name": i, "id": i} for i in filtered_df.columns if i in ['date', 'category', 'revenue', 'expenses', 'profit']]
+    # Сравнения периодов по категориям и товарам набора данных
+    levels = {'category': ['category']}
+    if 'product_id' in dataset.columns:
+        levels['product'] = ['category', 'product_id']
+    with lock:
+        comparison = comparisons.get(sales.version if loaded else version, PeriodComparison, dataset, levels)
+    
+    table_columns = [{"name": i, "id": i} for i in ['date', 'category', 'product_name', 'revenue', 'expenses', 'profit']
+                     if i in filtered_df.columns]
+    table_columns.append({"name": "Рост категории г/г, %", "id": 'yoy_pct'})
+    filtered_df = filtered_df.assign(yoy_pct=comparison.lookup('category', 'M', 'yoy_pct', filtered_df))
+    if 'product' in levels:
+        table_columns.append({"name": "Рост товара г/г, %", "id": 'product_yoy_pct'})
+        filtered_df = filtered_df.assign(product_yoy_pct=comparison.lookup('product', 'M', 'yoy_pct', filtered_df))
+    table_data = table_records(filtered_df, [column['id'] for column in table_columns], decimals=1)
+    
+    # 8. Изменение выручки категорий в последнем периоде набора
+    freq = PERIOD_FREQ.get(period, 'Y')
+    latest_period, latest = comparison.latest('category', freq)
+    if selected_categories:
+        latest = latest[latest['category'].isin(selected_categories)]
+    comparison_fig = go.Figure()
+    for name in COMPARISONS[freq]:
+        comparison_fig.add_trace(go.Bar(
+            x=latest['category'],
+            y=latest[f"{name}_pct"],
+            customdata=latest[name],
+            name=f"Рост {COMPARISON_NAMES[name]}",
+            hovertemplate='%{x}: %{y:+.1f}% (%{customdata:+,.0f} $)<extra></extra>'
+        ))
+    comparison_fig.update_layout(
+        title=f'Изменение выручки по категориям за {latest_period}',
+        xaxis_title='Категория',
+        yaxis_title='Рост, %',
+        barmode='group'
+    )
     
     # 6. Индикаторы (KPI)
     total_revenue = filtered_df['revenue'].sum()
@@ -455,41 +594,16 @@ def update_dashboard(contents, period, selected_categories, start_date, end_date
         monthly_revenue = aggregated['revenue'].pct_change().mean() * 100
         monthly_growth = monthly_revenue
     
-    # Создаем индикаторы
-    revenue_indicator = [
-        html.H4("Общая выручка", style={'color': '#27ae60'}),
-        html.H2(f"${total_revenue:,.0f}", style={'color': '#27ae60', 'margin': '10px 0'}),
-        html.P(f"{len(filtered_df)} транзакций")
-    ]
-    
-    expenses_indicator = [
-        html.H4("Общие расходы", style={'color': '#e74c3c'}),
-        html.H2(f"${total_expenses:,.0f}", style={'color': '#e74c3c', 'margin': '10px 0'}),
-        html.P(f"{len(filtered_df)} транзакций")
-    ]
-    
-    profit_indicator = [
-        html.H4("Общая прибыль", style={'color': '#3498db'}),
-        html.H2(f"${total_profit:,.0f}", style={'color': '#3498db', 'margin': '10px 0'}),
-        html.P("Чистая прибыль")
-    ]
-    
-    margin_indicator = [
-        html.H4("Маржа прибыли", style={'color': '#9b59b6'}),
-        html.H2(f"{profit_margin:.1f}%", style={'color': '#9b59b6', 'margin': '10px 0'}),
-        html.P("Рентабельность")
-    ]
-    
-    growth_indicator = [
-        html.H4("Средний рост", style={'color': '#f39c12'}),
-        html.H2(f"{monthly_growth:+.1f}%", style={'color': '#f39c12', 'margin': '10px 0'}),
-        html.P("в месяц")
-    ]
-    
-    # Прогресс-бары (нормализованные значения)
-    revenue_progress = min(int((total_revenue / 1000000) * 100), 100)
-    profit_progress = min(int((total_profit / 300000) * 100), 100)
-    margin_progress = min(int((profit_margin / 50) * 100), 100)
+    # 7. Значения KPI; карточки и полосы прогресса оформляются в браузере
+    kpi = {
+        'revenue': float(total_revenue),
+        'expenses': float(total_expenses),
+        'profit': float(total_profit),
+        'margin': float(profit_margin),
+        'growth': float(monthly_growth) if np.isfinite(monthly_growth) else 0.0,
+        'forecast_next': None if forecast_next is None else float(forecast_next),
+        'transactions': len(filtered_df),
+    }
     
     return (
         upload_message,
@@ -500,16 +614,32 @@ def update_dashboard(contents, period, selected_categories, start_date, end_date
         scatter_fig,
         table_data,
         table_columns,
-        revenue_indicator,
-        expenses_indicator,
-        profit_indicator,
-        margin_indicator,
-        growth_indicator,
-        revenue_progress,
-        profit_progress,
-        margin_progress
+        kpi,
+        comparison_fig
     )
 
+app.clientside_callback(
+    ClientsideFunction(namespace='dashboard', function_name='chart_type'),
+    Output('time-series-chart', 'figure'),
+    [Input('time-series-store', 'data'),
+     Input('chart-type', 'value')]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='dashboard', function_name='kpi'),
+    [Output('total-revenue-indicator', 'children'),
+     Output('total-expenses-indicator', 'children'),
+     Output('total-profit-indicator', 'children'),
+     Output('profit-margin-indicator', 'children'),
+     Output('avg-monthly-growth', 'children'),
+     Output('revenue-progress', 'value'),
+     Output('profit-progress', 'value'),
+     Output('margin-progress', 'value')],
+    [Input('kpi-store', 'data')],
+    [State('revenue-progress', 'max'),
+     State('profit-progress', 'max'),
+     State('margin-progress', 'max')]
+)
+
 if __name__ == '__main__':
-    import numpy as np
     app.run(debug=True, port=8050)
\ No newline at end of file
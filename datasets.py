@@ -0,0 +1,271 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ================== НАКОПЛЕННЫЕ ДАННЫЕ ПРОДАЖ ==================
+KEY_COLUMNS = ('date', 'product_id', 'category')   # строка продаж однозначно задается этими столбцами
+REQUIRED_COLUMNS = ('date', 'category')
+MIN_CAPACITY = 1024
+
+
+def _grow(buffer, size):
+    """Буфер вместимостью не меньше size; при нехватке вместимость удваивается"""
+    if size <= len(buffer):
+        return buffer
+    grown = np.empty(max(size, 2 * len(buffer), MIN_CAPACITY), dtype=buffer.dtype)
+    grown[:len(buffer)] = buffer
+    return grown
+
+
+class StringColumn:
+    """Строковый столбец как коды категорий: добавление и чтение без копирования строк"""
+
+    __slots__ = ('codes', 'categories', 'index')
+
+    def __init__(self):
+        self.codes = np.empty(0, dtype=np.int32)
+        self.categories = []
+        self.index = {}
+
+    def put(self, values, start):
+        """Записывает values с позиции start; пропуски хранятся кодом -1"""
+        local, uniques = pd.factorize(values)
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = -1
+        for i, value in enumerate(uniques.tolist()):
+            code = self.index.get(value)
+            if code is None:
+                code = self.index[value] = len(self.categories)
+                self.categories.append(value)
+            mapping[i] = code
+        self.codes = _grow(self.codes, start + len(values))
+        self.codes[start:start + len(values)] = mapping[local]
+
+    def view(self, size):
+        return pd.Categorical.from_codes(self.codes[:size], pd.Index(self.categories, dtype=object), validate=False)
+
+
+class NumericColumn:
+    """Числовой столбец или столбец дат в растущем буфере"""
+
+    __slots__ = ('values',)
+
+    def __init__(self, dtype):
+        self.values = np.empty(0, dtype=dtype)
+
+    def put(self, values, start):
+        values = np.asarray(values)
+        if values.dtype.kind not in 'iufbM':
+            raise ValueError(f"ожидались числа, получено {values.dtype}")
+        dtype = np.result_type(self.values.dtype, values.dtype)
+        if dtype != self.values.dtype:
+            # Целые значения после дробных: буфер один раз переводится в общий тип
+            self.values = self.values.astype(dtype)
+        self.values = _grow(self.values, start + len(values))
+        self.values[start:start + len(values)] = values
+
+    def view(self, size):
+        return self.values[:size]
+
+
+class PeriodRollup:
+    """Суммы value по рядам keys и месяцам, пополняемые новыми строками.
+
+    Ряды - строки матрицы (вместимость удваивается), месяцы - столбцы от
+    первого до последнего месяца набора. Квартальные и годовые суммы
+    складываются из месячных столбцов, поэтому не хранятся.
+    """
+
+    def __init__(self, keys, value='revenue', date='date'):
+        self.keys = list(keys)
+        self.value = value
+        self.date = date
+        self.rows = {}
+        self.first = None
+        self.Y = np.zeros((0, 0))
+        self._series = None
+
+    def add(self, df):
+        df = df[df[self.date].notna()]
+        if df.empty:
+            return
+        ordinals = pd.PeriodIndex(df[self.date].dt.to_period('M')).asi8
+        grouped = df.groupby(self.keys, sort=False, observed=True)
+        local = grouped.ngroup().to_numpy()
+        mapping = np.empty(grouped.ngroups, dtype=np.int64)
+        for i, key in enumerate(grouped.size().index.tolist()):
+            key = key if isinstance(key, tuple) else (key,)
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = len(self.rows)
+                self._series = None
+            mapping[i] = row
+
+        first, last = ordinals.min(), ordinals.max()
+        if self.first is None:
+            self.first = first
+            self.Y = np.zeros((0, last - first + 1))
+        start, end = min(self.first, first), max(self.first + self.Y.shape[1] - 1, last)
+        rows = len(self.rows)
+        if start < self.first or end - start + 1 > self.Y.shape[1] or rows > self.Y.shape[0]:
+            # Новый месяц или нехватка строк: матрица перекладывается один раз,
+            # затраты пропорциональны числу рядов, а не строк истории
+            capacity = self.Y.shape[0] if rows <= self.Y.shape[0] else max(rows, 2 * self.Y.shape[0], 64)
+            Y = np.zeros((capacity, end - start + 1))
+            offset = self.first - start
+            Y[:self.Y.shape[0], offset:offset + self.Y.shape[1]] = self.Y
+            self.Y, self.first = Y, start
+        np.add.at(self.Y, (mapping[local], ordinals - self.first), df[self.value].to_numpy(np.float64))
+
+    def matrix(self, freq='M'):
+        """(ряды - DataFrame значений keys, периоды - PeriodIndex, матрица сумм)"""
+        if self._series is None:
+            self._series = pd.DataFrame(list(self.rows), columns=self.keys)
+        months = pd.period_range(pd.Period(ordinal=self.first, freq='M'), periods=self.Y.shape[1], freq='M')
+        Y = self.Y[:len(self.rows)]
+        if freq == 'M':
+            return self._series, months, Y.copy()
+        ordinals = months.asfreq(freq).asi8
+        starts = np.flatnonzero(np.r_[True, ordinals[1:] != ordinals[:-1]])
+        periods = pd.period_range(pd.Period(ordinal=ordinals[0], freq=freq), periods=len(starts), freq=freq)
+        return self._series, periods, np.add.reduceat(Y, starts, axis=1)
+
+
+class SalesDataset:
+    """Таблица продаж дашборда, пополняемая файлами.
+
+    Столбцы лежат в растущих буферах, строки новой загрузки сверяются с
+    уже загруженными по хешам ключа (дата, товар, категория) - повторные
+    строки пропускаются. Помесячные суммы для прогнозов и сравнений
+    пополняются только новыми строками, поэтому добавление дневного файла
+    стоит пропорционально его размеру, а не всей истории.
+
+    Добавление и чтение (frame, rollup) идут под блокировкой lock:
+    колбэки дашборда выполняются в потоках сервера. Чтобы согласованно
+    прочитать несколько полей (frame и version), вызывающий берет lock сам.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.columns = []
+        self.size = 0
+        self.version = ''
+        self._buffers = {}
+        self._keys = None
+        self._seen = set()
+        self._rollups = {}
+        self._frame = None
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def append(self, df):
+        """Добавляет строки df, которых еще нет в наборе; возвращает (добавлено, дубликатов)"""
+        with self.lock:
+            return self._append(df)
+
+    def _append(self, df):
+        if not self.columns:
+            missing = [name for name in REQUIRED_COLUMNS if name not in df.columns]
+            if missing:
+                raise ValueError(f"нет столбцов: {', '.join(missing)}")
+            self.columns = list(df.columns)
+            self._keys = [name for name in KEY_COLUMNS if name in df.columns]
+            for name in self.columns:
+                kind = df[name].dtype.kind
+                self._buffers[name] = NumericColumn(df[name].dtype) if kind in 'iufbM' else StringColumn()
+        missing = [name for name in self.columns if name not in df.columns]
+        if missing:
+            raise ValueError(f"нет столбцов: {', '.join(missing)}")
+
+        # Даты приводятся к одной точности: разные файлы читаются в секунды или наносекунды
+        keys = df[self._keys].astype({name: 'datetime64[ns]' for name in self._keys if df[name].dtype.kind == 'M'})
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        fresh = ~pd.Series(hashes).duplicated().to_numpy()
+        seen = self._seen
+        fresh &= np.fromiter((h not in seen for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        duplicates = len(df) - int(fresh.sum())
+        if not fresh.any():
+            return 0, duplicates
+        new = df.loc[fresh, self.columns]
+
+        start = self.size
+        for name in self.columns:
+            try:
+                self._buffers[name].put(new[name].to_numpy(), start)
+            except ValueError as e:
+                # Уже записанные столбцы остаются за пределами size и будут перезаписаны
+                if not self.size:
+                    self.clear()
+                raise ValueError(f"столбец {name}: {e}") from None
+        seen.update(hashes[fresh].tolist())
+        self.size += len(new)
+        for rollup in self._rollups.values():
+            rollup.add(new)
+        digest = pd.util.hash_pandas_object(new, index=False).to_numpy()
+        self.version = hashlib.blake2b(self.version.encode() + digest.tobytes(), digest_size=16).hexdigest()
+        self._frame = None
+        return len(new), duplicates
+
+    @property
+    def frame(self):
+        """DataFrame поверх буферов (без копирования), до следующего добавления"""
+        with self.lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    {name: self._buffers[name].view(self.size) for name in self.columns}, copy=False
+                )
+            return self._frame
+
+    def rollup(self, keys, value='revenue', freq='M'):
+        """Суммы value по рядам keys и периодам freq, как у forecasting.period_matrix.
+
+        Накопитель создается по всей таблице при первом запросе, дальше
+        пополняется в append().
+        """
+        with self.lock:
+            rollup = self._rollups.get((tuple(keys), value))
+            if rollup is None:
+                rollup = self._rollups[tuple(keys), value] = PeriodRollup(keys, value)
+                rollup.add(self.frame)
+            return rollup.matrix(freq)
+
+
+class SessionDatasets:
+    """Наборы продаж по сессиям браузера: загрузки одной вкладки не видны другим.
+
+    Хранятся max_sessions наборов, к которым обращались последними.
+    Набор создается только для сессии, загрузившей файлы.
+    """
+
+    def __init__(self, max_sessions=8):
+        self.max_sessions = max_sessions
+        self._datasets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, create=False):
+        """(набор сессии или None, создан ли он этим вызовом)"""
+        with self._lock:
+            dataset = self._datasets.get(session_id)
+            if dataset is not None:
+                self._datasets.move_to_end(session_id)
+                return dataset, False
+            if not create:
+                return None, False
+            dataset = self._datasets[session_id] = SalesDataset()
+            while len(self._datasets) > self.max_sessions:
+                self._datasets.popitem(last=False)
+            return dataset, True
+
+    def __len__(self):
+        return len(self._datasets)
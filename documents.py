@@ -0,0 +1,170 @@
+import json
+import os
+from datetime import datetime
+
+# ================== ДОКУМЕНТЫ ==================
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+DOCUMENT_FORMATS = ('html', 'pdf')
+
+# Вид документа -> (название, префикс номера); у итоговых документов дня номера нет
+DOCUMENT_KINDS = {
+    'receiving': ('Акт приемки', 'АКТ-ПР'),
+    'discrepancy': ('Акт расхождений', 'АКТ-РАСХ'),
+    'defect': ('Акт о браке', 'АКТ-БРАК'),
+    'daily': ('Отчет магазина за день', None),
+    'registry': ('Реестр документов за день', None),
+}
+
+PENDING_APPROVAL = 'На утверждении'
+REGISTRY_FILE = 'registry.jsonl'
+_PREFIXES = {prefix for _, prefix in DOCUMENT_KINDS.values() if prefix}
+
+_environment = None  # окружение шаблонов процесса-исполнителя
+
+
+def _template(name):
+    """Скомпилированный шаблон.
+
+    Окружение создается в каждом процессе пула один раз и хранит
+    скомпилированные шаблоны (вместе с базовым), поэтому разбор и
+    компиляция идут только при первом документе этого вида. Проверка
+    изменения файлов шаблонов отключена: новые шаблоны подхватываются
+    после перезапуска.
+    """
+    global _environment
+    if _environment is None:
+        # jinja2 загружается в процессах пула, а не при старте бота
+        from jinja2 import Environment, FileSystemLoader, StrictUndefined
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR), autoescape=True, auto_reload=False,
+            trim_blocks=True, lstrip_blocks=True, undefined=StrictUndefined,
+        )
+        _environment.filters['money'] = lambda value: f"{value:,.2f}".replace(',', ' ')
+    return _environment.get_template(f"{name}.html")
+
+
+def _pdf(html):
+    try:
+        from weasyprint import HTML
+    except ImportError:  # PDF доступен только при установленном weasyprint
+        raise RuntimeError("Для документов в PDF установите weasyprint")
+    return HTML(string=html, base_url=TEMPLATE_DIR).write_pdf()
+
+
+def render_documents(specs, directory, fmt='html'):
+    """Отрисовка пачки документов в файлы каталога directory; возвращает пути.
+
+    Функция уровня модуля - выполняется в пуле процессов. Пачка уходит в
+    процесс одним вызовом: шаблоны компилируются один раз на пачку, а
+    данные передаются между процессами один раз.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for spec in specs:
+        html = _template(spec['kind']).render(**spec)
+        data = _pdf(html) if fmt == 'pdf' else html.encode('utf-8')
+        path = os.path.join(directory, f"{spec['file']}.{fmt}")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        if spec['number'] is None:
+            os.replace(tmp, path)
+        else:
+            # Файл номерного акта не перезаписывается: FileExistsError, если номер уже занят
+            try:
+                os.link(tmp, path)
+            finally:
+                os.remove(tmp)
+        paths.append(path)
+    return paths
+
+
+def _parse_number(number):
+    """(префикс, год, порядковый номер) из номера вида АКТ-БРАК-2024-001; None для чужих имен"""
+    parts = number.rsplit('-', 2)
+    if len(parts) != 3 or parts[0] not in _PREFIXES or not parts[1].isdigit() or not parts[2].isdigit():
+        return None
+    return parts[0], int(parts[1]), int(parts[2])
+
+
+class DocumentRegistry:
+    """Выпущенные документы: сквозные номера по видам и годам, статусы.
+
+    Живет в процессе бота. issue() возвращает описание документа -
+    простой словарь, который передается в render_documents. Каждый
+    выпущенный документ дописывается строкой в REGISTRY_FILE каталога
+    directory. При запуске реестр читается из этого файла, а счетчики
+    номеров продолжаются с наибольшего номера в реестре и среди файлов
+    каталога, поэтому номер после перезапуска не повторяется.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.documents = {}   # номер -> документ
+        self._counters = {}   # (префикс, год) -> последний номер
+        self._load()
+
+    def _load(self):
+        if not os.path.isdir(self.directory):
+            return
+        names = os.listdir(self.directory)
+        for name in names:
+            self._count(name.split('.', 1)[0])
+        registry = os.path.join(self.directory, REGISTRY_FILE)
+        if not os.path.exists(registry):
+            return
+        with open(registry, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    document = json.loads(line)
+                except ValueError:
+                    continue  # строка, недописанная при аварийной остановке
+                # Файл документа - любой из форматов, в которых он уже сформирован
+                document['path'] = next(
+                    (os.path.join(self.directory, name) for name in names
+                     if name.split('.', 1)[0] == document['file'] and not name.endswith('.tmp')),
+                    None,
+                )
+                self.documents[document['number']] = document
+                self._count(document['number'])
+
+    def _count(self, number):
+        parsed = _parse_number(number)
+        if parsed is not None:
+            key = parsed[:2]
+            self._counters[key] = max(self._counters.get(key, 0), parsed[2])
+
+    def issue(self, kind, author, store, **context):
+        title, prefix = DOCUMENT_KINDS[kind]
+        now = datetime.now()
+        key = (prefix, now.year)
+        self._counters[key] = self._counters.get(key, 0) + 1
+        number = f"{prefix}-{now.year}-{self._counters[key]:03d}"
+        document = dict(
+            context, kind=kind, title=title, number=number, file=number,
+            date=now.strftime("%Y-%m-%d %H:%M"), author=author, store=store,
+            status=PENDING_APPROVAL, path=None,
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, REGISTRY_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({k: v for k, v in document.items() if k != 'path'}, ensure_ascii=False) + '\n')
+        self.documents[number] = document
+        return document
+
+    def get(self, number):
+        return self.documents.get(number.strip().upper())
+
+    def for_day(self, day):
+        """Документы за день day (ГГГГ-ММ-ДД) в порядке выпуска"""
+        return [document for document in self.documents.values() if document['date'].startswith(day)]
+
+    def __len__(self):
+        return len(self.documents)
+
+
+def summary_spec(kind, day, store, **context):
+    """Итоговый документ дня (без номера)"""
+    title = DOCUMENT_KINDS[kind][0]
+    suffix = f"-{store}" if store is not None else ''
+    return dict(context, kind=kind, title=title, number=None, file=f"{kind}-{day}{suffix}",
+                date=day, store=store, author=None, status=None)
@@ -0,0 +1,136 @@
+import csv
+import io
+import zlib
+from operator import itemgetter
+from datetime import datetime, timedelta
+
+# ================== ЭКСПОРТ ДАННЫХ ==================
+CHUNK_SIZE = 10000
+
+STOCK_COLUMNS = ['store', 'sku', 'name', 'category', 'quantity', 'price', 'status', 'manager',
+                 'expiry', 'supplier', 'zone', 'barcode', 'added_at']
+SALES_COLUMNS = ['date', 'store', 'sku', 'name', 'quantity', 'price', 'total', 'cost', 'profit']
+
+_PARQUET_TYPES = {'quantity': 'int64', 'price': 'float64', 'total': 'float64', 'cost': 'float64', 'profit': 'float64'}
+
+
+def _pyarrow():
+    """pyarrow загружается при первой выгрузке в Parquet, а не при старте бота"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # Parquet доступен только при установленном pyarrow
+        raise RuntimeError("Для экспорта в Parquet установите pyarrow")
+    return pa, pq
+
+
+def period_bounds(period, now=None):
+    """Границы периода в виде строк дат: day, week, month, year, YYYY-MM, YYYY-MM-DD"""
+    now = now or datetime.now()
+    if not period:
+        return None, None
+    if period == 'day':
+        start = now.strftime('%Y-%m-%d')
+    elif period == 'week':
+        start = (now - timedelta(days=6)).strftime('%Y-%m-%d')
+    elif period == 'month':
+        start = now.strftime('%Y-%m-01')
+    elif period == 'year':
+        start = now.strftime('%Y-01-01')
+    else:
+        # Конкретный месяц или день: сравнение по префиксу даты. Префикс берется
+        # из разобранной даты, а не из ввода: "2024-1" - январь, а не 2024-10..12
+        for fmt in ('%Y-%m-%d', '%Y-%m'):
+            try:
+                prefix = datetime.strptime(period, fmt).strftime(fmt)
+            except ValueError:
+                continue
+            return prefix, prefix + '\uffff'
+        raise ValueError(f"Неверный период {period}: ожидается ГГГГ-ММ или ГГГГ-ММ-ДД")
+    return start, None
+
+
+def iter_records(records, start=None, end=None, field='date'):
+    """Фильтрация записей по периоду без построения списка"""
+    for record in records:
+        value = record[field]
+        if start and value < start:
+            continue
+        if end and value >= end:
+            continue
+        yield record
+
+
+def csv_chunks(records, columns, compress=False, chunk_size=CHUNK_SIZE):
+    """Генератор байтовых блоков CSV (опционально gzip) с постоянной памятью"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    encoder = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return encoder.compress(data) if encoder else data
+
+    # BOM, чтобы Excel открыл кириллицу без выбора кодировки
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    getter = itemgetter(*columns) if len(columns) > 1 else lambda record: (record[columns[0]],)
+    rows = 0
+    for record in records:
+        try:
+            writer.writerow(getter(record))
+        except KeyError:
+            writer.writerow([record.get(column, '') for column in columns])
+        rows += 1
+        if rows % chunk_size == 0:
+            chunk = flush()
+            if chunk:
+                yield chunk
+    chunk = flush()
+    if chunk:
+        yield chunk
+    if encoder:
+        yield encoder.flush()
+
+
+def write_parquet(path, records, columns, chunk_size=CHUNK_SIZE):
+    """Запись Parquet группами строк; требуется pyarrow"""
+    pa, pq = _pyarrow()
+    writer = None
+    batch = []
+    try:
+        for record in records:
+            batch.append(record)
+            if len(batch) == chunk_size:
+                writer = _write_batch(pa, pq, writer, path, batch, columns)
+                batch = []
+        if batch or writer is None:
+            writer = _write_batch(pa, pq, writer, path, batch, columns)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_batch(pa, pq, writer, path, batch, columns):
+    if writer is None:
+        schema = pa.schema([(column, pa.type_for_alias(_PARQUET_TYPES.get(column, 'string'))) for column in columns])
+        writer = pq.ParquetWriter(path, schema)
+    data = {column: [_plain(record.get(column)) for record in batch] for column in columns}
+    writer.write_table(pa.table(data, schema=writer.schema))
+    return writer
+
+
+def _plain(value):
+    return value if value is None or isinstance(value, (int, float, str)) else str(value)
+
+
+def write_export(path, records, columns, fmt='csv'):
+    """Запись экспорта в файл: csv, csv.gz или parquet"""
+    if fmt == 'parquet':
+        write_parquet(path, records, columns)
+        return
+    with open(path, 'wb') as f:
+        for chunk in csv_chunks(records, columns, compress=fmt == 'csv.gz'):
+            f.write(chunk)
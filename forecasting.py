@@ -0,0 +1,122 @@
+import numpy as np
+
+# ================== ПРОГНОЗ СПРОСА ==================
+HORIZON = 6                                  # периодов вперед
+SEASON = 12                                  # длина сезона в периодах (месяцы в году)
+ALPHAS = np.array([0.1, 0.3, 0.5, 0.7, 0.9])  # сетка сглаживания для подбора по ряду
+Z_95 = 1.96                                  # интервал прогноза ~95%
+MODEL_SES, MODEL_SEASONAL_NAIVE = 0, 1
+MODEL_NAMES = ('Экспоненциальное сглаживание', 'Сезонный наивный')
+
+
+def series_matrix(codes, periods, values, n_series, n_periods):
+    """Длинная таблица (ряд, период, значение) в матрицу рядов; пропуски - нули"""
+    flat = codes.astype(np.int64) * n_periods + periods
+    # Без строк bincount возвращает целые нули; сглаживание ждет float64
+    matrix = np.bincount(flat, weights=values, minlength=n_series * n_periods).astype(np.float64, copy=False)
+    return matrix.reshape(n_series, n_periods)
+
+
+def smooth_level(Y, alphas=ALPHAS):
+    """Простое экспоненциальное сглаживание всех рядов сразу.
+
+    Цикл идет только по времени: на каждом шаге обновляются уровни всех
+    рядов для всей сетки alpha. Для каждого ряда выбирается alpha с
+    наименьшей ошибкой прогноза на шаг вперед.
+    Возвращает (уровень, дисперсия ошибки, alpha) - массивы по рядам.
+    """
+    n, T = Y.shape
+    alpha = alphas[:, None]
+    level = np.repeat(Y[None, :, 0], len(alphas), axis=0)
+    sse = np.zeros_like(level)
+    for t in range(1, T):
+        error = Y[:, t] - level
+        sse += error * error
+        level += alpha * error
+    best = sse.argmin(axis=0)
+    rows = np.arange(n)
+    return level[best, rows], sse[best, rows] / max(T - 1, 1), alphas[best]
+
+
+def seasonal_naive(Y, season=SEASON, horizon=HORIZON):
+    """Прогноз значением того же периода прошлого сезона; (прогноз, дисперсия ошибки)"""
+    T = Y.shape[1]
+    steps = np.arange(horizon)
+    mean = Y[:, T - season + steps % season]
+    residuals = Y[:, season:] - Y[:, :-season]
+    return mean, (residuals * residuals).mean(axis=1)
+
+
+def fit_forecast(Y, horizon=HORIZON, season=SEASON):
+    """Прогноз матрицы рядов (ряды x периоды) на horizon периодов.
+
+    Сезонная модель рассматривается, если истории хватает на два сезона,
+    и выбирается для ряда, когда ее ошибка меньше, чем у сглаживания.
+    Возвращает словарь: mean и sigma (ряды x горизонт), model по рядам.
+    """
+    n, T = Y.shape
+    steps = np.arange(1, horizon + 1)
+    level, variance, alpha = smooth_level(Y)
+    mean = np.repeat(level[:, None], horizon, axis=1)
+    # Дисперсия прогноза SES растет как 1 + (h - 1) * alpha^2
+    sigma = np.sqrt(variance[:, None] * (1 + (steps - 1) * alpha[:, None] ** 2))
+    model = np.full(n, MODEL_SES, dtype=np.int8)
+
+    if T >= 2 * season:
+        seasonal_mean, seasonal_variance = seasonal_naive(Y, season, horizon)
+        better = seasonal_variance < variance
+        seasonal_sigma = np.sqrt(seasonal_variance[:, None] * ((steps - 1) // season + 1))
+        mean = np.where(better[:, None], seasonal_mean, mean)
+        sigma = np.where(better[:, None], seasonal_sigma, sigma)
+        model[better] = MODEL_SEASONAL_NAIVE
+
+    return {'mean': np.maximum(mean, 0), 'sigma': sigma, 'model': model}
+
+
+def period_matrix(df, keys, value='revenue', date='date', freq='M'):
+    """Суммы value по рядам keys и календарным периодам freq.
+
+    Возвращает (ряды - DataFrame значений keys, периоды - PeriodIndex
+    столбцов от первого до последнего периода набора, матрица сумм).
+    """
+    import pandas as pd  # планировщику заказов хватает numpy-части модуля
+    from datasets import SalesDataset
+
+    if isinstance(df, SalesDataset):
+        # Накопленный набор хранит помесячные суммы готовыми
+        return df.rollup(keys, value, freq)
+    ordinals = pd.PeriodIndex(df[date].dt.to_period(freq)).asi8
+    first, last = ordinals.min(), ordinals.max()
+    grouped = df.groupby(keys, sort=False)
+    series = grouped.size().index.to_frame(index=False)
+    Y = series_matrix(grouped.ngroup().to_numpy(), ordinals - first, df[value].to_numpy(np.float64),
+                      len(series), int(last - first) + 1)
+    periods = pd.period_range(pd.Period(ordinal=first, freq=freq), periods=Y.shape[1], freq=freq)
+    return series, periods, Y
+
+
+def forecast_frame(df, keys, value='revenue', date='date', freq='M', horizon=HORIZON, season=SEASON):
+    """Прогноз для каждого сочетания keys в таблице продаж df.
+
+    Ряды строятся по календарным периодам freq от первой до последней
+    даты набора. Возвращает словарь: series (значения keys по рядам),
+    dates (начала будущих периодов), mean, sigma, model.
+    """
+    import pandas as pd
+
+    series, periods, Y = period_matrix(df, keys, value, date, freq)
+    result = fit_forecast(Y, horizon=horizon, season=season)
+    result['series'] = series
+    result['dates'] = pd.period_range(periods[-1] + 1, periods=horizon, freq=freq).start_time
+    return result
+
+
+def aggregate_forecast(forecast, mask=None, z=Z_95):
+    """Сумма прогнозов выбранных рядов с интервалом; ошибки рядов считаются независимыми"""
+    mean, sigma = forecast['mean'], forecast['sigma']
+    if mask is not None:
+        mean, sigma = mean[mask], sigma[mask]
+    total = mean.sum(axis=0)
+    spread = z * np.sqrt((sigma * sigma).sum(axis=0))
+    return total, np.maximum(total - spread, 0), total + spread
+
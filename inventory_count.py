@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import numpy as np
+
+# ================== ИНВЕНТАРИЗАЦИЯ ==================
+DEFAULT_ZONE = 'Без зоны'
+NOT_COUNTED = -1
+
+
+class CountSession:
+    """Циклическая инвентаризация зоны.
+
+    При открытии фиксируется снимок учетных остатков зоны, поэтому продажи во
+    время пересчета не искажают расхождения. При закрытии к текущим остаткам
+    применяется разница "факт - снимок" одним пакетом.
+    """
+
+    def __init__(self, user_id, zone, products):
+        self.user_id = user_id
+        self.zone = zone
+        self.started_at = datetime.now()
+        self.products = list(products)
+        self.position = {p['sku']: i for i, p in enumerate(self.products)}
+        self.book = np.fromiter((p['quantity'] for p in self.products), dtype=np.int64, count=len(self.products))
+        self.counted = np.full(len(self.products), NOT_COUNTED, dtype=np.int64)
+        self.reasons = {}
+
+    def record(self, sku, quantity, reason=None):
+        """Фактическое количество по товару; возвращает (учетное, расхождение)"""
+        i = self.position[sku]
+        self.counted[i] = quantity
+        if reason:
+            self.reasons[sku] = reason
+        return int(self.book[i]), int(quantity - self.book[i])
+
+    def __contains__(self, sku):
+        return sku in self.position
+
+    def diff(self):
+        """Расхождения по всей зоне: маска пересчитанных и разница"""
+        mask = self.counted != NOT_COUNTED
+        return mask, np.where(mask, self.counted - self.book, 0)
+
+    def summary(self):
+        mask, delta = self.diff()
+        counted = int(mask.sum())
+        mismatched = int(np.count_nonzero(delta))
+        return {
+            'total': len(self.products),
+            'counted': counted,
+            'mismatched': mismatched,
+            'surplus': int(delta[delta > 0].sum()),
+            'shortage': int(-delta[delta < 0].sum()),
+            'accuracy': (counted - mismatched) / counted * 100 if counted else 100.0,
+        }
+
+    def close(self):
+        """Применение корректировок; возвращает записи журнала"""
+        _, delta = self.diff()
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        entries = []
+        for i in np.flatnonzero(delta):
+            product = self.products[i]
+            change = int(delta[i])
+            product['quantity'] = max(product['quantity'] + change, 0)
+            if product['quantity'] == 0:
+                product['status'] = 'Нет в наличии'
+            entries.append({
+                'date': now,
+                'zone': self.zone,
+                'sku': product['sku'],
+                'book': int(self.book[i]),
+                'counted': int(self.counted[i]),
+                'delta': change,
+                'reason': self.reasons.get(product['sku'], 'Не указана'),
+                'user_id': self.user_id,
+            })
+        return entries
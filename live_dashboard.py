@@ -0,0 +1,341 @@
+import dash
+import numpy as np
+from dash import Input, Output, State, dcc, html, dash_table
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from datetime import datetime
+from flask import Response, request
+
+from export import csv_chunks, iter_records, period_bounds
+from metrics import add_metrics_route
+from products import ENCODED_FIELDS, NUMERIC_FIELDS, column, encoded_column, numeric_column
+from serialization import add_compression, native_outputs, table_records
+from stores import expiring_count
+
+# ================== DASH DASHBOARD ==================
+# Модуль импортируется только процессом/потоком дашборда: тяжелый стек
+# аналитики (dash, plotly, pandas) не задерживает запуск бота.
+styles = {
+    'header': {
+        'backgroundColor': '#2c3e50',
+        'color': 'white',
+        'padding': '20px',
+        'textAlign': 'center',
+        'borderRadius': '10px',
+        'marginBottom': '20px'
+    },
+    'card': {
+        'backgroundColor': '#f8f9fa',
+        'padding': '15px',
+        'borderRadius': '10px',
+        'boxShadow': '0 2px 4px rgba(0,0,0,0.1)',
+        'marginBottom': '20px'
+    }
+}
+
+# Поля карточек, которые нужны дашборду
+DASHBOARD_FIELDS = ('store', 'sku', 'name', 'quantity', 'price', 'status', 'manager', 'category', 'min_level')
+AUDIT_COLUMNS = [
+    {'name': 'Дата', 'id': 'date'}, {'name': 'Сотрудник', 'id': 'user'}, {'name': 'Магазин', 'id': 'store'},
+    {'name': 'Артикул', 'id': 'sku'}, {'name': 'Поле', 'id': 'field'},
+    {'name': 'Было', 'id': 'old'}, {'name': 'Стало', 'id': 'new'},
+]
+AUDIT_LIMIT = 20
+
+
+def products_frame(products, fields=DASHBOARD_FIELDS):
+    """DataFrame по столбцам карточек: числа - массивы numpy,
+    повторяющиеся строки - категории по готовым кодам"""
+    data = {}
+    for field in fields:
+        if field in NUMERIC_FIELDS:
+            data[field] = numeric_column(products, field)
+        elif field in ENCODED_FIELDS:
+            codes, values = encoded_column(products, field)
+            data[field] = pd.Categorical.from_codes(codes, values)
+        else:
+            data[field] = np.array(column(products, field), dtype=object)
+    return pd.DataFrame(data, copy=False)
+
+
+def build_layout(product_count):
+    """Макет дашборда"""
+    return html.Div(style={'margin': '20px', 'fontFamily': 'Arial, sans-serif'}, children=[
+        html.Div(style=styles['header'], children=[
+            html.H1("📊 Аналитика управления товарами"),
+            html.P("Данные из Telegram-бота в реальном времени"),
+            html.P(f"Товаров в базе: {product_count}", id='live-counter')
+        ]),
+        
+        # Индикаторы
+        html.Div([
+            html.Div(id='total-products-indicator', style={
+                'backgroundColor': '#ffffff',
+                'padding': '15px',
+                'borderRadius': '8px',
+                'textAlign': 'center',
+                'boxShadow': '0 1px 3px rgba(0,0,0,0.1)',
+                'width': '24%',
+                'display': 'inline-block',
+                'marginRight': '1%'
+            }),
+            html.Div(id='total-value-indicator', style={
+                'backgroundColor': '#ffffff',
+                'padding': '15px',
+                'borderRadius': '8px',
+                'textAlign': 'center',
+                'boxShadow': '0 1px 3px rgba(0,0,0,0.1)',
+                'width': '24%',
+                'display': 'inline-block',
+                'marginRight': '1%'
+            }),
+            html.Div(id='low-stock-indicator', style={
+                'backgroundColor': '#ffffff',
+                'padding': '15px',
+                'borderRadius': '8px',
+                'textAlign': 'center',
+                'boxShadow': '0 1px 3px rgba(0,0,0,0.1)',
+                'width': '24%',
+                'display': 'inline-block',
+                'marginRight': '1%'
+            }),
+            html.Div(id='expiring-soon-indicator', style={
+                'backgroundColor': '#ffffff',
+                'padding': '15px',
+                'borderRadius': '8px',
+                'textAlign': 'center',
+                'boxShadow': '0 1px 3px rgba(0,0,0,0.1)',
+                'width': '24%',
+                'display': 'inline-block'
+            }),
+        ]),
+        
+        # Графики
+        html.Div([
+            html.Div([
+                dcc.Graph(id='stock-level-chart'),
+            ], style={'width': '49%', 'display': 'inline-block', 'marginRight': '1%'}),
+            
+            html.Div([
+                dcc.Graph(id='category-distribution'),
+            ], style={'width': '49%', 'display': 'inline-block'}),
+        ]),
+        
+        # Таблица товаров
+        html.Div(style=styles['card'], children=[
+            html.H3("📋 Текущие товарные остатки"),
+            html.Div([
+                html.A("⬇️ Остатки (CSV)", href='/export/stock.csv', style={'marginRight': '20px'}),
+                html.A("⬇️ Продажи (CSV.GZ)", href='/export/sales.csv.gz'),
+            ], style={'marginBottom': '10px'}),
+            dash_table.DataTable(
+                id='products-table',
+                page_size=10,
+                style_table={'overflowX': 'auto'},
+                style_cell={'textAlign': 'left', 'padding': '10px'},
+                style_header={
+                    'backgroundColor': '#2c3e50',
+                    'color': 'white',
+                    'fontWeight': 'bold'
+                },
+            )
+        ]),
+        
+        # Журнал изменений: выбор ячейки в таблице остатков показывает историю товара
+        html.Div(style=styles['card'], children=[
+            html.H3("🕓 Журнал изменений"),
+            html.P(id='audit-title'),
+            dash_table.DataTable(
+                id='audit-table',
+                columns=AUDIT_COLUMNS,
+                page_size=10,
+                style_table={'overflowX': 'auto'},
+                style_cell={'textAlign': 'left', 'padding': '10px'},
+                style_header={
+                    'backgroundColor': '#2c3e50',
+                    'color': 'white',
+                    'fontWeight': 'bold'
+                },
+            )
+        ]),
+        
+        # Обновление данных
+        dcc.Interval(
+            id='interval-component',
+            interval=5000,  # Обновление каждые 5 секунд
+            n_intervals=0
+        )
+    ])
+
+
+def render_dashboard(products_db, stores, classifier):
+    """Данные всех элементов дашборда по текущим остаткам"""
+    
+    # DataFrame собирается по столбцам карточек, без разбора словарей
+    df = products_frame(products_db)
+    
+    if len(df) == 0:
+        empty_df = pd.DataFrame([{'sku': 'Нет данных', 'name': 'Нет данных', 'quantity': 0}])
+        return (
+            empty_df.to_dict('records'),
+            [{"name": i, "id": i} for i in empty_df.columns],
+            [html.H4("Всего товаров"), html.H2("0")],
+            [html.H4("Общая стоимость"), html.H2("0 руб")],
+            [html.H4("Низкий запас"), html.H2("0")],
+            [html.H4("Срок годности"), html.H2("0")],
+            go.Figure(),
+            go.Figure(),
+            f"Товаров в базе: 0"
+        )
+    
+    # Сводные показатели сети из агрегатов магазинов: товары перебираются
+    # только в магазинах, изменившихся с прошлого обновления
+    totals = stores.totals()
+    total_products = totals['items']
+    total_value = totals['value']
+    low_stock = totals['low_stock']
+    expiring_soon = expiring_count(totals['expiry'])
+    
+   
+    table_columns = [{"name": i, "id": i} for i in ['store', 'name', 'sku', 'quantity', 'price', 'status', 'manager']]
+    table_data = table_records(df, [column['id'] for column in table_columns])
+    
+   
+    total_products_indicator = [
+        html.H4("Всего товаров", style={'color': '#3498db'}),
+        html.H2(str(total_products), style={'color': '#3498db', 'margin': '10px 0'}),
+        html.P(f"{totals['stores']} магазинов")
+    ]
+    
+    total_value_indicator = [
+        html.H4("Общая стоимость", style={'color': '#27ae60'}),
+        html.H2(f"{total_value:,.0f} руб", style={'color': '#27ae60', 'margin': '10px 0'}),
+        html.P("Стоимость запасов")
+    ]
+    
+    low_stock_indicator = [
+        html.H4("Низкий запас", style={'color': '#e74c3c'}),
+        html.H2(str(low_stock), style={'color': '#e74c3c', 'margin': '10px 0'}),
+        html.P("ниже минимального уровня")
+    ]
+    
+    expiring_soon_indicator = [
+        html.H4("Скоро истечет", style={'color': '#f39c12'}),
+        html.H2(str(expiring_soon), style={'color': '#f39c12', 'margin': '10px 0'}),
+        html.P("в течение 30 дней")
+    ]
+    
+
+    stock_fig = go.Figure()
+    stock_fig.add_trace(go.Bar(
+        x=df['name'][:10],  
+        y=df['quantity'][:10],
+        name='Количество',
+        marker_color='#3498db'
+    ))
+    stock_fig.update_layout(
+        title='Уровень запасов (ТОП-10)',
+        xaxis_title='Товар',
+        yaxis_title='Количество, шт.'
+    )
+    
+    
+    missing = df['category'].isna()
+    if missing.any():
+        df['category'] = df['category'].astype(object).where(~missing, df['name'].map(classifier.classify))
+    
+    # В фигуру уходят итоги по категориям, а не подпись каждого товара
+    categories = df['category'].value_counts(sort=False)
+    category_fig = px.pie(
+        names=categories.index.astype(str),
+        values=categories.to_numpy(),
+        title='Распределение по категориям',
+        hole=0.4
+    )
+    
+    return (
+        table_data,
+        table_columns,
+        total_products_indicator,
+        total_value_indicator,
+        low_stock_indicator,
+        expiring_soon_indicator,
+        stock_fig,
+        category_fig,
+        f"Товаров в базе: {len(products_db)}"
+    )
+
+
+def render_audit(audit, active_cell, rows):
+    """Последние изменения выбранного в таблице товара или всей сети"""
+    if audit is None:
+        return [], "Журнал изменений не подключен"
+    if active_cell and rows and active_cell['row'] < len(rows):
+        row = rows[active_cell['row']]
+        if row.get('sku') is not None:
+            entries = audit.history(row['store'], row['sku'], AUDIT_LIMIT)
+            return entries, f"Товар {row['name']} ({row['sku']}), магазин {row['store']}"
+    return audit.recent(AUDIT_LIMIT), "Последние изменения (выберите товар в таблице остатков)"
+
+
+def create_app(products_db, stores, classifier, metrics, export_sources, audit=None):
+    """Приложение Dash поверх данных бота"""
+    app = dash.Dash(__name__)
+    app.title = "Аналитика товаров - Retail Management"
+    add_metrics_route(app.server, metrics)
+    add_compression(app.server)
+    app.layout = build_layout(len(products_db))
+
+    @app.callback(
+        [Output('products-table', 'data'),
+         Output('products-table', 'columns'),
+         Output('total-products-indicator', 'children'),
+         Output('total-value-indicator', 'children'),
+         Output('low-stock-indicator', 'children'),
+         Output('expiring-soon-indicator', 'children'),
+         Output('stock-level-chart', 'figure'),
+         Output('category-distribution', 'figure'),
+         Output('live-counter', 'children')],
+        [Input('interval-component', 'n_intervals')]
+    )
+    @metrics.timed('dash_callback')
+    @native_outputs
+    def update_dashboard(n):
+        """Обновление дашборда данными из бота"""
+        return render_dashboard(products_db, stores, classifier)
+
+    @app.callback(
+        [Output('audit-table', 'data'),
+         Output('audit-title', 'children')],
+        [Input('products-table', 'active_cell'),
+         Input('interval-component', 'n_intervals')],
+        [State('products-table', 'derived_viewport_data')]
+    )
+    @metrics.timed('dash_callback')
+    def update_audit(active_cell, n, rows):
+        """История изменений для таблицы журнала"""
+        return render_audit(audit, active_cell, rows)
+
+    @app.server.route('/export/<filename>')
+    def export_download(filename):
+        """Потоковая выгрузка остатков или продаж из дашборда"""
+        kind, _, ext = filename.partition('.')
+        if kind not in export_sources or ext not in ('csv', 'csv.gz'):
+            return Response("Неизвестный тип выгрузки", status=404)
+        source, columns = export_sources[kind]
+        records = source()
+        if kind == 'sales':
+            try:
+                start, end = period_bounds(request.args.get('period'))
+            except ValueError:
+                return Response("Неверный период", status=400)
+            records = iter_records(records, start, end)
+        filename = f"{kind}_{datetime.now():%Y%m%d_%H%M}.{ext}"
+        return Response(
+            csv_chunks(records, columns, compress=ext == 'csv.gz'),
+            mimetype='application/gzip' if ext == 'csv.gz' else 'text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+
+    return app
@@ -1,262 +1,275 @@
 import asyncio
+import csv
+import heapq
+import io
+import itertools
 import logging
+import os
+import tempfile
 import threading
-import pandas as pd
 from datetime import datetime
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-import dash
-from dash import Input, Output, dcc, html, dash_table
-import plotly.express as px
-import plotly.graph_objects as go
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, FSInputFile
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from os import getenv
 
 from dotenv import load_dotenv
 
+from notifications import NotificationQueue
+from alerts import StockAlertEngine, DEFAULT_MIN_LEVEL, DEFAULT_CRITICAL_LEVEL, is_low_stock
+from reorder import (plan_store_orders, format_purchase_order, on_order_quantities, receive_on_order,
+                     DEFAULT_SUPPLIER, DEFAULT_LEAD_TIME, WINDOW_DAYS)
+from scheduler import Scheduler
+from barcodes import ReceivingSession, is_valid_gtin
+from inventory_count import CountSession, DEFAULT_ZONE
+from replenishment import ReplenishmentQueue, ASSIGNED, priority_label, shelf_shortfall
+from blobs import BlobStore
+from audit import AuditJournal
+from documents import DocumentRegistry, DOCUMENT_FORMATS, render_documents, summary_spec
+from classifier import CategoryClassifier
+from stores import StoreRegistry
+from products import Product
+from export import STOCK_COLUMNS, SALES_COLUMNS, iter_records, period_bounds, write_export
+from webhook import run_webhook
+from metrics import MetricsRegistry, TimingMiddleware
+from cache import ResponseCache
+
 # ================== КОНФИГУРАЦИЯ ==================
 load_dotenv()
 API_TOKEN = getenv('TOKEN')
 DASH_PORT = 8050
 DASHBOARD_URL = "http://127.0.0.1:8050"  
+MANAGER_CHAT_ID = getenv('MANAGER_CHAT_ID')  # Чат для уведомлений о запасах
+ADMIN_IDS = {int(x) for x in getenv('ADMIN_IDS', '').split(',') if x.strip()}  # Доступ к /perf
+TELEGRAM_API_BASE = getenv('TELEGRAM_API_BASE')  # Альтернативный Bot API сервер (локальный)
+DEFAULT_STORE = getenv('DEFAULT_STORE', '1')  # Магазин для пользователей без привязки
+CATEGORIES_FILE = getenv('CATEGORIES_FILE')  # JSON-словарь категорий {"Категория": ["слово", ...]}
+COST_METHOD = getenv('COST_METHOD', 'fifo')  # Себестоимость продаж: fifo или average
+BLOB_DIR = getenv('BLOB_DIR', 'blobs')  # Фотоотчеты: файлы по хешу содержимого
+AUDIT_DIR = getenv('AUDIT_DIR', 'audit')  # Журнал изменений товаров
+DOCUMENTS_DIR = getenv('DOCUMENTS_DIR', 'documents')  # Архив актов и отчетов
+DOCUMENT_FORMAT = getenv('DOCUMENT_FORMAT', 'html')  # html или pdf (нужен weasyprint)
+if DOCUMENT_FORMAT not in DOCUMENT_FORMATS:
+    raise ValueError(f"DOCUMENT_FORMAT: ожидается {' или '.join(DOCUMENT_FORMATS)}, получено {DOCUMENT_FORMAT}")
+
+# Режим webhook включается заданием публичного адреса
+WEBHOOK_URL = getenv('WEBHOOK_URL')
+WEBHOOK_PATH = getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_HOST = getenv('WEBHOOK_HOST', '127.0.0.1')   # наружу - через обратный прокси
+WEBHOOK_PORT = int(getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_SECRET = getenv('WEBHOOK_SECRET')
+WEBHOOK_WORKERS = int(getenv('WEBHOOK_WORKERS', '64'))
+
+# Кеш отрисованных отчетов (/list, /report, /dashboard, быстрый отчет)
+RESPONSE_CACHE_TTL = float(getenv('RESPONSE_CACHE_TTL', '60'))
+RESPONSE_CACHE_SIZE = int(getenv('RESPONSE_CACHE_SIZE', '256'))
 
 # ================== ХРАНИЛИЩЕ ТОВАРОВ ==================
+# Общие списки сети; для команд бота данные разделены по магазинам
 products_db = []
 sales_history = []
+stores = StoreRegistry(DEFAULT_STORE, COST_METHOD)
+purchase_orders = []
+alert_engine = StockAlertEngine()
+receiving_sessions = {}  # id пользователя -> сессия приемки
+count_sessions = {}      # id пользователя -> сессия инвентаризации
+inventory_log = []
+replenishment = ReplenishmentQueue()  # Задания на пополнение полок
+blob_store = BlobStore(BLOB_DIR)
+audit = AuditJournal(AUDIT_DIR)
+documents = DocumentRegistry(DOCUMENTS_DIR)  # Акты приемки, расхождений и брака
+response_cache = ResponseCache(RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE)
+classifier = CategoryClassifier.from_file(CATEGORIES_FILE) if CATEGORIES_FILE else CategoryClassifier()
+
+# Поля, доступные для /update: русское название -> (ключ, тип)
+UPDATE_FIELDS = {
+    'название': ('name', str),
+    'количество': ('quantity', int),
+    'цена': ('price', float),
+    'срок': ('expiry', str),
+    'категория': ('category', str),
+    'минимум': ('min_level', int),
+    'критический': ('critical_level', int),
+    'заказ': ('reorder_qty', int),
+    'поставщик': ('supplier', str),
+    'срок поставки': ('lead_time', int),
+    'зона': ('zone', str),
+    'полка': ('shelf', str),
+    'вместимость полки': ('shelf_capacity', int),
+    'на полке': ('shelf_quantity', int),
+}
+UPDATE_TYPES = dict(UPDATE_FIELDS.values())
+# Названия полей в истории изменений
+FIELD_NAMES = {key: name for name, (key, _) in UPDATE_FIELDS.items()}
+FIELD_NAMES.update(status='статус', manager='ответственный')
+# Поля с проверкой значения меняются только своими командами
+UPDATE_COMMANDS = {
+    'status': '/status', 'статус': '/status',
+    'manager': '/manager', 'ответственный': '/manager',
+    'barcode': '/barcode', 'штрихкод': '/barcode',
+}
 
 # ================== TELEGRAM BOT ==================
-bot = Bot(token=API_TOKEN)
+if TELEGRAM_API_BASE:
+    bot = Bot(token=API_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_BASE)))
+else:
+    bot = Bot(token=API_TOKEN)
 dp = Dispatcher()
+notifier = NotificationQueue(bot)
+scheduler = Scheduler()
 
-# ================== DASH DASHBOARD ==================
-app = dash.Dash(__name__)
-app.title = "Аналитика товаров - Retail Management"
-
-styles = {
-    'header': {
-        'backgroundColor': '#2c3e50',
-        'color': 'white',
-        'padding': '20px',
-        'textAlign': 'center',
-        'borderRadius': '10px',
-        'marginBottom': '20px'
-    },
-    'card': {
-        'backgroundColor': '#f8f9fa',
-        'padding': '15px',
-        'borderRadius': '10px',
-        'boxShadow': '0 2px 4px rgba(0,0,0,0.1)',
-        'marginBottom': '20px'
-    }
+# ================== МЕТРИКИ ==================
+metrics = MetricsRegistry()
+dp.message.middleware(TimingMiddleware(metrics, 'bot_handler'))
+dp.callback_query.middleware(TimingMiddleware(metrics, 'bot_callback'))
+metrics.gauge('notification_queue_pending', lambda: notifier.pending, 'Сообщений в очереди отправки')
+metrics.gauge('notifications_sent', lambda: notifier.sent, 'Отправлено уведомлений')
+metrics.gauge('notifications_failed', lambda: notifier.failed, 'Не доставлено уведомлений')
+metrics.gauge('products', lambda: len(products_db), 'Товаров в сети')
+metrics.gauge('sales', lambda: len(sales_history), 'Продаж в истории')
+metrics.gauge('store_products', lambda: {k: len(v.products) for k, v in stores.partitions.items()}, 'Товаров по магазинам')
+metrics.gauge('purchase_orders', lambda: len(purchase_orders), 'Заявок на закупку')
+metrics.gauge('shelf_tasks', lambda: {'open': len(replenishment.open), 'staff': len(replenishment.staff)}, 'Задания на пополнение полок и сотрудники на смене')
+metrics.gauge('audit_pending', lambda: audit.pending, 'Записей журнала изменений в очереди на диск')
+metrics.gauge('documents', lambda: len(documents), 'Выпущено документов')
+metrics.gauge('open_sessions', lambda: {'receiving': len(receiving_sessions), 'count': len(count_sessions)}, 'Открытые сессии приемки и инвентаризации')
+metrics.gauge('response_cache', response_cache.stats, 'Кеш отрисованных отчетов')
+metrics.gauge('jobs_running', lambda: sum(1 for job in scheduler.metrics() if job['running']), 'Выполняющихся фоновых задач')
+
+EXPORT_SOURCES = {
+    'stock': (lambda: products_db, STOCK_COLUMNS),
+    'sales': (lambda: sales_history, SALES_COLUMNS),
 }
 
-# Макет дашборда
-app.layout = html.Div(style={'margin': '20px', 'fontFamily': 'Arial, sans-serif'}, children=[
-    html.Div(style=styles['header'], children=[
-        html.H1("📊 Аналитика управления товарами"),
-        html.P("Данные из Telegram-бота в реальном времени"),
-        html.P(f"Товаров в базе: {len(products_db)}", id='live-counter')
-    ]),
-    
-    # Индикаторы
-    html.Div([
-        html.Div(id='total-products-indicator', style={
-            'backgroundColor': '#ffffff',
-            'padding': '15px',
-            'borderRadius': '8px',
-            'textAlign': 'center',
-            'boxShadow': '0 1px 3px rgba(0,0,0,0.1)',
-            'width': '24%',
-            'display': 'inline-block',
-            'marginRight': '1%'
-        }),
-        html.Div(id='total-value-indicator', style={
-            'backgroundColor': '#ffffff',
-            'padding': '15px',
-            'borderRadius': '8px',
-            'textAlign': 'center',
-            'boxShadow': '0 1px 3px rgba(0,0,0,0.1)',
-            'width': '24%',
-            'display': 'inline-block',
-            'marginRight': '1%'
-        }),
-        html.Div(id='low-stock-indicator', style={
-            'backgroundColor': '#ffffff',
-            'padding': '15px',
-            'borderRadius': '8px',
-            'textAlign': 'center',
-            'boxShadow': '0 1px 3px rgba(0,0,0,0.1)',
-            'width': '24%',
-            'display': 'inline-block',
-            'marginRight': '1%'
-        }),
-        html.Div(id='expiring-soon-indicator', style={
-            'backgroundColor': '#ffffff',
-            'padding': '15px',
-            'borderRadius': '8px',
-            'textAlign': 'center',
-            'boxShadow': '0 1px 3px rgba(0,0,0,0.1)',
-            'width': '24%',
-            'display': 'inline-block'
-        }),
-    ]),
-    
-    # Графики
-    html.Div([
-        html.Div([
-            dcc.Graph(id='stock-level-chart'),
-        ], style={'width': '49%', 'display': 'inline-block', 'marginRight': '1%'}),
-        
-        html.Div([
-            dcc.Graph(id='category-distribution'),
-        ], style={'width': '49%', 'display': 'inline-block'}),
-    ]),
-    
-    # Таблица товаров
-    html.Div(style=styles['card'], children=[
-        html.H3("📋 Текущие товарные остатки"),
-        dash_table.DataTable(
-            id='products-table',
-            page_size=10,
-            style_table={'overflowX': 'auto'},
-            style_cell={'textAlign': 'left', 'padding': '10px'},
-            style_header={
-                'backgroundColor': '#2c3e50',
-                'color': 'white',
-                'fontWeight': 'bold'
-            },
-        )
-    ]),
-    
-    # Обновление данных
-    dcc.Interval(
-        id='interval-component',
-        interval=5000,  # Обновление каждые 5 секунд
-        n_intervals=0
-    )
-])
-
-@app.callback(
-    [Output('products-table', 'data'),
-     Output('products-table', 'columns'),
-     Output('total-products-indicator', 'children'),
-     Output('total-value-indicator', 'children'),
-     Output('low-stock-indicator', 'children'),
-     Output('expiring-soon-indicator', 'children'),
-     Output('stock-level-chart', 'figure'),
-     Output('category-distribution', 'figure'),
-     Output('live-counter', 'children')],
-    [Input('interval-component', 'n_intervals')]
-)
-def update_dashboard(n):
-    """Обновление дашборда данными из бота"""
-    
-    # Создаем DataFrame из данных бота
-    df = pd.DataFrame(products_db)
-    
-    if len(df) == 0:
-        empty_df = pd.DataFrame([{'sku': 'Нет данных', 'name': 'Нет данных', 'quantity': 0}])
-        return (
-            empty_df.to_dict('records'),
-            [{"name": i, "id": i} for i in empty_df.columns],
-            [html.H4("Всего товаров"), html.H2("0")],
-            [html.H4("Общая стоимость"), html.H2("0 руб")],
-            [html.H4("Низкий запас"), html.H2("0")],
-            [html.H4("Срок годности"), html.H2("0")],
-            go.Figure(),
-            go.Figure(),
-            f"Товаров в базе: 0"
-        )
-    
-    # Расчет показателей
-    total_products = len(df)
-    total_value = (df['quantity'] * df['price']).sum()
-    low_stock = len(df[df['quantity'] < 5])
-    
-  
-    now = datetime.now()
-    expiring_soon = 0
-    for product in products_db:
-        if 'expiry' in product:
-            try:
-                expiry_date = datetime.strptime(product['expiry'], '%Y-%m-%d')
-                days_left = (expiry_date - now).days
-                if 0 <= days_left <= 30:
-                    expiring_soon += 1
-            except:
-                pass
-    
-   
-    table_data = df.to_dict('records')
-    table_columns = [{"name": i, "id": i} for i in ['name', 'sku', 'quantity', 'price', 'status', 'manager']]
-    
-   
-    total_products_indicator = [
-        html.H4("Всего товаров", style={'color': '#3498db'}),
-        html.H2(str(total_products), style={'color': '#3498db', 'margin': '10px 0'}),
-        html.P(f"{len(df)} позиций")
-    ]
-    
-    total_value_indicator = [
-        html.H4("Общая стоимость", style={'color': '#27ae60'}),
-        html.H2(f"{total_value:,.0f} руб", style={'color': '#27ae60', 'margin': '10px 0'}),
-        html.P("Стоимость запасов")
-    ]
-    
-    low_stock_indicator = [
-        html.H4("Низкий запас", style={'color': '#e74c3c'}),
-        html.H2(str(low_stock), style={'color': '#e74c3c', 'margin': '10px 0'}),
-        html.P("менее 5 шт.")
-    ]
-    
-    expiring_soon_indicator = [
-        html.H4("Скоро истечет", style={'color': '#f39c12'}),
-        html.H2(str(expiring_soon), style={'color': '#f39c12', 'margin': '10px 0'}),
-        html.P("в течение 30 дней")
-    ]
-    
 
-    stock_fig = go.Figure()
-    stock_fig.add_trace(go.Bar(
-        x=df['name'][:10],  
-        y=df['quantity'][:10],
-        name='Количество',
-        marker_color='#3498db'
-    ))
-    stock_fig.update_layout(
-        title='Уровень запасов (ТОП-10)',
-        xaxis_title='Товар',
-        yaxis_title='Количество, шт.'
-    )
-    
-    
-    if 'category' not in df.columns:
-        categories = ['Электроника', 'Одежда', 'Продукты', 'Бытовая техника', 'Мебель']
-        df['category'] = [categories[i % len(categories)] for i in range(len(df))]
-    
-    category_fig = px.pie(
-        df,
-        names='category',
-        title='Распределение по категориям',
-        hole=0.4
-    )
-    
-    return (
-        table_data,
-        table_columns,
-        total_products_indicator,
-        total_value_indicator,
-        low_stock_indicator,
-        expiring_soon_indicator,
-        stock_fig,
-        category_fig,
-        f"Товаров в базе: {len(products_db)}"
-    )
+_dashboard_app = None
+_dashboard_lock = threading.Lock()
+
+def get_dashboard_app():
+    """Приложение дашборда; создается при первом обращении"""
+    global _dashboard_app
+    with _dashboard_lock:
+        if _dashboard_app is None:
+            from live_dashboard import create_app
+            _dashboard_app = create_app(products_db, stores, classifier, metrics, EXPORT_SOURCES, audit)
+    return _dashboard_app
+
+def dashboard_wsgi(environ, start_response):
+    """WSGI-вход дашборда для режима webhook"""
+    return get_dashboard_app().server(environ, start_response)
 
 def run_dashboard():
     """Запуск дашборда в отдельном потоке"""
-    app.run(debug=False, port=DASH_PORT, host='127.0.0.1')
+    get_dashboard_app().run(debug=False, port=DASH_PORT, host='127.0.0.1')
+
+def check_stock_alert(product, chat_id):
+    """Проверка порогов запаса после изменения остатка товара"""
+    alert = alert_engine.evaluate(product)
+    if alert:
+        notifier.notify(MANAGER_CHAT_ID or chat_id, alert)
+
+
+def store_for(message):
+    """Магазин, к которому привязан автор сообщения"""
+    return stores.for_user(message.from_user.id)
+
 
+def find_product(message, sku):
+    return store_for(message).find(sku)
+
+
+def add_product(store, product):
+    store.add_product(product)
+    products_db.append(product)
+
+
+def product_changed(product, chat_id):
+    """Сверка партий, сброс агрегатов магазина и проверка порогов после изменения товара.
+
+    Вызывается после любого изменения товара: touch() меняет версию
+    магазина, по которой кешируются агрегаты и ответы cached_response.
+    """
+    store = stores.get(product.get('store', DEFAULT_STORE))
+    store.costs.sync(product)
+    store.touch()
+    check_stock_alert(product, chat_id)
+    send_task(replenishment.check(product))
+
+
+def mutate(product, message, **changes):
+    """Изменение полей товара командой: новые значения, запись в журнал, затем product_changed.
+
+    Запись в журнал делается после присваивания: в журнале только
+    изменения, которые действительно применены. Поля без изменения
+    значения в журнал не попадают.
+    """
+    for key, value in changes.items():
+        old = product.get(key)
+        product[key] = value
+        if old != value:
+            audit.record(message.from_user, product, key, old, value)
+    product_changed(product, message.chat.id)
+
+
+def format_task(task):
+    """Карточка задания на пополнение полки для исполнителя"""
+    product = task.product
+    return (
+        f"🧺 <b>Задание №{task.task_id}: пополнение полки</b>\n\n"
+        f"<b>Полка:</b> {product['shelf']}\n"
+        f"<b>Товар:</b> {product['name']} ({product['sku']})\n"
+        f"<b>Необходимое количество:</b> {task.quantity} шт.\n"
+        f"<b>Место на складе:</b> {product.get('zone', DEFAULT_ZONE)}\n"
+        f"<b>Приоритет:</b> {priority_label(task, replenishment.velocity(product))}\n\n"
+        f"Выложите товар и отправьте фото выкладки.\n"
+        f"Отказаться: /задание_отклонить Причина"
+    )
+
+
+def task_keyboard(task):
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="✅ Принято", callback_data=f"task_accept:{task.task_id}")]]
+    )
+
+
+def send_task(task):
+    """Отправка назначенного задания исполнителю"""
+    if task is not None and task.status == ASSIGNED:
+        notifier.send(task.assignee, format_task(task), parse_mode='HTML', reply_markup=task_keyboard(task))
+
+
+async def cached_response(name, store, render, *args):
+    """Ответ команды только для чтения из кеша по версии данных магазина.
+
+    Версия меняется в product_changed() (или mutate()), через которые
+    проходит каждое изменение товаров магазина.
+
+    Текст строится в пуле потоков, чтобы отчет по большому каталогу не
+    задерживал остальные обновления.
+    """
+    key = (name, store.store_id, store.version, args)
+    return await response_cache.get(key, asyncio.to_thread, render, store, *args)
+
+
+def make_product(name, sku, quantity, price, expiry, category=None):
+    """Новая карточка товара; категория определяется по названию, если не задана"""
+    return Product(
+        name=name,
+        sku=sku,
+        quantity=quantity,
+        price=price,
+        expiry=expiry,
+        status='В наличии',
+        manager='Не назначен',
+        category=category or classifier.classify(name),
+        min_level=DEFAULT_MIN_LEVEL,
+        critical_level=DEFAULT_CRITICAL_LEVEL,
+        supplier=DEFAULT_SUPPLIER,
+        lead_time=DEFAULT_LEAD_TIME,
+        zone=DEFAULT_ZONE,
+    )
 
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message):
@@ -269,10 +282,43 @@ async def cmd_start(message: types.Message):
         "/update SKU, Поле, Значение - Обновить\n"
         "/delete SKU, Кол-во - Списать\n"
         "/status SKU, Статус - Изменить статус\n"
-        "/manager SKU, ФИО - Назначить ответственного\n\n"
+        "/manager SKU, ФИО - Назначить ответственного\n"
+        "/threshold SKU, Мин, Крит, Заказ - Пороги запаса\n"
+        "/barcode SKU, Штрих-код - Привязать штрих-код\n"
+        "/history [SKU[, Кол-во]] - История изменений\n"
+        "CSV-файл с подписью /import - Массовая загрузка\n\n"
+        "<b>📄 Документы:</b>\n"
+        "/акт_брак SKU, Кол-во, Тип брака - Акт о браке\n"
+        "/документы [ГГГГ-ММ-ДД] - Документы за день\n"
+        "/документ Номер - Получить файл документа\n\n"
+        "<b>📥 Приемка:</b>\n"
+        "/приемка_start Накладная - Начать приемку\n"
+        "Штрих-код[, Кол-во, Срок, Качество] - Скан товара\n"
+        "/приемка_завершить - Провести приемку\n"
+        "/приемка_отмена - Отменить приемку\n\n"
+        "<b>🔢 Инвентаризация:</b>\n"
+        "/инвентаризация_начать Зона - Начать пересчет\n"
+        "/count SKU, Кол-во[, Причина] - Факт по товару\n"
+        "/инвентаризация_статус - Текущие расхождения\n"
+        "/инвентаризация_завершить - Применить корректировки\n\n"
         "<b>📈 Аналитика и отчеты:</b>\n"
         "/dashboard - Запустить аналитику\n"
         "/sell SKU, Кол-во, Цена - Продажа товара\n"
+        "/reorder - Сформировать заявки на закупку\n"
+        "/export stock|sales [период] [gz|parquet] - Выгрузка\n"
+        "/daily - Сводный отчет за день\n"
+        "/jobs - Фоновые задачи\n"
+        "/perf - Задержки обработчиков (администраторы)\n\n"
+        "<b>🧺 Пополнение полок:</b>\n"
+        "/смена_начать - Получать задания\n"
+        "/задание - Текущее или следующее задание\n"
+        "Фото выкладки - Завершить задание\n"
+        "/задание_отклонить Причина - Отказаться от задания\n"
+        "/смена_завершить - Закончить смену\n"
+        "/задания - Очередь заданий магазина\n\n"
+        "<b>🏬 Магазины:</b>\n"
+        "/store Номер - Выбрать магазин\n"
+        "/stores - Показатели по магазинам\n"
         "/help - Справка",
         parse_mode='HTML'
     )
@@ -282,14 +328,21 @@ async def cmd_help(message: types.Message):
     await message.answer(
         "📚 <b>Справка по использованию бота</b>\n\n"
         "<b>Форматы команд:</b>\n"
-        "• /add Название, SKU, Количество, Цена, Срок годности\n"
-        "  Пример: /add Кофеварка, SKU-001, 10, 15000, 2025-12-31\n\n"
+        "• /add Название, SKU, Количество, Цена, Срок годности[, Штрих-код]\n"
+        "  Пример: /add Кофеварка, SKU-001, 10, 15000, 2025-12-31, 5901234123457\n\n"
         "• /update SKU, Поле, Новое значение\n"
         "  Пример: /update SKU-001, количество, 15\n\n"
         "• /delete SKU, Количество\n"
         "  Пример: /delete SKU-001, 2\n\n"
         "• /status SKU, Статус\n"
         "  Пример: /status SKU-001, В резерве\n\n"
+        "• /threshold SKU, Минимум, Критический[, Размер заказа]\n"
+        "  Пример: /threshold SKU-001, 10, 5, 50\n\n"
+        "• Полка товара для заданий на пополнение\n"
+        "  Пример: /update SKU-001, полка, А-12\n"
+        "  Пример: /update SKU-001, вместимость полки, 40\n\n"
+        "• /акт_брак SKU, Количество, Тип брака\n"
+        "  Пример: /акт_брак SKU-001, 5, Производственный дефект\n\n"
         "<b>Доступные статусы:</b> В наличии, Нет в наличии, В резерве, Списано",
         parse_mode='HTML'
     )
@@ -309,6 +362,7 @@ async def cmd_add(message: types.Message):
             return
         
         name, sku, quantity, price, expiry = args[0], args[1], args[2], args[3], args[4]
+        barcode = args[5] if len(args) > 5 else None
         
         try:
             quantity = int(quantity)
@@ -316,42 +370,39 @@ async def cmd_add(message: types.Message):
         except ValueError:
             await message.answer("❌ <b>Ошибка данных</b>\nКоличество должно быть целым числом, цена - числом", parse_mode='HTML')
             return
+        if quantity <= 0 or price < 0:
+            await message.answer("❌ <b>Ошибка данных</b>\nКоличество должно быть больше нуля, цена не может быть отрицательной", parse_mode='HTML')
+            return
         
        
-        for p in products_db:
-            if p['sku'] == sku:
-                p['quantity'] += quantity
-                await message.answer(
-                    f"✅ <b>Товар обновлен</b>\n"
-                    f"Артикул: {sku}\n"
-                    f"Новое количество: {p['quantity']} шт.\n"
-                    f"Общая стоимость: {p['quantity'] * p['price']:,.0f} руб",
-                    parse_mode='HTML'
-                )
-                return
+        store = store_for(message)
+        p = store.find(sku)
+        if p is not None:
+            p['quantity'] += quantity
+            store.costs.receive(p, quantity, price)
+            product_changed(p, message.chat.id)
+            await message.answer(
+                f"✅ <b>Товар обновлен</b>\n"
+                f"Артикул: {sku}\n"
+                f"Новое количество: {p['quantity']} шт.\n"
+                f"Общая стоимость: {store.costs.value(p):,.0f} руб",
+                parse_mode='HTML'
+            )
+            return
         
       
-        category = "Другое"
-        if any(word in name.lower() for word in ['телефон', 'ноутбук', 'планшет']):
-            category = "Электроника"
-        elif any(word in name.lower() for word in ['кофе', 'чай', 'молоко']):
-            category = "Продукты"
-        elif any(word in name.lower() for word in ['футболка', 'джинсы', 'куртка']):
-            category = "Одежда"
-        
-        product = {
-            'name': name,
-            'sku': sku,
-            'quantity': quantity,
-            'price': price,
-            'expiry': expiry,
-            'status': 'В наличии',
-            'manager': 'Не назначен',
-            'category': category,
-            'added_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        products_db.append(product)
+        product = make_product(name, sku, quantity, price, expiry)
+        category = product['category']
+        
+        if barcode:
+            try:
+                store.barcodes.add(barcode, product)
+            except ValueError as e:
+                await message.answer(f"❌ <b>Ошибка штрих-кода</b>\n{e}", parse_mode='HTML')
+                return
+        
+        add_product(store, product)
+        product_changed(product, message.chat.id)
         
         await message.answer(
             f"✅ <b>Товар добавлен</b>\n"
@@ -367,35 +418,114 @@ async def cmd_add(message: types.Message):
     except Exception as e:
         await message.answer(f"❌ <b>Ошибка:</b> {str(e)}", parse_mode='HTML')
 
+def import_products(store, rows):
+    """Массовая загрузка товаров из строк CSV; возвращает (добавлено, обновлено, ошибки, измененные).
+
+    Строки нумеруются как в файле (первая - заголовок) до отбора, поэтому
+    номера в ошибках совпадают с файлом; строки без артикула или названия
+    попадают в ошибки.
+    """
+    added, updated, errors, changed = 0, 0, [], []
+    numbered = []
+    for line, row in enumerate(rows, 2):
+        # csv.DictReader пропускает пустые строки файла: номер берется у него
+        line = getattr(rows, 'line_num', line)
+        if (row.get('sku') or '').strip() and (row.get('name') or '').strip():
+            numbered.append((line, row))
+        else:
+            errors.append(f"строка {line}: нет артикула или названия, пропущена")
+    # Категории определяются одним проходом по всем названиям
+    categories = classifier.classify_many(row['name'].strip() for _, row in numbered)
+    
+    for (line, row), category in zip(numbered, categories):
+        try:
+            sku = row['sku'].strip()
+            quantity = int(row.get('quantity') or 0)
+            price = float(row.get('price') or 0)
+        except ValueError:
+            errors.append(f"строка {line}: неверное количество или цена")
+            continue
+        if quantity < 0 or price < 0:
+            errors.append(f"строка {line}: количество и цена не могут быть отрицательными")
+            continue
+        
+        product = store.find(sku)
+        if product is not None:
+            product['quantity'] += quantity
+            if row.get('price'):
+                store.costs.receive(product, quantity, price)
+            updated += 1
+        else:
+            product = make_product(row['name'].strip(), sku, quantity, price,
+                                   (row.get('expiry') or '').strip(), row.get('category') or category)
+            if row.get('barcode'):
+                try:
+                    store.barcodes.add(row['barcode'].strip(), product)
+                except ValueError as e:
+                    errors.append(f"строка {line}: {e}")
+            add_product(store, product)
+            added += 1
+        changed.append(product)
+    return added, updated, errors, changed
+
+@dp.message(F.document, F.caption.startswith('/import'))
+async def cmd_import(message: types.Message):
+    """Массовая загрузка товаров из CSV: name, sku, quantity, price, expiry[, barcode, category]"""
+    try:
+        data = await bot.download(message.document)
+        reader = csv.DictReader(io.StringIO(data.read().decode('utf-8-sig')))
+        missing = {'name', 'sku', 'quantity', 'price'} - set(reader.fieldnames or [])
+        if missing:
+            await message.answer(f"❌ <b>Неверный формат файла</b>\nНет колонок: {', '.join(sorted(missing))}", parse_mode='HTML')
+            return
+        
+        added, updated, errors, changed = import_products(store_for(message), reader)
+        for product in changed:
+            product_changed(product, message.chat.id)
+        
+        response = (
+            f"✅ <b>Импорт завершен</b>\n"
+            f"Добавлено: {added}\n"
+            f"Обновлено: {updated}\n"
+            f"Ошибок: {len(errors)}"
+        )
+        if errors:
+            response += "\n\n" + "\n".join(errors[:10])
+        await message.answer(response, parse_mode='HTML')
+    except Exception as e:
+        await message.answer(f"❌ <b>Ошибка импорта:</b> {str(e)}", parse_mode='HTML')
+
 @dp.message(Command("list"))
 async def cmd_list(message: types.Message):
     """Просмотр остатков с информацией из дашборда"""
-    if not products_db:
+    store = store_for(message)
+    if not store.products:
         await message.answer("📦 <b>Склад пуст</b>\nДобавьте товары командой /add", parse_mode='HTML')
         return
     
-   
-    total_value = sum(p['quantity'] * p['price'] for p in products_db)
-    total_items = sum(p['quantity'] for p in products_db)
+    response = await cached_response('list', store, render_list)
+    await message.answer(response, parse_mode='HTML')
+
+def render_list(store):
+    """Текст /list по остаткам магазина"""
+    stock = store.stock()
     
-    response = f"📊 <b>Остатки товаров</b>\n\n"
-    response += f"Всего позиций: {len(products_db)}\n"
-    response += f"Общее количество: {total_items} шт.\n"
-    response += f"Стоимость запасов: {total_value:,.0f} руб\n\n"
+    response = f"📊 <b>Остатки товаров (магазин {store.store_id})</b>\n\n"
+    response += f"Всего позиций: {stock['items']}\n"
+    response += f"Общее количество: {stock['quantity']} шт.\n"
+    response += f"Стоимость запасов: {stock['value']:,.0f} руб\n\n"
     response += "<b>ТОП-5 товаров:</b>\n"
     
-   
-    sorted_products = sorted(products_db, key=lambda x: x['quantity'], reverse=True)[:5]
+    sorted_products = heapq.nlargest(5, store.products, key=lambda x: x['quantity'])
     
     for i, product in enumerate(sorted_products, 1):
         response += f"{i}. {product['name']} ({product['sku']}): {product['quantity']} шт.\n"
     
-    if len(products_db) > 5:
-        response += f"\n... и еще {len(products_db) - 5} позиций\n"
+    if stock['items'] > 5:
+        response += f"\n... и еще {stock['items'] - 5} позиций\n"
     
     response += f"\n<i>Полный список доступен в дашборде: /dashboard</i>"
-    
-    await message.answer(response, parse_mode='HTML')
+    return response
 
 @dp.message(Command("info"))
 async def cmd_info(message: types.Message):
@@ -408,27 +538,30 @@ async def cmd_info(message: types.Message):
         
         sku = text.strip()
         
-        for product in products_db:
-            if product['sku'] == sku:
-                total_value = product['quantity'] * product['price']
-                
-                await message.answer(
-                    f"📋 <b>Детальная информация</b>\n\n"
-                    f"<b>Название:</b> {product['name']}\n"
-                    f"<b>Артикул:</b> {product['sku']}\n"
-                    f"<b>Количество:</b> {product['quantity']} шт.\n"
-                    f"<b>Цена за шт.:</b> {product['price']} руб\n"
-                    f"<b>Общая стоимость:</b> {total_value:,.0f} руб\n"
-                    f"<b>Статус:</b> {product['status']}\n"
-                    f"<b>Срок годности:</b> {product['expiry']}\n"
-                    f"<b>Ответственный:</b> {product['manager']}\n"
-                    f"<b>Категория:</b> {product['category']}\n"
-                    f"<b>Добавлен:</b> {product['added_at']}",
-                    parse_mode='HTML'
-                )
-                return
+        product = find_product(message, sku)
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            return
         
-        await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+        total_value = stores.get(product['store']).costs.value(product)
+        
+        await message.answer(
+            f"📋 <b>Детальная информация</b>\n\n"
+            f"<b>Название:</b> {product['name']}\n"
+            f"<b>Артикул:</b> {product['sku']}\n"
+            f"<b>Количество:</b> {product['quantity']} шт.\n"
+            f"<b>Цена за шт.:</b> {product['price']} руб\n"
+            f"<b>Общая стоимость:</b> {total_value:,.0f} руб\n"
+            f"<b>Статус:</b> {product['status']}\n"
+            f"<b>Срок годности:</b> {product['expiry']}\n"
+            f"<b>Ответственный:</b> {product['manager']}\n"
+            f"<b>Категория:</b> {product['category']}\n"
+            f"<b>Штрих-код:</b> {product.get('barcode') or 'не задан'}\n"
+            + (f"<b>Полка:</b> {product['shelf']}, выложено {product.get('shelf_quantity', 0)} из {product.get('shelf_capacity', 0)} шт.\n"
+               if product.get('shelf') else "")
+            + f"<b>Добавлен:</b> {product['added_at']}",
+            parse_mode='HTML'
+        )
     except Exception as e:
         await message.answer(f"❌ Ошибка: {str(e)}", parse_mode='HTML')
 
@@ -447,38 +580,49 @@ async def cmd_update(message: types.Message):
             return
         
         sku, field, value = args[0], args[1].lower(), args[2]
+        if field in UPDATE_COMMANDS:
+            await message.answer(f"❌ Поле «{field}» меняется командой {UPDATE_COMMANDS[field]}", parse_mode='HTML')
+            return
+        # Поле задается по-русски или ключом из UPDATE_FIELDS (quantity, price...)
+        key, value_type = UPDATE_FIELDS.get(field, (field, UPDATE_TYPES.get(field)))
+        if value_type is None:
+            await message.answer(f"❌ Неизвестное поле «{field}»\nДоступные поля: {', '.join(UPDATE_FIELDS)}", parse_mode='HTML')
+            return
+        
+        product = find_product(message, sku)
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            return
+        
+        old_value = product.get(key, 'не установлено')
+        
         
-        for product in products_db:
-            if product['sku'] == sku:
-                old_value = product.get(field, 'не установлено')
-                
-                
-                if field == 'количество':
-                    try:
-                        value = int(value)
-                    except ValueError:
-                        await message.answer("❌ Количество должно быть целым числом", parse_mode='HTML')
-                        return
-                elif field == 'цена':
-                    try:
-                        value = float(value)
-                    except ValueError:
-                        await message.answer("❌ Цена должна быть числом", parse_mode='HTML')
-                        return
-                
-                product[field] = value
-                
-                await message.answer(
-                    f"✅ <b>Данные обновлены</b>\n"
-                    f"Товар: {product['name']} ({sku})\n"
-                    f"Поле: {field}\n"
-                    f"Старое значение: {old_value}\n"
-                    f"Новое значение: {value}",
-                    parse_mode='HTML'
-                )
+        if value_type is int:
+            try:
+                value = int(value)
+            except ValueError:
+                await message.answer(f"❌ Поле «{field}» должно быть целым числом", parse_mode='HTML')
+                return
+        elif value_type is float:
+            try:
+                value = float(value)
+            except ValueError:
+                await message.answer("❌ Цена должна быть числом", parse_mode='HTML')
                 return
         
-        await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+        if key == 'price':
+            # Остаток сохраняет себестоимость по старой цене
+            stores.get(product['store']).costs.freeze(product)
+        mutate(product, message, **{key: value})
+        
+        await message.answer(
+            f"✅ <b>Данные обновлены</b>\n"
+            f"Товар: {product['name']} ({sku})\n"
+            f"Поле: {field}\n"
+            f"Старое значение: {old_value}\n"
+            f"Новое значение: {value}",
+            parse_mode='HTML'
+        )
     except Exception as e:
         await message.answer(f"❌ Ошибка: {str(e)}", parse_mode='HTML')
 
@@ -504,33 +648,31 @@ async def cmd_delete(message: types.Message):
             await message.answer("❌ Количество должно быть целым числом", parse_mode='HTML')
             return
         
-        for product in products_db:
-            if product['sku'] == sku:
-                if product['quantity'] >= quantity:
-                    product['quantity'] -= quantity
-                    
-                  
-                    if product['quantity'] == 0:
-                        product['status'] = 'Нет в наличии'
-                        status_msg = " (товар закончился)"
-                    else:
-                        status_msg = ""
-                    
-                    await message.answer(
-                        f"✅ <b>Товар списан</b>\n"
-                        f"Название: {product['name']}\n"
-                        f"Артикул: {sku}\n"
-                        f"Списано: {quantity} шт.\n"
-                        f"Осталось: {product['quantity']} шт.{status_msg}\n\n"
-                        f"<i>Дашборд обновлен автоматически</i>",
-                        parse_mode='HTML'
-                    )
-                    return
-                else:
-                    await message.answer(f"❌ <b>Недостаточно товара</b>\nДоступно: {product['quantity']} шт.\nТребуется: {quantity} шт.", parse_mode='HTML')
-                    return
+        product = find_product(message, sku)
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            return
         
-        await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+        if product['quantity'] >= quantity:
+            changes = {'quantity': product['quantity'] - quantity}
+            status_msg = ""
+            if changes['quantity'] == 0:
+                changes['status'] = 'Нет в наличии'
+                status_msg = " (товар закончился)"
+            mutate(product, message, **changes)
+            
+            await message.answer(
+                f"✅ <b>Товар списан</b>\n"
+                f"Название: {product['name']}\n"
+                f"Артикул: {sku}\n"
+                f"Списано: {quantity} шт.\n"
+                f"Осталось: {product['quantity']} шт.{status_msg}\n\n"
+                f"<i>Дашборд обновлен автоматически</i>",
+                parse_mode='HTML'
+            )
+            return
+        else:
+            await message.answer(f"❌ <b>Недостаточно товара</b>\nДоступно: {product['quantity']} шт.\nТребуется: {quantity} шт.", parse_mode='HTML')
     except Exception as e:
         await message.answer(f"❌ Ошибка: {str(e)}", parse_mode='HTML')
 
@@ -556,21 +698,21 @@ async def cmd_status(message: types.Message):
             await message.answer(f"❌ <b>Неверный статус</b>\nДопустимые статусы: {', '.join(valid_statuses)}", parse_mode='HTML')
             return
         
-        for product in products_db:
-            if product['sku'] == sku:
-                old_status = product['status']
-                product['status'] = new_status
-                
-                await message.answer(
-                    f"✅ <b>Статус изменен</b>\n"
-                    f"Товар: {product['name']} ({sku})\n"
-                    f"Старый статус: {old_status}\n"
-                    f"Новый статус: {new_status}",
-                    parse_mode='HTML'
-                )
-                return
+        product = find_product(message, sku)
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            return
         
-        await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+        old_status = product['status']
+        mutate(product, message, status=new_status)
+        
+        await message.answer(
+            f"✅ <b>Статус изменен</b>\n"
+            f"Товар: {product['name']} ({sku})\n"
+            f"Старый статус: {old_status}\n"
+            f"Новый статус: {new_status}",
+            parse_mode='HTML'
+        )
     except Exception as e:
         await message.answer(f"❌ Ошибка: {str(e)}", parse_mode='HTML')
 
@@ -590,32 +732,639 @@ async def cmd_manager(message: types.Message):
         
         sku, manager = args[0], args[1]
         
-        for product in products_db:
-            if product['sku'] == sku:
-                old_manager = product['manager']
-                product['manager'] = manager
-                
-                await message.answer(
-                    f"✅ <b>Ответственный назначен</b>\n"
-                    f"Товар: {product['name']} ({sku})\n"
-                    f"Прежний ответственный: {old_manager}\n"
-                    f"Новый ответственный: {manager}",
-                    parse_mode='HTML'
-                )
-                return
+        product = find_product(message, sku)
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            return
         
-        await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+        old_manager = product['manager']
+        mutate(product, message, manager=manager)
+        
+        await message.answer(
+            f"✅ <b>Ответственный назначен</b>\n"
+            f"Товар: {product['name']} ({sku})\n"
+            f"Прежний ответственный: {old_manager}\n"
+            f"Новый ответственный: {manager}",
+            parse_mode='HTML'
+        )
     except Exception as e:
         await message.answer(f"❌ Ошибка: {str(e)}", parse_mode='HTML')
 
+@dp.message(Command("threshold"))
+async def cmd_threshold(message: types.Message):
+    """Настройка минимального и критического уровней запаса"""
+    try:
+        text = message.text.replace('/threshold', '').strip()
+        if not text:
+            await message.answer("❌ <b>Неверный формат</b>\nИспользуйте: /threshold SKU, Минимум, Критический, Размер заказа\nПример: /threshold SKU-001, 10, 5, 50", parse_mode='HTML')
+            return
+        
+        args = [arg.strip() for arg in text.split(',')]
+        if len(args) < 3:
+            await message.answer("❌ <b>Недостаточно параметров</b>\nНужно минимум 3 параметра: SKU, Минимум, Критический", parse_mode='HTML')
+            return
+        
+        sku = args[0]
+        try:
+            min_level = int(args[1])
+            critical_level = int(args[2])
+            reorder_qty = int(args[3]) if len(args) > 3 else None
+        except ValueError:
+            await message.answer("❌ Уровни запаса и размер заказа должны быть целыми числами", parse_mode='HTML')
+            return
+        
+        if critical_level > min_level:
+            await message.answer("❌ Критический уровень не может быть больше минимального", parse_mode='HTML')
+            return
+        
+        product = find_product(message, sku)
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            return
+        
+        changes = {'min_level': min_level, 'critical_level': critical_level}
+        if reorder_qty is not None:
+            changes['reorder_qty'] = reorder_qty
+        mutate(product, message, **changes)
+        
+        await message.answer(
+            f"✅ <b>Пороги запаса установлены</b>\n"
+            f"Товар: {product['name']} ({sku})\n"
+            f"Минимальный уровень: {min_level} шт.\n"
+            f"Критический уровень: {critical_level} шт.\n"
+            f"Размер заказа: {product.get('reorder_qty') or 'авто'}",
+            parse_mode='HTML'
+        )
+    except Exception as e:
+        await message.answer(f"❌ Ошибка: {str(e)}", parse_mode='HTML')
+
+@dp.message(Command("history"))
+async def cmd_history(message: types.Message):
+    """История изменений товара или своих изменений (без артикула)"""
+    text = message.text.replace('/history', '').strip()
+    args = [arg.strip() for arg in text.split(',')] if text else []
+    limit = 10
+    if len(args) > 1:
+        try:
+            limit = min(max(int(args[1]), 1), 50)
+        except ValueError:
+            await message.answer("❌ Количество записей должно быть целым числом", parse_mode='HTML')
+            return
+    
+    if args:
+        product = find_product(message, args[0])
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{args[0]}</b> не найден", parse_mode='HTML')
+            return
+        entries = audit.history(product['store'], product['sku'], limit)
+        title = f"🕓 <b>История изменений {product['name']} ({product['sku']})</b>"
+    else:
+        entries = audit.by_user(message.from_user.id, limit)
+        title = "🕓 <b>Ваши последние изменения</b>"
+    
+    if not entries:
+        await message.answer(f"{title}\n\nИзменений нет", parse_mode='HTML')
+        return
+    
+    text = f"{title}\n\n"
+    for entry in entries:
+        old = 'не установлено' if entry['old'] is None else entry['old']
+        text += f"• {entry['date']} {entry['user']}: "
+        if not args:
+            text += f"{entry['sku']}, "
+        text += f"{FIELD_NAMES.get(entry['field'], entry['field'])}: {old} → {entry['new']}\n"
+    await message.answer(text, parse_mode='HTML')
+
+@dp.message(Command("barcode"))
+async def cmd_barcode(message: types.Message):
+    """Привязка штрих-кода к товару"""
+    try:
+        text = message.text.replace('/barcode', '').strip()
+        args = [arg.strip() for arg in text.split(',')]
+        if len(args) < 2 or not args[1]:
+            await message.answer("❌ <b>Неверный формат</b>\nИспользуйте: /barcode SKU, Штрих-код\nПример: /barcode SKU-001, 5901234123457", parse_mode='HTML')
+            return
+        
+        sku, barcode = args[0], args[1]
+        
+        product = find_product(message, sku)
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            return
+        
+        try:
+            store_for(message).barcodes.add(barcode, product)
+        except ValueError as e:
+            await message.answer(f"❌ <b>Ошибка штрих-кода</b>\n{e}", parse_mode='HTML')
+            return
+        product_changed(product, message.chat.id)
+        
+        await message.answer(
+            f"✅ <b>Штрих-код привязан</b>\n"
+            f"Товар: {product['name']} ({sku})\n"
+            f"Штрих-код: {barcode}",
+            parse_mode='HTML'
+        )
+    except Exception as e:
+        await message.answer(f"❌ Ошибка: {str(e)}", parse_mode='HTML')
+
+@dp.message(Command("приемка_start"))
+async def cmd_receiving_start(message: types.Message):
+    """Начало приемки по накладной"""
+    invoice = message.text.replace('/приемка_start', '').strip()
+    if not invoice:
+        await message.answer("❌ <b>Неверный формат</b>\nИспользуйте: /приемка_start Номер накладной\nПример: /приемка_start INV-2024-001", parse_mode='HTML')
+        return
+    
+    session = receiving_sessions.get(message.from_user.id)
+    if session:
+        await message.answer(f"❌ Уже идет приемка по накладной <b>{session.invoice}</b>\nЗавершите ее: /приемка_завершить", parse_mode='HTML')
+        return
+    
+    receiving_sessions[message.from_user.id] = ReceivingSession(message.from_user.id, invoice)
+    await message.answer(
+        f"📥 <b>Приемка по накладной {invoice}</b>\n\n"
+        f"Наведите камеру на штрих-код или отправьте его текстом.\n"
+        f"Формат: Штрих-код[, Количество, Срок годности, Качество]\n"
+        f"Пример: 5901234123457, 50, 2025-12-31, Отличное\n\n"
+        f"Завершение: /приемка_завершить",
+        parse_mode='HTML'
+    )
+
+@dp.message(F.text.regexp(r'^\d{8,14}(\s*,.*)?$'))
+async def barcode_scan(message: types.Message):
+    """Скан штрих-кода в режиме приемки или инвентаризации"""
+    session = receiving_sessions.get(message.from_user.id)
+    if session is None:
+        if message.from_user.id in count_sessions:
+            await record_count(message, message.text)
+            return
+        await message.answer("ℹ️ Чтобы принимать товар по штрих-кодам, начните приемку: /приемка_start Накладная", parse_mode='HTML')
+        return
+    
+    args = [arg.strip() for arg in message.text.split(',')]
+    barcode = args[0]
+    if not is_valid_gtin(barcode):
+        await message.answer(f"❌ Неверный штрих-код <b>{barcode}</b>: проверьте контрольную цифру", parse_mode='HTML')
+        return
+    
+    product = store_for(message).barcodes.lookup(barcode)
+    if product is None:
+        await message.answer(f"❌ Штрих-код <b>{barcode}</b> не найден\nПривяжите его к товару: /barcode SKU, {barcode}", parse_mode='HTML')
+        return
+    
+    try:
+        quantity = int(args[1]) if len(args) > 1 and args[1] else 1
+    except ValueError:
+        await message.answer("❌ Количество должно быть целым числом", parse_mode='HTML')
+        return
+    expiry = args[2] if len(args) > 2 else None
+    quality = args[3] if len(args) > 3 else None
+    
+    try:
+        line = session.scan(product, quantity, expiry, quality)
+    except ValueError as e:
+        await message.answer(f"❌ {e}", parse_mode='HTML')
+        return
+    await message.answer(
+        f"✅ <b>Товар добавлен в приемку</b>\n"
+        f"{product['name']} ({product['sku']}): +{quantity} шт., всего {line['quantity']} шт.\n"
+        f"Позиций в приемке: {len(session.lines)}, единиц: {session.total_quantity}",
+        parse_mode='HTML'
+    )
+
+@dp.message(Command("приемка_завершить"))
+async def cmd_receiving_finish(message: types.Message):
+    """Проведение приемки и обновление остатков"""
+    session = receiving_sessions.pop(message.from_user.id, None)
+    if session is None:
+        await message.answer("❌ Нет активной приемки", parse_mode='HTML')
+        return
+    if not session.lines:
+        await message.answer(f"ℹ️ Приемка по накладной <b>{session.invoice}</b> закрыта без товаров", parse_mode='HTML')
+        return
+    
+    changed = session.commit()
+    for product in changed:
+        product_changed(product, message.chat.id)
+    # Принятое закрывает открытые заявки на закупку этих товаров
+    for line in session.lines.values():
+        receive_on_order(purchase_orders, line['product']['store'], line['product']['sku'], line['quantity'])
+    
+    lines = [
+        {'name': line['product']['name'], 'sku': line['product']['sku'], 'quantity': line['quantity'],
+         'expiry': line['expiry'], 'quality': line['quality']}
+        for line in session.lines.values()
+    ]
+    document = await issue_document(
+        'receiving', message,
+        f"Накладная: {session.invoice}\n"
+        f"Итого: {len(session.lines)} позиций, {session.total_quantity} шт.",
+        invoice=session.invoice, lines=lines,
+    )
+    
+    await message.answer(
+        f"✅ <b>Приемка проведена</b>\n"
+        f"Накладная: {session.invoice}\n"
+        f"Позиций: {len(session.lines)}\n"
+        f"Принято: {session.total_quantity} шт.\n\n"
+        f"{document_note(document)}",
+        parse_mode='HTML'
+    )
+
+@dp.message(Command("приемка_отмена"))
+async def cmd_receiving_cancel(message: types.Message):
+    """Отмена приемки без изменения остатков"""
+    session = receiving_sessions.pop(message.from_user.id, None)
+    if session is None:
+        await message.answer("❌ Нет активной приемки", parse_mode='HTML')
+        return
+    await message.answer(f"🚫 Приемка по накладной <b>{session.invoice}</b> отменена", parse_mode='HTML')
+
+@dp.message(Command("инвентаризация_начать"))
+async def cmd_count_start(message: types.Message):
+    """Начало инвентаризации зоны со снимком учетных остатков"""
+    zone = message.text.replace('/инвентаризация_начать', '').strip()
+    if not zone:
+        await message.answer("❌ <b>Неверный формат</b>\nИспользуйте: /инвентаризация_начать Зона\nПример: /инвентаризация_начать Секция А", parse_mode='HTML')
+        return
+    
+    if message.from_user.id in count_sessions:
+        await message.answer(f"❌ Уже идет инвентаризация зоны <b>{count_sessions[message.from_user.id].zone}</b>", parse_mode='HTML')
+        return
+    
+    products = [p for p in store_for(message).products if p.get('zone', DEFAULT_ZONE).lower() == zone.lower()]
+    if not products:
+        await message.answer(f"❌ В зоне <b>{zone}</b> нет товаров\nНазначьте зону: /update SKU, зона, {zone}", parse_mode='HTML')
+        return
+    
+    count_sessions[message.from_user.id] = CountSession(message.from_user.id, zone, products)
+    
+    response = f"🔢 <b>Инвентаризация зоны {zone}</b>\n\nТоваров к проверке: {len(products)}\n\n"
+    for product in products[:20]:
+        response += f"• {product['name']} ({product['sku']})\n"
+    if len(products) > 20:
+        response += f"... и еще {len(products) - 20} позиций\n"
+    response += "\nОтправляйте факт: /count SKU, Количество[, Причина] или штрих-код, количество"
+    await message.answer(response, parse_mode='HTML')
+
+async def record_count(message, text):
+    """Запись фактического количества в сессию инвентаризации"""
+    session = count_sessions.get(message.from_user.id)
+    if session is None:
+        await message.answer("❌ Нет активной инвентаризации\nНачните: /инвентаризация_начать Зона", parse_mode='HTML')
+        return
+    
+    args = [arg.strip() for arg in text.split(',')]
+    if len(args) < 2:
+        await message.answer("❌ <b>Недостаточно параметров</b>\nНужно: SKU или штрих-код, Количество[, Причина]", parse_mode='HTML')
+        return
+    
+    sku = args[0]
+    if sku not in session:
+        product = store_for(message).barcodes.lookup(sku) if sku.isdigit() else None
+        sku = product['sku'] if product else sku
+    if sku not in session:
+        await message.answer(f"❌ Товар <b>{args[0]}</b> не входит в зону {session.zone}", parse_mode='HTML')
+        return
+    
+    try:
+        quantity = int(args[1])
+    except ValueError:
+        await message.answer("❌ Количество должно быть целым числом", parse_mode='HTML')
+        return
+    if quantity < 0:
+        await message.answer("❌ Количество не может быть отрицательным", parse_mode='HTML')
+        return
+    
+    book, delta = session.record(sku, quantity, args[2] if len(args) > 2 else None)
+    await message.answer(
+        f"✅ <b>Пересчет записан</b>\n"
+        f"Товар: {sku}\n"
+        f"Факт: {quantity} шт., учет: {book} шт.\n"
+        f"Расхождение: {delta:+d}",
+        parse_mode='HTML'
+    )
+
+@dp.message(Command("count"))
+async def cmd_count(message: types.Message):
+    """Фактическое количество по товару"""
+    await record_count(message, message.text.replace('/count', '').strip())
+
+def format_count_summary(session, summary):
+    return (
+        f"Зона: {session.zone}\n"
+        f"Пересчитано: {summary['counted']} из {summary['total']}\n"
+        f"Расхождений: {summary['mismatched']}\n"
+        f"Излишки: +{summary['surplus']} шт., недостача: -{summary['shortage']} шт.\n"
+        f"Точность учета: {summary['accuracy']:.1f}%"
+    )
+
+@dp.message(Command("инвентаризация_статус"))
+async def cmd_count_status(message: types.Message):
+    """Текущие расхождения инвентаризации"""
+    session = count_sessions.get(message.from_user.id)
+    if session is None:
+        await message.answer("❌ Нет активной инвентаризации", parse_mode='HTML')
+        return
+    await message.answer(f"🔢 <b>Ход инвентаризации</b>\n\n{format_count_summary(session, session.summary())}", parse_mode='HTML')
+
+@dp.message(Command("инвентаризация_завершить"))
+async def cmd_count_finish(message: types.Message):
+    """Завершение инвентаризации и корректировка остатков"""
+    session = count_sessions.pop(message.from_user.id, None)
+    if session is None:
+        await message.answer("❌ Нет активной инвентаризации", parse_mode='HTML')
+        return
+    
+    summary = session.summary()
+    entries = session.close()
+    inventory_log.extend(entries)
+    for entry in entries:
+        product_changed(session.products[session.position[entry['sku']]], message.chat.id)
+    
+    report = f"📋 <b>Отчет по инвентаризации</b>\n\n{format_count_summary(session, summary)}\n"
+    if entries:
+        report += "\n<b>Корректировки:</b>\n"
+        for entry in entries[:20]:
+            report += f"• {entry['sku']}: {entry['book']} → {entry['counted']} ({entry['delta']:+d}), {entry['reason']}\n"
+        if len(entries) > 20:
+            report += f"... и еще {len(entries) - 20} позиций\n"
+    
+    notifier.send(MANAGER_CHAT_ID or message.chat.id, report, parse_mode='HTML')
+    note = "<i>Отчет отправлен руководителю</i>"
+    if entries:
+        lines = [
+            dict(entry, name=session.products[session.position[entry['sku']]]['name'])
+            for entry in entries
+        ]
+        document = await issue_document(
+            'discrepancy', message,
+            f"Зона: {session.zone}\n"
+            f"Расхождений: {len(entries)}, излишки: +{summary['surplus']} шт., недостача: -{summary['shortage']} шт.",
+            zone=session.zone, lines=lines, surplus=summary['surplus'], shortage=summary['shortage'],
+        )
+        note += f"\n{document_note(document)}"
+    await message.answer(f"✅ <b>Инвентаризация завершена</b>\nСкорректировано позиций: {len(entries)}\n\n{note}", parse_mode='HTML')
+
+# ================== ДОКУМЕНТЫ ==================
+async def render(specs):
+    """Отрисовка документов в пуле процессов планировщика: цикл событий бота не блокируется"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(scheduler.pool, render_documents, specs, DOCUMENTS_DIR, DOCUMENT_FORMAT)
+
+def document_file(path):
+    return FSInputFile(path, filename=os.path.basename(path))
+
+async def issue_document(kind, message, caption, **context):
+    """Выпуск акта: номер, файл и отправка руководителю на утверждение; None, если файл не сформирован"""
+    document = documents.issue(kind, message.from_user.full_name, store_for(message).store_id, **context)
+    try:
+        document['path'], = await render([document])
+    except Exception as e:
+        logging.exception(f"Ошибка формирования документа {document['number']}: {e}")
+        return None
+    notifier.send_document(
+        MANAGER_CHAT_ID or message.chat.id, document_file(document['path']),
+        caption=f"📄 <b>{document['title']} {document['number']}</b>\n{caption}\n<b>Статус:</b> {document['status']}",
+        parse_mode='HTML'
+    )
+    return document
+
+def document_note(document):
+    """Строка ответа о выпущенном акте"""
+    if document is None:
+        return "⚠️ <i>Файл акта не сформирован, подробности в журнале бота</i>"
+    return f"<i>{document['title']} {document['number']} отправлен на утверждение</i>"
+
+@dp.message(Command("акт_брак"))
+async def cmd_defect_act(message: types.Message):
+    """Акт о браке с отправкой на утверждение"""
+    text = message.text.replace('/акт_брак', '').strip()
+    args = [arg.strip() for arg in text.split(',')]
+    if len(args) < 3 or not all(args[:3]):
+        await message.answer(
+            "❌ <b>Неверный формат</b>\nИспользуйте: /акт_брак SKU, Количество, Тип брака\n"
+            "Пример: /акт_брак SKU-001, 5, Производственный дефект",
+            parse_mode='HTML'
+        )
+        return
+    
+    sku, quantity, defect = args[0], args[1], ', '.join(args[2:])
+    product = find_product(message, sku)
+    if product is None:
+        await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+        return
+    try:
+        quantity = int(quantity)
+    except ValueError:
+        await message.answer("❌ Количество должно быть целым числом", parse_mode='HTML')
+        return
+    if not 0 < quantity <= product['quantity']:
+        await message.answer(f"❌ <b>Неверное количество</b>\nДоступно: {product['quantity']} шт.", parse_mode='HTML')
+        return
+    
+    supplier = product.get('supplier', DEFAULT_SUPPLIER)
+    document = await issue_document(
+        'defect', message,
+        f"Товар: {product['name']} ({sku}), {quantity} шт.\n"
+        f"Тип брака: {defect}\n"
+        f"Требуется возврат поставщику: {supplier}",
+        name=product['name'], sku=sku, quantity=quantity, price=product['price'], defect=defect, supplier=supplier,
+    )
+    await message.answer(
+        f"📄 <b>Акт о браке</b>\n"
+        f"Товар: {product['name']} ({sku})\n"
+        f"Количество: {quantity} шт.\n"
+        f"Тип брака: {defect}\n\n"
+        f"{document_note(document)}",
+        parse_mode='HTML'
+    )
+
+@dp.message(Command("документы"))
+async def cmd_documents(message: types.Message):
+    """Документы за день"""
+    day = message.text.replace('/документы', '').strip() or datetime.now().strftime("%Y-%m-%d")
+    day_documents = documents.for_day(day)
+    if not day_documents:
+        await message.answer(f"📭 <b>Документов за {day} нет</b>", parse_mode='HTML')
+        return
+    
+    response = f"📑 <b>Документы за {day}</b>\n\n"
+    for document in day_documents[-30:]:
+        response += f"• {document['number']} - {document['title']}, {document['date'][11:]}, {document['author']}: {document['status']}\n"
+    if len(day_documents) > 30:
+        response = response.replace("\n\n", f"\n<i>последние 30 из {len(day_documents)}</i>\n\n", 1)
+    response += "\nФайл документа: /документ Номер"
+    await message.answer(response, parse_mode='HTML')
+
+@dp.message(Command("документ"))
+async def cmd_document(message: types.Message):
+    """Файл документа по номеру; недостающий файл формируется заново"""
+    number = message.text.replace('/документ', '').strip()
+    if not number:
+        await message.answer("❌ <b>Неверный формат</b>\nИспользуйте: /документ Номер\nПример: /документ АКТ-БРАК-2024-001", parse_mode='HTML')
+        return
+    
+    document = documents.get(number)
+    if document is None:
+        await message.answer(f"❌ Документ <b>{number}</b> не найден", parse_mode='HTML')
+        return
+    
+    try:
+        if document['path'] is None or not os.path.exists(document['path']):
+            document['path'], = await render([document])
+        await message.answer_document(document_file(document['path']), caption=f"📄 {document['title']} {document['number']}: {document['status']}")
+    except Exception as e:
+        await message.answer(f"❌ <b>Ошибка формирования документа:</b> {str(e)}", parse_mode='HTML')
+
+@dp.message(Command("смена_начать"))
+async def cmd_shift_start(message: types.Message):
+    """Сотрудник на смене получает задания на пополнение полок"""
+    store = store_for(message)
+    task = replenishment.start_shift(message.from_user.id, store.store_id)
+    if task is None:
+        await message.answer(f"🟢 <b>Смена начата</b> (магазин {store.store_id})\nЗаданий пока нет - пришлю, как только появятся", parse_mode='HTML')
+        return
+    await message.answer(f"🟢 <b>Смена начата</b> (магазин {store.store_id})", parse_mode='HTML')
+    await message.answer(format_task(task), parse_mode='HTML', reply_markup=task_keyboard(task))
+
+@dp.message(Command("смена_завершить"))
+async def cmd_shift_end(message: types.Message):
+    """Конец смены; незавершенное задание возвращается в очередь"""
+    if message.from_user.id not in replenishment.staff:
+        await message.answer("❌ Вы не на смене", parse_mode='HTML')
+        return
+    task = replenishment.end_shift(message.from_user.id)
+    send_task(task)
+    text = "🔴 <b>Смена завершена</b>"
+    if task is not None:
+        text += f"\nЗадание №{task.task_id} возвращено в очередь"
+    await message.answer(text, parse_mode='HTML')
+
+@dp.message(Command("задание"))
+async def cmd_task(message: types.Message):
+    """Текущее задание сотрудника или следующее по срочности"""
+    if message.from_user.id not in replenishment.staff:
+        await message.answer("❌ Начните смену: /смена_начать", parse_mode='HTML')
+        return
+    task = replenishment.claim(message.from_user.id)
+    if task is None:
+        await message.answer("✅ Заданий нет - пришлю, как только появятся", parse_mode='HTML')
+        return
+    await message.answer(format_task(task), parse_mode='HTML', reply_markup=task_keyboard(task))
+
+@dp.message(Command("задание_отклонить"))
+async def cmd_task_reject(message: types.Message):
+    """Отказ от задания с указанием причины"""
+    reason = message.text.replace('/задание_отклонить', '').strip()
+    if not reason:
+        await message.answer("❌ <b>Неверный формат</b>\nИспользуйте: /задание_отклонить Причина\nПример: /задание_отклонить Нет товара в ячейке", parse_mode='HTML')
+        return
+    task = replenishment.reject(message.from_user.id, reason)
+    if task is None:
+        await message.answer("❌ Нет назначенного задания", parse_mode='HTML')
+        return
+    send_task(task)
+    product = task.product
+    notifier.send(
+        MANAGER_CHAT_ID or message.chat.id,
+        f"⚠️ <b>Отказ от задания №{task.task_id}</b>\n"
+        f"Полка: {product['shelf']}\n"
+        f"Товар: {product['name']} ({product['sku']})\n"
+        f"Сотрудник: {message.from_user.full_name}\n"
+        f"Причина: {reason}",
+        parse_mode='HTML'
+    )
+    await message.answer(f"🚫 Задание №{task.task_id} возвращено в очередь\nСледующее задание: /задание", parse_mode='HTML')
+
+@dp.message(Command("задания"))
+async def cmd_tasks(message: types.Message):
+    """Очередь заданий на пополнение полок магазина"""
+    store = store_for(message)
+    pending, total = replenishment.pending(store.store_id)
+    working = [task for task in replenishment.working.values() if task.store == store.store_id]
+    if not pending and not working:
+        await message.answer(f"✅ Заданий на пополнение полок нет (магазин {store.store_id})", parse_mode='HTML')
+        return
+    
+    text = f"🧺 <b>Пополнение полок (магазин {store.store_id})</b>\n\n<b>Ожидают:</b> {total}\n"
+    for task in pending:
+        product = task.product
+        text += (f"• №{task.task_id} {product['shelf']}: {product['name']} ({product['sku']}), {task.quantity} шт., "
+                 f"{priority_label(task, replenishment.velocity(product)).lower()} приоритет\n")
+    if working:
+        text += f"\n<b>В работе:</b> {len(working)}\n"
+        for task in working:
+            state = "принято" if task.accepted else "назначено"
+            text += f"• №{task.task_id} {task.product['shelf']}: {task.product['sku']}, {task.quantity} шт. - {state}\n"
+    text += f"\nСотрудников на смене: {sum(1 for s in replenishment.staff.values() if s == store.store_id)}"
+    await message.answer(text, parse_mode='HTML')
+
+@dp.message(F.photo)
+async def shelf_photo(message: types.Message):
+    """Фото выкладки завершает задание на пополнение; подпись - выложенное количество"""
+    if message.from_user.id not in replenishment.working:
+        await message.answer("ℹ️ Нет задания на пополнение. Взять задание: /задание", parse_mode='HTML')
+        return
+    quantity = None
+    if message.caption:
+        try:
+            quantity = int(message.caption.strip())
+        except ValueError:
+            await message.answer("❌ В подписи к фото укажите выложенное количество числом или оставьте ее пустой", parse_mode='HTML')
+            return
+        # Выложить можно только то, что есть на складе сверх полки
+        backstock = shelf_shortfall(replenishment.working[message.from_user.id].product)[1]
+        if quantity <= 0 or quantity > backstock:
+            await message.answer(f"❌ Выложенное количество должно быть от 1 до {backstock} шт. (остаток на складе)", parse_mode='HTML')
+            return
+    
+    # Фото сохраняется на диск сразу при скачивании и хранится по хешу содержимого
+    photo = message.photo[-1]
+    path = blob_store.temp_path()
+    try:
+        await bot.download(photo, destination=path)
+        digest = await asyncio.to_thread(blob_store.put_file, path)
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        await message.answer(f"❌ Не удалось сохранить фото: {str(e)}", parse_mode='HTML')
+        return
+    
+    task = replenishment.complete(message.from_user.id, digest, quantity)
+    if task is None:
+        await message.answer("❌ Задание уже снято с вас", parse_mode='HTML')
+        return
+    product = task.product
+    product_changed(product, message.chat.id)
+    notifier.send_photo(
+        MANAGER_CHAT_ID or message.chat.id,
+        photo.file_id,
+        caption=(
+            f"✅ <b>Полка пополнена (задание №{task.task_id})</b>\n"
+            f"Полка: {product['shelf']}\n"
+            f"Товар: {product['name']} ({product['sku']})\n"
+            f"Выложено: {task.quantity} шт.\n"
+            f"Сотрудник: {message.from_user.full_name}"
+        ),
+        parse_mode='HTML'
+    )
+    await message.answer(
+        f"✅ <b>Задание №{task.task_id} выполнено</b>\n"
+        f"На полке {product['shelf']}: {product.get('shelf_quantity', 0)} из {product['shelf_capacity']} шт.\n"
+        f"<i>Отчет отправлен менеджеру</i>",
+        parse_mode='HTML'
+    )
+    
+    task = replenishment.claim(message.from_user.id)
+    if task is not None:
+        await message.answer(format_task(task), parse_mode='HTML', reply_markup=task_keyboard(task))
+
 @dp.message(Command("dashboard"))
 async def cmd_dashboard(message: types.Message):
     """Запуск и отправка ссылки на дашборд"""
-    
-    total_items = len(products_db)
-    total_value = sum(p['quantity'] * p['price'] for p in products_db) if products_db else 0
-    active_items = sum(1 for p in products_db if p['status'] == 'В наличии')
-    
+    text = await cached_response('dashboard', store_for(message), render_dashboard_summary)
     
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -624,18 +1373,20 @@ async def cmd_dashboard(message: types.Message):
         ]
     )
     
-    await message.answer(
+    await message.answer(text, reply_markup=keyboard, parse_mode='HTML')
+
+def render_dashboard_summary(store):
+    stock = store.stock()
+    return (
         f"📈 <b>Аналитический дашборд</b>\n\n"
         f"<b>📊 Текущие показатели:</b>\n"
-        f"• Товаров: {total_items}\n"
-        f"• Стоимость запасов: {total_value:,.0f} руб\n"
-        f"• Активных: {active_items}\n"
-        f"• В резерве: {sum(1 for p in products_db if p['status'] == 'В резерве')}\n\n"
+        f"• Товаров: {stock['items']}\n"
+        f"• Стоимость запасов: {stock['value']:,.0f} руб\n"
+        f"• Активных: {stock['statuses']['В наличии']}\n"
+        f"• В резерве: {stock['statuses']['В резерве']}\n\n"
         f"<b>🌐 Дашборд доступен по адресу:</b>\n"
         f"http://127.0.0.1:{DASH_PORT}\n\n"
-        f"<i>Дашборд обновляется автоматически каждые 5 секунд</i>",
-        reply_markup=keyboard,
-        parse_mode='HTML'
+        f"<i>Дашборд обновляется автоматически каждые 5 секунд</i>"
     )
 
 @dp.message(Command("sell"))
@@ -660,85 +1411,102 @@ async def cmd_sell(message: types.Message):
         except ValueError:
             await message.answer("❌ <b>Ошибка данных</b>\nКоличество должно быть целым числом, цена - числом", parse_mode='HTML')
             return
+        if quantity <= 0:
+            await message.answer("❌ Количество должно быть больше нуля", parse_mode='HTML')
+            return
         
+        product = find_product(message, sku)
+        if product is None:
+            await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            return
         
-        for product in products_db:
-            if product['sku'] == sku:
-                if product['quantity'] >= quantity:
-                    product['quantity'] -= quantity
-                    sale_total = quantity * price
-                    
-                   
-                    sale = {
-                        'sku': sku,
-                        'name': product['name'],
-                        'quantity': quantity,
-                        'price': price,
-                        'total': sale_total,
-                        'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'profit': sale_total - (quantity * product['price'])
-                    }
-                    sales_history.append(sale)
-                    
-                
-                    if product['quantity'] == 0:
-                        product['status'] = 'Нет в наличии'
-                        status_msg = " (товар закончился)"
-                    else:
-                        status_msg = ""
-                    
-                    profit = sale_total - (quantity * product['price'])
-                    profit_percent = (profit / (quantity * product['price'])) * 100 if (quantity * product['price']) > 0 else 0
-                    
-                    await message.answer(
-                        f"💰 <b>Продажа зарегистрирована</b>\n\n"
-                        f"<b>Товар:</b> {product['name']}\n"
-                        f"<b>Артикул:</b> {sku}\n"
-                        f"<b>Продано:</b> {quantity} шт.\n"
-                        f"<b>Цена закупки:</b> {product['price']} руб/шт.\n"
-                        f"<b>Цена продажи:</b> {price} руб/шт.\n"
-                        f"<b>Выручка:</b> {sale_total:,.0f} руб\n"
-                        f"<b>Прибыль:</b> {profit:,.0f} руб ({profit_percent:.1f}%)\n"
-                        f"<b>Осталось:</b> {product['quantity']} шт.{status_msg}\n\n"
-                        f"<i>Дашборд обновлен</i>",
-                        parse_mode='HTML'
-                    )
-                    return
-                else:
-                    await message.answer(f"❌ <b>Недостаточно товара</b>\nДоступно: {product['quantity']} шт.\nТребуется: {quantity} шт.", parse_mode='HTML')
-                    return
+        if product['quantity'] >= quantity:
+            store = store_for(message)
+            product['quantity'] -= quantity
+            sale_total = quantity * price
+            cost = store.costs.consume(product, quantity)
+            
+           
+            sale = {
+                'sku': sku,
+                'name': product['name'],
+                'quantity': quantity,
+                'price': price,
+                'total': sale_total,
+                'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'cost': cost,
+                'profit': sale_total - cost
+            }
+            sales_history.append(sale)
+            store.record_sale(sale)
+            replenishment.record_sale(product, quantity)
+            
         
-        await message.answer(f"❌ Товар с артикулом <b>{sku}</b> не найден", parse_mode='HTML')
+            if product['quantity'] == 0:
+                product['status'] = 'Нет в наличии'
+                status_msg = " (товар закончился)"
+            else:
+                status_msg = ""
+            
+            profit = sale['profit']
+            profit_percent = (profit / cost) * 100 if cost > 0 else 0
+            unit_cost = cost / quantity if quantity else 0
+            # Версия магазина меняется до первого await: кеш ответов не отдаст старый /list
+            product_changed(product, message.chat.id)
+            
+            await message.answer(
+                f"💰 <b>Продажа зарегистрирована</b>\n\n"
+                f"<b>Товар:</b> {product['name']}\n"
+                f"<b>Артикул:</b> {sku}\n"
+                f"<b>Продано:</b> {quantity} шт.\n"
+                f"<b>Себестоимость:</b> {unit_cost:,.2f} руб/шт.\n"
+                f"<b>Цена продажи:</b> {price} руб/шт.\n"
+                f"<b>Выручка:</b> {sale_total:,.0f} руб\n"
+                f"<b>Прибыль:</b> {profit:,.0f} руб ({profit_percent:.1f}%)\n"
+                f"<b>Осталось:</b> {product['quantity']} шт.{status_msg}\n\n"
+                f"<i>Дашборд обновлен</i>",
+                parse_mode='HTML'
+            )
+            return
+        else:
+            await message.answer(f"❌ <b>Недостаточно товара</b>\nДоступно: {product['quantity']} шт.\nТребуется: {quantity} шт.", parse_mode='HTML')
     except Exception as e:
         await message.answer(f"❌ Ошибка: {str(e)}", parse_mode='HTML')
 
 @dp.message(Command("report"))
 async def cmd_report(message: types.Message):
     """Быстрый отчет для отправки в чат"""
-    if not products_db:
+    store = store_for(message)
+    if not store.products:
         await message.answer("📭 <b>Нет данных для отчета</b>\nДобавьте товары командой /add", parse_mode='HTML')
         return
     
-    total_items = len(products_db)
-    total_quantity = sum(p['quantity'] for p in products_db)
-    total_value = sum(p['quantity'] * p['price'] for p in products_db)
-    low_stock = sum(1 for p in products_db if p['quantity'] < 5)
-    out_of_stock = sum(1 for p in products_db if p['status'] == 'Нет в наличии')
+    report = await cached_response('report', store, render_report)
+    await message.answer(report, parse_mode='HTML')
+
+def render_report(store):
+    """Текст /report по магазину"""
+    totals = store.aggregates()
+    total_items = totals['items']
+    total_quantity = totals['quantity']
+    total_value = totals['value']
+    low_stock = sum(1 for p in store.products if is_low_stock(p))
+    out_of_stock = totals['statuses']['Нет в наличии']
     
-    top_by_quantity = sorted(products_db, key=lambda x: x['quantity'], reverse=True)[:5]
+    top_by_quantity = heapq.nlargest(5, store.products, key=lambda x: x['quantity'])
     
-    top_by_value = sorted(products_db, key=lambda x: x['quantity'] * x['price'], reverse=True)[:5]
+    top_by_value = heapq.nlargest(5, store.products, key=store.costs.value)
     
-    total_sales = len(sales_history)
-    total_revenue = sum(s['total'] for s in sales_history)
-    total_profit = sum(s['profit'] for s in sales_history)
+    total_sales = totals['sales_count']
+    total_revenue = totals['revenue']
+    total_profit = totals['profit']
     
-    report = f"📋 <b>ЭКСПРЕСС-ОТЧЕТ</b>\n\n"
+    report = f"📋 <b>ЭКСПРЕСС-ОТЧЕТ (магазин {store.store_id})</b>\n\n"
     report += f"<b>📊 Общая статистика:</b>\n"
     report += f"• Всего позиций: {total_items}\n"
     report += f"• Общее количество: {total_quantity} шт.\n"
     report += f"• Стоимость запасов: {total_value:,.0f} руб\n"
-    report += f"• Низкий запас (<5 шт.): {low_stock}\n"
+    report += f"• Ниже минимального уровня: {low_stock}\n"
     report += f"• Нет в наличии: {out_of_stock}\n\n"
     
     if total_sales > 0:
@@ -753,9 +1521,179 @@ async def cmd_report(message: types.Message):
     
     report += f"\n<strong>💎 ТОП-5 по стоимости:</strong>\n"
     for i, item in enumerate(top_by_value, 1):
-        item_value = item['quantity'] * item['price']
+        item_value = store.costs.value(item)
         report += f"{i}. {item['name']}: {item_value:,.0f} руб\n"
     
+    return report
+
+@dp.message(Command("reorder"))
+async def cmd_reorder(message: types.Message):
+    """Формирование заявок на закупку по скорости продаж"""
+    if not products_db:
+        await message.answer("📭 <b>Нет данных для планирования</b>\nДобавьте товары командой /add", parse_mode='HTML')
+        return
+    
+    # Расчет по всем магазинам выполняется вне цикла событий
+    drafts = await asyncio.to_thread(
+        plan_store_orders, store_snapshots(),
+        first_number=len(purchase_orders) + 1
+    )
+    
+    if not drafts:
+        await message.answer("✅ <b>Все остатки выше точки заказа</b>\nЗаявки не требуются", parse_mode='HTML')
+        return
+    
+    purchase_orders.extend(drafts)
+    for draft in drafts:
+        notifier.send(MANAGER_CHAT_ID or message.chat.id, format_purchase_order(draft), parse_mode='HTML')
+    
+    await message.answer(
+        f"🧾 <b>Сформированы заявки на закупку</b>\n\n"
+        f"Заявок: {len(drafts)}\n"
+        f"Позиций: {sum(len(d['lines']) for d in drafts)}\n"
+        f"Сумма: {sum(d['total'] for d in drafts):,.0f} руб\n\n"
+        f"<i>Заявки отправлены на согласование</i>",
+        parse_mode='HTML'
+    )
+
+@dp.message(Command("export"))
+async def cmd_export(message: types.Message):
+    """Выгрузка остатков или продаж файлом"""
+    args = message.text.replace('/export', '').split()
+    if not args or args[0] not in EXPORT_SOURCES:
+        await message.answer(
+            "❌ <b>Неверный формат</b>\nИспользуйте: /export stock|sales [период] [gz|parquet]\n"
+            "Период: day, week, month, year, ГГГГ-ММ или ГГГГ-ММ-ДД\n"
+            "Пример: /export sales month gz",
+            parse_mode='HTML'
+        )
+        return
+    
+    kind, options = args[0], args[1:]
+    fmt = 'csv.gz' if 'gz' in options else 'parquet' if 'parquet' in options else 'csv'
+    period = next((o for o in options if o not in ('gz', 'parquet')), None)
+    
+    source, columns = EXPORT_SOURCES[kind]
+    records = source()
+    if kind == 'sales':
+        try:
+            start, end = period_bounds(period)
+        except ValueError:
+            await message.answer("❌ Неверный период. Допустимо: day, week, month, year, ГГГГ-ММ, ГГГГ-ММ-ДД", parse_mode='HTML')
+            return
+        records = iter_records(records, start, end)
+    
+    filename = f"{kind}_{datetime.now():%Y%m%d_%H%M}.{fmt}"
+    fd, path = tempfile.mkstemp(suffix='.' + fmt)
+    os.close(fd)
+    try:
+        # Запись идет блоками в файл вне цикла событий, Telegram получает файл с диска
+        await asyncio.to_thread(write_export, path, records, columns, fmt)
+        await message.answer_document(FSInputFile(path, filename=filename), caption=f"📤 Выгрузка: {kind}")
+    except Exception as e:
+        await message.answer(f"❌ <b>Ошибка выгрузки:</b> {str(e)}", parse_mode='HTML')
+    finally:
+        os.remove(path)
+
+def build_daily_summary(day=None):
+    """Сводный отчет за день"""
+    day = day or datetime.now().strftime("%Y-%m-%d")
+    day_sales = [s for s in sales_history if s['date'].startswith(day)]
+    day_orders = [o for o in purchase_orders if o['created_at'].startswith(day)]
+    
+    return (
+        f"📅 <b>Сводный отчет за {day}</b>\n\n"
+        f"• Продаж: {len(day_sales)} транзакций\n"
+        f"• Продано: {sum(s['quantity'] for s in day_sales)} шт.\n"
+        f"• Выручка: {sum(s['total'] for s in day_sales):,.0f} руб\n"
+        f"• Прибыль: {sum(s['profit'] for s in day_sales):,.0f} руб\n"
+        f"• Создано заявок на закупку: {len(day_orders)}\n"
+        f"• Ниже минимального уровня: {sum(1 for p in products_db if is_low_stock(p))}\n\n"
+        f"<i>Детальный дашборд: {DASHBOARD_URL}</i>"
+    )
+
+@dp.message(Command("daily", "отчет_день"))
+async def cmd_daily(message: types.Message):
+    """Сводный отчет за текущий день"""
+    await message.answer(build_daily_summary(), parse_mode='HTML')
+
+@dp.message(Command("store"))
+async def cmd_store(message: types.Message):
+    """Выбор магазина, с которым работает пользователь"""
+    store_id = message.text.replace('/store', '').strip()
+    if not store_id:
+        store = store_for(message)
+        await message.answer(f"🏬 <b>Текущий магазин:</b> {store.store_id}\nСменить: /store Номер\nПример: /store 2", parse_mode='HTML')
+        return
+    
+    store = stores.bind(message.from_user.id, store_id)
+    await message.answer(
+        f"✅ <b>Выбран магазин {store.store_id}</b>\n"
+        f"Позиций: {len(store.products)}\n\n"
+        f"<i>Команды работают с остатками этого магазина</i>",
+        parse_mode='HTML'
+    )
+
+@dp.message(Command("stores"))
+async def cmd_stores(message: types.Message):
+    """Сводка по магазинам сети"""
+    if not stores.partitions:
+        await message.answer("📭 <b>Нет данных по магазинам</b>\nДобавьте товары командой /add", parse_mode='HTML')
+        return
+    
+    report = "🏬 <b>Магазины сети</b>\n\n"
+    for store_id, store in sorted(stores.partitions.items()):
+        totals = store.aggregates()
+        report += (
+            f"<b>Магазин {store_id}</b>\n"
+            f"Позиций: {totals['items']}, запас: {totals['value']:,.0f} руб\n"
+            f"Продаж: {totals['sales_count']}, выручка: {totals['revenue']:,.0f} руб\n\n"
+        )
+    
+    totals = stores.totals()
+    report += (
+        f"<b>Итого по сети:</b>\n"
+        f"• Позиций: {totals['items']}\n"
+        f"• Стоимость запасов: {totals['value']:,.0f} руб\n"
+        f"• Выручка: {totals['revenue']:,.0f} руб\n"
+        f"• Прибыль: {totals['profit']:,.0f} руб"
+    )
+    await message.answer(report, parse_mode='HTML')
+
+@dp.message(Command("jobs"))
+async def cmd_jobs(message: types.Message):
+    """Состояние фоновых задач"""
+    report = "⏱ <b>Фоновые задачи</b>\n\n"
+    for job in scheduler.metrics():
+        next_run = job['next_run'].strftime("%Y-%m-%d %H:%M") if job['next_run'] else '—'
+        report += (
+            f"<b>{job['name']}</b> ({job['schedule']})"
+            f"{' - выполняется' if job['running'] else ''}\n"
+            f"Запусков: {job['runs']}, ошибок: {job['failures']}, пропущено: {job['skipped']}\n"
+            f"Длительность: посл. {job['last_duration']:.2f} с, ср. {job['avg_duration']:.2f} с, макс. {job['max_duration']:.2f} с\n"
+            f"Следующий запуск: {next_run}\n\n"
+        )
+    await message.answer(report, parse_mode='HTML')
+
+@dp.message(Command("perf"))
+async def cmd_perf(message: types.Message):
+    """Задержки обработчиков и размеры очередей (для администраторов)"""
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("❌ <b>Нет доступа</b>\nКоманда доступна администраторам (ADMIN_IDS)", parse_mode='HTML')
+        return
+    
+    rows = sorted(metrics.summary(), key=lambda row: row[5], reverse=True)
+    report = "⚡ <b>Производительность</b>\n\n"
+    if rows:
+        report += "<b>Обработчик: вызовов, ср. / p50 / p99 / макс, мс</b>\n"
+    for name, label, count, avg, p50, p99, worst in rows[:20]:
+        report += f"• {label}: {count}, {avg * 1000:.1f} / {p50 * 1000:.1f} / {p99 * 1000:.1f} / {worst * 1000:.1f}\n"
+    
+    report += "\n<b>Очереди и хранилища:</b>\n"
+    for name, value in metrics.gauges().items():
+        if isinstance(value, dict):
+            value = ', '.join(f"{k}: {v}" for k, v in value.items()) or '—'
+        report += f"• {name}: {value}\n"
     await message.answer(report, parse_mode='HTML')
 
 @dp.callback_query(F.data == "refresh_dashboard")
@@ -763,39 +1701,166 @@ async def refresh_dashboard(callback: types.CallbackQuery):
     """Обновление дашборда"""
     await callback.answer("✅ Дашборд обновляется автоматически каждые 5 секунд")
 
+@dp.callback_query(F.data.startswith("task_accept:"))
+async def task_accept(callback: types.CallbackQuery):
+    """Подтверждение задания на пополнение кнопкой «Принято»"""
+    task = replenishment.accept(callback.from_user.id, int(callback.data.split(':', 1)[1]))
+    if task is None:
+        await callback.answer("Задание уже не назначено вам")
+        return
+    await callback.answer(f"Задание №{task.task_id} принято")
+
 @dp.callback_query(F.data == "quick_report")
 async def quick_report(callback: types.CallbackQuery):
     """Быстрый отчет по callback"""
-    if not products_db:
+    store = stores.for_user(callback.from_user.id)
+    if not store.products:
         await callback.answer("Нет данных для отчета")
         return
     
-    total_items = len(products_db)
-    total_value = sum(p['quantity'] * p['price'] for p in products_db)
-    
-    await callback.message.answer(
-        f"📊 <b>Быстрый отчет</b>\n\n"
-        f"Всего товаров: {total_items}\n"
-        f"Общая стоимость: {total_value:,.0f} руб\n"
-        f"Активных: {sum(1 for p in products_db if p['status'] == 'В наличии')}\n"
-        f"В резерве: {sum(1 for p in products_db if p['status'] == 'В резерве')}",
-        parse_mode='HTML'
-    )
+    text = await cached_response('quick_report', store, render_quick_report)
+    await callback.message.answer(text, parse_mode='HTML')
     await callback.answer()
 
+def render_quick_report(store):
+    stock = store.stock()
+    return (
+        f"📊 <b>Быстрый отчет (магазин {store.store_id})</b>\n\n"
+        f"Всего товаров: {stock['items']}\n"
+        f"Общая стоимость: {stock['value']:,.0f} руб\n"
+        f"Активных: {stock['statuses']['В наличии']}\n"
+        f"В резерве: {stock['statuses']['В резерве']}"
+    )
+
+# ================== ФОНОВЫЕ ЗАДАЧИ ==================
+async def job_daily_summary():
+    """Ежедневная сводка менеджеру"""
+    if MANAGER_CHAT_ID:
+        notifier.send(MANAGER_CHAT_ID, build_daily_summary(), parse_mode='HTML')
+
+async def job_expiry_sweep():
+    """Проверка сроков годности по всему складу"""
+    now = datetime.now()
+    expired, expiring = [], []
+    for product in products_db:
+        try:
+            days_left = (datetime.strptime(product['expiry'], '%Y-%m-%d') - now).days
+        except (KeyError, ValueError):
+            continue
+        if product['quantity'] <= 0:
+            continue
+        if days_left < 0:
+            expired.append(product)
+        elif days_left <= 30:
+            expiring.append(product)
+    
+    if MANAGER_CHAT_ID and (expired or expiring):
+        text = "⏳ <b>Контроль сроков годности</b>\n\n"
+        text += f"Просрочено: {len(expired)}\nИстекает в течение 30 дней: {len(expiring)}\n\n"
+        for product in (expired + expiring)[:20]:
+            text += f"• {product['name']} ({product['sku']}): {product['expiry']}, {product['quantity']} шт.\n"
+        notifier.send(MANAGER_CHAT_ID, text, parse_mode='HTML')
+
+def store_snapshots():
+    """Снимки данных магазинов для планирования закупок (с количеством в открытых заявках)"""
+    return [(store_id, list(store.products), store.sale_columns.snapshot(), on_order_quantities(purchase_orders, store_id))
+            for store_id, store in stores.partitions.items()]
+
+def reorder_job_args():
+    """Снимок данных для ночного планирования закупок"""
+    return store_snapshots(), None, WINDOW_DAYS, len(purchase_orders) + 1
+
+def reorder_job_done(drafts):
+    purchase_orders.extend(drafts)
+    if MANAGER_CHAT_ID:
+        for draft in drafts:
+            notifier.send(MANAGER_CHAT_ID, format_purchase_order(draft), parse_mode='HTML')
+
+def store_day_report(store, day, top=10, low_stock_limit=100):
+    """Данные отчета магазина за день для шаблона daily"""
+    sold = {}
+    sales = profit = 0
+    # Продажи записываются по времени: просмотр с конца до начала дня
+    for sale in reversed(store.sales):
+        if sale['date'] < day:
+            break
+        if not sale['date'].startswith(day):
+            continue
+        line = sold.setdefault(sale['sku'], {'name': sale['name'], 'sku': sale['sku'], 'quantity': 0, 'total': 0.0})
+        line['quantity'] += sale['quantity']
+        line['total'] += sale['total']
+        sales += 1
+        profit += sale['profit']
+    low_stock = [p for p in store.products if is_low_stock(p)]
+    return {
+        'sales': sales,
+        'sold': sum(line['quantity'] for line in sold.values()),
+        'revenue': sum(line['total'] for line in sold.values()),
+        'profit': profit,
+        'top': heapq.nlargest(top, sold.values(), key=lambda line: line['total']),
+        'low_stock_count': len(low_stock),
+        'low_stock': [{'name': p['name'], 'sku': p['sku'], 'quantity': p['quantity'], 'min_level': p.get('min_level', DEFAULT_MIN_LEVEL)}
+                      for p in itertools.islice(low_stock, low_stock_limit)],
+    }
+
+def daily_documents_args():
+    """Отчеты магазинов и реестр актов за день - одной пачкой для пула процессов"""
+    day = datetime.now().strftime("%Y-%m-%d")
+    specs = [
+        summary_spec('daily', day, store_id, **store_day_report(store, day))
+        for store_id, store in stores.partitions.items() if store.products or store.sales
+    ]
+    day_documents = documents.for_day(day)
+    if day_documents:
+        fields = ('number', 'title', 'date', 'store', 'author', 'status')
+        specs.append(summary_spec('registry', day, None, documents=[{f: d[f] for f in fields} for d in day_documents]))
+    return specs, DOCUMENTS_DIR, DOCUMENT_FORMAT
+
+def daily_documents_done(paths):
+    if MANAGER_CHAT_ID:
+        for path in paths:
+            notifier.send_document(MANAGER_CHAT_ID, document_file(path), caption=f"📑 {os.path.basename(path)}")
+
+scheduler.add_job('daily_summary', '0 21 * * *', job_daily_summary)
+scheduler.add_job('daily_documents', '45 20 * * *', render_documents,
+                  prepare=daily_documents_args, done=daily_documents_done, in_process=True)
+scheduler.add_job('expiry_sweep', '0 8 * * *', job_expiry_sweep)
+scheduler.add_job('nightly_reorder', '30 2 * * *', plan_store_orders,
+                  prepare=reorder_job_args, done=reorder_job_done, in_process=True)
+
 async def main():
     """Запуск бота и дашборда"""
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     
-    dash_thread = threading.Thread(target=run_dashboard, daemon=True)
-    dash_thread.start()
+    if not WEBHOOK_URL:
+        dash_thread = threading.Thread(target=run_dashboard, daemon=True)
+        dash_thread.start()
+        print(f"🚀 Дашборд запущен: http://127.0.0.1:{DASH_PORT}")
+    else:
+        # Дашборд собирается в фоне, webhook принимает обновления сразу
+        threading.Thread(target=get_dashboard_app, daemon=True).start()
+        print(f"🚀 Webhook: http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}, дашборд: http://127.0.0.1:{DASH_PORT}")
     
-    print(f"🚀 Дашборд запущен: http://127.0.0.1:{DASH_PORT}")
     print("🤖 Бот запускается...")
     print("📋 Используйте команду /start для получения списка команд")
-    print("📊 Для просмотра аналитики откройте в браузере: http://127.0.0.1:8050")
     
-    await dp.start_polling(bot)
+    notifier.start()
+    scheduler.start()
+    audit.start()
+    try:
+        if WEBHOOK_URL:
+            await run_webhook(
+                dp, bot, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT,
+                secret=WEBHOOK_SECRET, wsgi_app=dashboard_wsgi, max_concurrent=WEBHOOK_WORKERS,
+                metrics=metrics, dashboard_port=DASH_PORT
+            )
+        else:
+            print(f"📊 Для просмотра аналитики откройте в браузере: http://127.0.0.1:{DASH_PORT}")
+            await dp.start_polling(bot)
+    finally:
+        await scheduler.stop()
+        await notifier.stop()
+        await asyncio.to_thread(audit.close)
 
 if __name__ == '__main__':
     try:
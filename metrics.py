@@ -0,0 +1,166 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from aiogram import BaseMiddleware
+
+# ================== МЕТРИКИ ПРОИЗВОДИТЕЛЬНОСТИ ==================
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма задержек с фиксированными корзинами (формат Prometheus)"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class MetricsRegistry:
+    """Гистограммы задержек по операциям и показатели-функции (размеры очередей, хранилищ)"""
+
+    def __init__(self, prefix='retail'):
+        self.prefix = prefix
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, label, seconds):
+        key = (name, label)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def gauge(self, name, func, description=''):
+        """Показатель, вычисляемый при чтении; func возвращает число или {метка: число}"""
+        self._gauges[name] = (func, description)
+
+    def timed(self, name, label=None):
+        """Декоратор замера синхронной функции (колбэки Dash)"""
+        def decorator(func):
+            key = label or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, key, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def histograms(self):
+        with self._lock:
+            return sorted(self._histograms.items())
+
+    def gauges(self):
+        values = {}
+        for name, (func, _) in self._gauges.items():
+            try:
+                values[name] = func()
+            except Exception:
+                continue
+        return values
+
+    def summary(self):
+        """Строки для отчета: (операция, метка, число, среднее, p50, p99, максимум)"""
+        rows = []
+        for (name, label), h in self.histograms():
+            rows.append((name, label, h.count, h.sum / h.count if h.count else 0.0,
+                         h.quantile(0.5), h.quantile(0.99), h.max))
+        return rows
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus"""
+        lines = []
+        described = set()
+        for (name, label), h in self.histograms():
+            metric = f"{self.prefix}_{name}_seconds"
+            if metric not in described:
+                described.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            labels = f'name="{_escape(label)}"'
+            cumulative = 0
+            for bound, n in zip([*map(str, h.buckets), '+Inf'], h.counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {h.sum:.6f}")
+            lines.append(f"{metric}_count{{{labels}}} {h.count}")
+        for name, value in self.gauges().items():
+            metric = f"{self.prefix}_{name}"
+            description = self._gauges[name][1]
+            if description:
+                lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} gauge")
+            if isinstance(value, dict):
+                for label, v in value.items():
+                    lines.append(f'{metric}{{name="{_escape(label)}"}} {v}')
+            else:
+                lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class TimingMiddleware(BaseMiddleware):
+    """Замер времени обработчиков aiogram.
+
+    Подключается как внутренний middleware (dp.message.middleware), поэтому
+    вызывается только для сообщений, нашедших обработчик, и знает его имя.
+    """
+
+    def __init__(self, registry, name='handler'):
+        self.registry = registry
+        self.name = name
+
+    async def __call__(self, handler, event, data):
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_object = data.get('handler')
+            label = handler_object.callback.__name__ if handler_object is not None else 'unknown'
+            self.registry.observe(self.name, label, time.perf_counter() - start)
+
+
+def add_metrics_route(server, registry, path='/metrics'):
+    """Маршрут /metrics на Flask-сервере Dash"""
+    from flask import Response
+
+    def metrics_view():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    server.add_url_rule(path, 'metrics', metrics_view)
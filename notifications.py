@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+# ================== ЛИМИТЫ TELEGRAM ==================
+GLOBAL_RATE = 25         # сообщений в секунду на бота (лимит Telegram ~30)
+CHAT_RATE = 1            # сообщений в секунду в один чат
+CHAT_BURST = 3           # допустимый всплеск в один чат
+MAX_CONCURRENT_SENDS = 8
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5       # секунд, удваивается с каждой попыткой
+BACKOFF_MAX = 30
+MESSAGE_LIMIT = 4096     # максимальная длина сообщения Telegram
+
+
+class TokenBucket:
+    """Маркерная корзина: rate маркеров в секунду, не более capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now):
+        """Сколько секунд ждать до появления маркера"""
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self, now):
+        self._refill(now)
+        self._tokens -= 1
+
+
+class _Outgoing:
+    __slots__ = ('method', 'payload', 'coalesce', 'attempts')
+
+    def __init__(self, method, payload, coalesce):
+        self.method = method
+        self.payload = payload
+        self.coalesce = coalesce
+        self.attempts = 0
+
+
+class _ChatState:
+    __slots__ = ('items', 'bucket', 'not_before', 'in_flight')
+
+    def __init__(self):
+        self.items = deque()
+        self.bucket = TokenBucket(CHAT_RATE, CHAT_BURST)
+        self.not_before = 0.0
+        self.in_flight = False
+
+
+class NotificationQueue:
+    """Очередь исходящих сообщений бота.
+
+    Обработчики ставят сообщение в очередь и сразу возвращаются, отправкой
+    занимается фоновая задача. Соблюдаются глобальный и початовый лимиты,
+    подряд идущие уведомления в один чат склеиваются в одно сообщение,
+    временные ошибки повторяются с экспоненциальной задержкой.
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE):
+        self.bot = bot
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+        self._worker = None
+        self._sending = set()
+        self.sent = 0
+        self.failed = 0
+
+    # ---------- постановка в очередь ----------
+
+    def notify(self, chat_id, text, parse_mode='HTML'):
+        """Уведомление: может быть склеено с соседними уведомлениями"""
+        self._put(chat_id, _Outgoing('send_message', {'text': text, 'parse_mode': parse_mode}, True))
+
+    def send(self, chat_id, text, **kwargs):
+        """Отдельное сообщение (отчет, запрос на утверждение)"""
+        self._put(chat_id, _Outgoing('send_message', dict(kwargs, text=text), False))
+
+    def send_document(self, chat_id, document, **kwargs):
+        """Отправка файла"""
+        self._put(chat_id, _Outgoing('send_document', dict(kwargs, document=document), False))
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        """Отправка фото (file_id уже загруженного в Telegram фото)"""
+        self._put(chat_id, _Outgoing('send_photo', dict(kwargs, photo=photo), False))
+
+    def _put(self, chat_id, item):
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = self._chats[chat_id] = _ChatState()
+        state.items.append(item)
+        self._wakeup.set()
+
+    @property
+    def pending(self):
+        """Количество сообщений, ожидающих отправки"""
+        return sum(len(state.items) for state in self._chats.values())
+
+    # ---------- жизненный цикл ----------
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=5):
+        """Остановка с попыткой дослать накопленное"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._sending:
+            await asyncio.wait(self._sending, timeout=max(deadline - time.monotonic(), 0.1))
+
+    # ---------- отправка ----------
+
+    async def _run(self):
+        while True:
+            chat_id, wait = self._pick_chat()
+            if chat_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            global_wait = self._global.delay(time.monotonic())
+            if global_wait:
+                await asyncio.sleep(global_wait)
+                continue
+
+            await self._slots.acquire()
+            now = time.monotonic()
+            self._global.consume(now)
+            state = self._chats[chat_id]
+            state.bucket.consume(now)
+            state.in_flight = True
+            item = self._take(state)
+            # Чат уходит в конец очереди, чтобы не блокировать остальных
+            self._chats.move_to_end(chat_id)
+
+            task = asyncio.create_task(self._deliver(chat_id, state, item))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    def _pick_chat(self):
+        """Первый готовый к отправке чат и время ожидания, если готовых нет"""
+        now = time.monotonic()
+        wait = None
+        for chat_id, state in list(self._chats.items()):
+            if state.in_flight:
+                continue
+            if not state.items:
+                del self._chats[chat_id]
+                continue
+            delay = max(state.bucket.delay(now), state.not_before - now)
+            if delay <= 0:
+                return chat_id, 0
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    def _take(self, state):
+        """Извлечение сообщения со склейкой подряд идущих уведомлений"""
+        item = state.items.popleft()
+        if not item.coalesce:
+            return item
+        texts = [item.payload['text']]
+        length = len(texts[0])
+        while state.items:
+            nxt = state.items[0]
+            if not nxt.coalesce or nxt.payload['parse_mode'] != item.payload['parse_mode']:
+                break
+            if length + len(nxt.payload['text']) + 2 > MESSAGE_LIMIT:
+                break
+            state.items.popleft()
+            texts.append(nxt.payload['text'])
+            length += len(nxt.payload['text']) + 2
+        if len(texts) > 1:
+            merged = _Outgoing(item.method, dict(item.payload, text="\n\n".join(texts)), True)
+            merged.attempts = item.attempts
+            return merged
+        return item
+
+    async def _deliver(self, chat_id, state, item):
+        try:
+            await getattr(self.bot, item.method)(chat_id=chat_id, **item.payload)
+            self.sent += 1
+        except TelegramRetryAfter as e:
+            # Ограничение со стороны Telegram: ждем указанное время и повторяем
+            state.not_before = time.monotonic() + e.retry_after
+            state.items.appendleft(item)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            item.attempts += 1
+            if item.attempts > MAX_RETRIES:
+                self.failed += 1
+                logging.error(f"Сообщение в чат {chat_id} не доставлено: {e}")
+            else:
+                state.not_before = time.monotonic() + min(BACKOFF_BASE * 2 ** (item.attempts - 1), BACKOFF_MAX)
+                state.items.appendleft(item)
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            self.failed += 1
+            logging.error(f"Сообщение в чат {chat_id} отклонено: {e}")
+        except Exception as e:
+            self.failed += 1
+            logging.exception(f"Ошибка отправки в чат {chat_id}: {e}")
+        finally:
+            state.in_flight = False
+            self._slots.release()
+            self._wakeup.set()
@@ -0,0 +1,232 @@
+import time
+from array import array
+from operator import itemgetter
+
+import numpy as np
+
+# ================== КАРТОЧКА ТОВАРА ==================
+PRODUCT_FIELDS = (
+    'store', 'sku', 'name', 'quantity', 'price', 'expiry', 'status', 'manager', 'category',
+    'min_level', 'critical_level', 'reorder_qty', 'supplier', 'lead_time', 'barcode', 'zone',
+    'shelf', 'shelf_capacity', 'shelf_quantity',
+)
+# Числа хранятся в типизированных массивах (код типа модуля array)
+NUMBER_TYPES = {
+    'quantity': 'q', 'price': 'd', 'min_level': 'i', 'critical_level': 'i', 'reorder_qty': 'i',
+    'lead_time': 'i', 'shelf_capacity': 'i', 'shelf_quantity': 'i',
+}
+# Значения, повторяющиеся у тысяч товаров, хранятся кодами словаря значений
+ENCODED_FIELDS = ('store', 'expiry', 'status', 'manager', 'category', 'supplier', 'zone', 'shelf')
+# Уникальные строки - ссылками на объекты
+OBJECT_FIELDS = ('sku', 'name', 'barcode')
+ADDED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Значение "поле не задано" в числовом массиве
+_MISSING = {'q': -2 ** 63, 'i': -2 ** 31, 'd': float('nan')}
+
+
+def _number_reader(values):
+    missing = _MISSING[values.typecode]
+    if missing != missing:
+        def read(row):
+            value = values[row]
+            return None if value != value else value
+    else:
+        def read(row):
+            value = values[row]
+            return None if value == missing else value
+    return read
+
+
+def _encoded_reader(codes, values):
+    def read(row):
+        code = codes[row]
+        return None if code < 0 else values[code]
+    return read
+
+
+def _object_reader(values):
+    return values.__getitem__
+
+
+class ProductTable:
+    """Столбцы всех карточек товаров процесса.
+
+    Числа лежат в массивах array, повторяющиеся строки - кодами int32
+    со словарем значений поля, уникальные строки (артикул, название,
+    штрих-код) - списками ссылок. Строка таблицы - номер карточки.
+    Строки только добавляются: товары из каталога не удаляются.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.numbers = {field: array(code) for field, code in NUMBER_TYPES.items()}
+        self.codes = {field: array('i') for field in ENCODED_FIELDS}
+        self.values = {field: [] for field in ENCODED_FIELDS}   # код -> значение
+        self._index = {field: {} for field in ENCODED_FIELDS}   # значение -> код
+        self.objects = {field: [] for field in OBJECT_FIELDS}
+        self.added_ts = array('q')
+        self.readers = {}
+        for field, values in self.numbers.items():
+            self.readers[field] = _number_reader(values)
+        for field in ENCODED_FIELDS:
+            self.readers[field] = _encoded_reader(self.codes[field], self.values[field])
+        for field, values in self.objects.items():
+            self.readers[field] = _object_reader(values)
+        self.readers['added_ts'] = self.added_ts.__getitem__
+
+    def encode(self, field, value):
+        """Код значения повторяющейся строки; None - код -1"""
+        if value is None:
+            return -1
+        index = self._index[field]
+        code = index.get(value)
+        if code is None:
+            values = self.values[field]
+            code = len(values)
+            # Значение появляется раньше кода: дашборд читает таблицу из другого потока
+            values.append(value)
+            index[value] = code
+        return code
+
+    def append(self, fields, added_ts):
+        """Новая строка; при неверном числе (TypeError, OverflowError) таблица не меняется"""
+        filled = []
+        try:
+            for field, values in self.numbers.items():
+                value = fields.get(field)
+                values.append(_MISSING[values.typecode] if value is None else value)
+                filled.append(values)
+        except (TypeError, OverflowError):
+            for values in filled:
+                values.pop()
+            raise
+        for field, codes in self.codes.items():
+            codes.append(self.encode(field, fields.get(field)))
+        for field, values in self.objects.items():
+            values.append(fields.get(field))
+        self.added_ts.append(added_ts)
+        row = self.size
+        self.size += 1
+        return row
+
+    def set(self, field, row, value):
+        values = self.numbers.get(field)
+        if values is not None:
+            values[row] = _MISSING[values.typecode] if value is None else value
+        elif field in self.codes:
+            self.codes[field][row] = self.encode(field, value)
+        elif field in self.objects:
+            self.objects[field][row] = value
+        elif field == 'added_ts':
+            self.added_ts[row] = value
+        else:
+            raise KeyError(field)
+
+
+# Таблица карточек процесса; Product - строка этой таблицы
+CATALOG = ProductTable()
+_READERS = CATALOG.readers
+
+
+class Product:
+    """Карточка товара - представление строки таблицы CATALOG со словарным интерфейсом.
+
+    Код бота обращается к товару как к словарю: product['quantity'],
+    product.get(...); значения читаются из столбцов и пишутся в них.
+    Значение None считается отсутствующим полем. В другой процесс
+    карточка передается словарем, чтобы не пополнять его таблицу.
+    """
+
+    __slots__ = ('_row',)
+
+    def __init__(self, **fields):
+        self._row = CATALOG.append(fields, fields.get('added_ts') or int(time.time()))
+
+    @property
+    def added_ts(self):
+        return CATALOG.added_ts[self._row]
+
+    @property
+    def added_at(self):
+        return time.strftime(ADDED_AT_FORMAT, time.localtime(self.added_ts))
+
+    def __getitem__(self, key):
+        read = _READERS.get(key)
+        if read is None:
+            if key == 'added_at':
+                return self.added_at
+            raise KeyError(key)
+        return read(self._row)
+
+    def __setitem__(self, key, value):
+        CATALOG.set(key, self._row, value)
+
+    def get(self, key, default=None):
+        read = _READERS.get(key)
+        if read is None:
+            return self.added_at if key == 'added_at' else default
+        value = read(self._row)
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        row = self._row
+        return [field for field in PRODUCT_FIELDS if _READERS[field](row) is not None] + ['added_at']
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"Product({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return dict, (self.to_dict(),)
+
+
+_GETTERS = {field: itemgetter(field) for field in PRODUCT_FIELDS + ('added_at',)}
+# Числовые поля для дашборда; необязательные - float, чтобы пропуск стал NaN
+NUMERIC_FIELDS = {
+    'quantity': np.int64, 'price': np.float64, 'min_level': np.float64,
+    'critical_level': np.float64, 'reorder_qty': np.float64, 'lead_time': np.float64,
+}
+
+
+def column(products, field):
+    return list(map(_GETTERS[field], products))
+
+
+def _rows(products):
+    return np.fromiter((product._row for product in products), dtype=np.int64, count=len(products))
+
+
+def _snapshot(values):
+    # Срез копирует массив одной операцией: numpy не держит буфер,
+    # который поток бота может перераспределить при добавлении товара
+    return np.frombuffer(values[:], dtype=values.typecode)
+
+
+def numeric_column(products, field):
+    """Числовой столбец массивом numpy прямо из типизированного массива таблицы"""
+    values = CATALOG.numbers[field]
+    data = _snapshot(values)[_rows(products)]
+    dtype = NUMERIC_FIELDS[field]
+    if dtype is np.int64 or values.typecode == 'd':
+        return data.astype(dtype, copy=False)
+    result = data.astype(dtype)
+    result[data == _MISSING[values.typecode]] = np.nan
+    return result
+
+
+def encoded_column(products, field):
+    """Готовые коды повторяющихся строк: (коды, значения); пропуск - код -1"""
+    values = CATALOG.values[field]
+    codes = _snapshot(CATALOG.codes[field])[_rows(products)]
+    # Только значения, которые встречаются у переданных товаров
+    used, codes = np.unique(codes, return_inverse=True)
+    if len(used) and used[0] < 0:
+        used = used[1:]
+        codes = codes - 1
+    return codes.astype(np.int32), [values[code] for code in used]
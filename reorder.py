@@ -0,0 +1,222 @@
+from datetime import datetime
+
+import numpy as np
+
+from alerts import DEFAULT_MIN_LEVEL
+from forecasting import series_matrix, smooth_level
+
+# ================== ПАРАМЕТРЫ ПЛАНИРОВАНИЯ ==================
+DEFAULT_SUPPLIER = 'Не указан'
+DEFAULT_LEAD_TIME = 3     # срок поставки, дней
+WINDOW_DAYS = 90          # окно расчета скорости продаж
+SERVICE_Z = 1.65          # уровень сервиса ~95%
+ORDER_COST = 500.0        # затраты на размещение одной позиции заказа, руб
+HOLDING_RATE = 0.25       # годовая стоимость хранения, доля от цены
+OPEN_STATUS = 'На согласовании'   # заявка еще не поставлена полностью
+RECEIVED_STATUS = 'Получена'
+
+
+def _product_columns(products):
+    """Колонки каталога в виде массивов"""
+    n = len(products)
+    quantity = np.fromiter((p['quantity'] for p in products), dtype=np.float64, count=n)
+    price = np.fromiter((p['price'] for p in products), dtype=np.float64, count=n)
+    lead_time = np.fromiter((p.get('lead_time') or DEFAULT_LEAD_TIME for p in products), dtype=np.float64, count=n)
+    min_level = np.fromiter((p.get('min_level', DEFAULT_MIN_LEVEL) for p in products), dtype=np.float64, count=n)
+    fixed_order = np.fromiter((p.get('reorder_qty') or 0 for p in products), dtype=np.float64, count=n)
+    return quantity, price, lead_time, min_level, fixed_order
+
+
+def _sales_columns(sales, sku_index, start, window):
+    """Продажи в окне в виде массивов (индекс товара, день, количество).
+
+    sales - снимок SaleColumns магазина: (артикулы по кодам, коды, дни,
+    количества). Построчно перебираются только различные артикулы.
+    """
+    skus, codes, days, qty = sales
+    position = np.fromiter((sku_index.get(sku, -1) for sku in skus), dtype=np.int64, count=len(skus))
+    idx = position[codes]
+    offset = days.astype(np.int64) - start.astype(np.int64)
+    keep = (idx >= 0) & (offset >= 0) & (offset < window)
+    return idx[keep], offset[keep], qty[keep]
+
+
+def on_order_quantities(orders, store):
+    """Артикул -> еще не полученное количество по открытым заявкам магазина"""
+    on_order = {}
+    for order in orders:
+        if order['status'] != OPEN_STATUS or order.get('store') != store:
+            continue
+        for line in order['lines']:
+            outstanding = line['order_qty'] - line.get('received', 0)
+            if outstanding > 0:
+                on_order[line['sku']] = on_order.get(line['sku'], 0) + outstanding
+    return on_order
+
+
+def receive_on_order(orders, store, sku, quantity):
+    """Зачет принятого товара в открытые заявки магазина, начиная со старых.
+
+    Заявка, по которой получены все позиции, получает статус RECEIVED_STATUS.
+    """
+    for order in orders:
+        if quantity <= 0:
+            break
+        if order['status'] != OPEN_STATUS or order.get('store') != store:
+            continue
+        for line in order['lines']:
+            if line['sku'] != sku:
+                continue
+            taken = min(quantity, line['order_qty'] - line.get('received', 0))
+            if taken > 0:
+                line['received'] = line.get('received', 0) + taken
+                quantity -= taken
+        if all(line.get('received', 0) >= line['order_qty'] for line in order['lines']):
+            order['status'] = RECEIVED_STATUS
+
+
+def compute_reorder_metrics(products, sales, now=None, window_days=WINDOW_DAYS, on_order=None):
+    """Скорость продаж, точка заказа и EOQ для всего каталога за один проход.
+
+    sales - снимок SaleColumns.snapshot() магазина.
+    on_order - артикул -> количество в открытых заявках: товар в пути
+    считается вместе с остатком, чтобы не заказывать его повторно.
+    Возвращает словарь массивов, выровненных по порядку products.
+    """
+    now = now or datetime.now()
+    n = len(products)
+    sku_index = {p['sku']: i for i, p in enumerate(products)}
+    quantity, price, lead_time, min_level, fixed_order = _product_columns(products)
+    on_order = on_order or {}
+    ordered = np.fromiter((on_order.get(p['sku'], 0) for p in products), dtype=np.float64, count=n)
+    position = quantity + ordered
+
+    start = np.datetime64(now.date(), 'D') - np.timedelta64(window_days - 1, 'D')
+    idx, day, qty = _sales_columns(sales, sku_index, start, window_days)
+
+    # Суммы по товарам и по парам (товар, день) для оценки дисперсии спроса
+    total = np.bincount(idx, weights=qty, minlength=n)
+    keys, inverse = np.unique(idx * window_days + day, return_inverse=True)
+    daily = np.bincount(inverse, weights=qty)
+    sumsq = np.bincount(keys // window_days, weights=daily * daily, minlength=n)
+
+    velocity = total / window_days
+    sigma = np.sqrt(np.maximum(sumsq / window_days - velocity ** 2, 0))
+
+    # Спрос на срок поставки - по сглаженному уровню недельных продаж,
+    # чтобы точка заказа следовала за ростом или спадом спроса в окне
+    weeks = window_days // 7
+    if weeks >= 2:
+        first_day = window_days - weeks * 7
+        recent = day >= first_day
+        weekly = series_matrix(idx[recent], (day[recent] - first_day) // 7, qty[recent], n, weeks)
+        forecast_velocity = smooth_level(weekly)[0] / 7
+    else:
+        forecast_velocity = velocity
+
+    safety = SERVICE_Z * sigma * np.sqrt(lead_time)
+    reorder_point = np.maximum(forecast_velocity * lead_time + safety, min_level)
+
+    annual_demand = velocity * 365
+    holding = np.maximum(price * HOLDING_RATE, 1e-9)
+    eoq = np.sqrt(2 * annual_demand * ORDER_COST / holding)
+    # Заказ должен как минимум поднять остаток выше точки заказа
+    order_qty = np.where(fixed_order > 0, fixed_order, np.maximum(eoq, reorder_point - position + 1))
+    order_qty = np.ceil(np.maximum(order_qty, 1))
+
+    return {
+        'velocity': velocity,
+        'forecast_velocity': forecast_velocity,
+        'sigma': sigma,
+        'safety_stock': safety,
+        'reorder_point': reorder_point,
+        'eoq': eoq,
+        'order_qty': order_qty,
+        'on_order': ordered,
+        'needs_order': position <= reorder_point,
+    }
+
+
+def build_purchase_orders(products, metrics, now=None, first_number=1):
+    """Черновики заявок на закупку, сгруппированные по поставщикам"""
+    now = now or datetime.now()
+    selected = np.flatnonzero(metrics['needs_order'])
+    if len(selected) == 0:
+        return []
+
+    suppliers = np.array([products[i].get('supplier') or DEFAULT_SUPPLIER for i in selected])
+    order = np.argsort(suppliers, kind='stable')
+    names, starts = np.unique(suppliers[order], return_index=True)
+    bounds = list(starts[1:]) + [len(order)]
+
+    drafts = []
+    for number, (supplier, begin, end) in enumerate(zip(names, starts, bounds), first_number):
+        lines = []
+        for i in selected[order[begin:end]]:
+            product = products[i]
+            qty = int(metrics['order_qty'][i])
+            lines.append({
+                'sku': product['sku'],
+                'name': product['name'],
+                'current': product['quantity'],
+                'on_order': int(metrics['on_order'][i]),
+                'reorder_point': round(float(metrics['reorder_point'][i]), 1),
+                'velocity': round(float(metrics['velocity'][i]), 2),
+                'order_qty': qty,
+                'amount': qty * product['price'],
+            })
+        drafts.append({
+            'id': f"PO-{now:%Y%m%d}-{number:03d}",
+            'supplier': str(supplier),
+            'status': OPEN_STATUS,
+            'lead_time': max(int(products[i].get('lead_time') or DEFAULT_LEAD_TIME) for i in selected[order[begin:end]]),
+            'created_at': now.strftime("%Y-%m-%d %H:%M:%S"),
+            'lines': lines,
+            'total': sum(line['amount'] for line in lines),
+        })
+    return drafts
+
+
+def plan_purchase_orders(products, sales, now=None, window_days=WINDOW_DAYS, first_number=1, on_order=None):
+    """Полный расчет: метрики каталога и черновики заявок"""
+    if not products:
+        return []
+    metrics = compute_reorder_metrics(products, sales, now=now, window_days=window_days, on_order=on_order)
+    return build_purchase_orders(products, metrics, now=now, first_number=first_number)
+
+
+def plan_store_orders(partitions, now=None, window_days=WINDOW_DAYS, first_number=1):
+    """Заявки по каждому магазину: [(магазин, товары, столбцы продаж, в заказе), ...]
+
+    Скорость продаж и остатки считаются внутри магазина, поэтому одинаковые
+    артикулы разных магазинов не смешиваются. "В заказе" - результат
+    on_order_quantities для магазина.
+    """
+    drafts = []
+    for store, products, sales, on_order in partitions:
+        for draft in plan_purchase_orders(products, sales, now=now, window_days=window_days,
+                                          first_number=first_number + len(drafts), on_order=on_order):
+            draft['store'] = store
+            drafts.append(draft)
+    return drafts
+
+
+def format_purchase_order(draft, limit=20):
+    """Текст заявки на закупку для отправки на утверждение"""
+    text = (
+        f"🧾 <b>Заявка на закупку {draft['id']}</b>\n"
+        f"<b>Поставщик:</b> {draft['supplier']}\n"
+        f"<b>Магазин:</b> {draft.get('store', '—')}\n"
+        f"<b>Статус:</b> {draft['status']}\n"
+        f"<b>Срок поставки:</b> {draft['lead_time']} дн.\n\n"
+    )
+    for line in draft['lines'][:limit]:
+        text += (
+            f"• {line['name']} ({line['sku']}): остаток {line['current']}, "
+            + (f"в заказе {line['on_order']}, " if line.get('on_order') else '')
+            + f"заказ {line['order_qty']} шт.\n"
+        )
+    if len(draft['lines']) > limit:
+        text += f"... и еще {len(draft['lines']) - limit} позиций\n"
+    text += f"\n<b>Сумма:</b> {draft['total']:,.0f} руб"
+    return text
@@ -0,0 +1,273 @@
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from datetime import datetime
+
+# ================== ПОПОЛНЕНИЕ ПОЛОК ==================
+REFILL_RATIO = 0.5        # задание создается, когда на полке осталось не больше половины вместимости
+VELOCITY_HALF_LIFE = 86400.0  # период полураспада оценки скорости продаж, с
+VELOCITY_FLOOR = 0.1      # шт./день для товаров без продаж: порядок задается недостачей
+HIGH_PRIORITY_DAYS = 0.5  # полка опустеет раньше - высокий приоритет
+MEDIUM_PRIORITY_DAYS = 2.0
+
+PENDING = 'Ожидает'
+ASSIGNED = 'Назначено'
+DONE = 'Выполнено'
+CANCELLED = 'Отменено'
+
+_DECAY = math.log(2) / VELOCITY_HALF_LIFE
+
+
+class ShelfTask:
+    """Задание на пополнение полки одним товаром"""
+
+    __slots__ = ('task_id', 'store', 'product', 'quantity', 'priority', 'status', 'assignee',
+                 'accepted', 'created_at', 'completed_at', 'photo', 'reason', 'entry')
+
+    def __init__(self, task_id, product):
+        self.task_id = task_id
+        self.store = product.get('store')
+        self.product = product
+        self.quantity = 0
+        self.priority = 0.0
+        self.status = PENDING
+        self.assignee = None
+        self.accepted = False
+        self.created_at = datetime.now()
+        self.completed_at = None
+        self.photo = None
+        self.reason = None
+        self.entry = None
+
+
+def shelf_shortfall(product):
+    """(недостача на полке, сколько можно принести со склада); (0, 0) - полка не ведется"""
+    capacity = product.get('shelf_capacity')
+    if not product.get('shelf') or not capacity:
+        return 0, 0
+    on_shelf = min(product.get('shelf_quantity', 0), product['quantity'])
+    return capacity - on_shelf, product['quantity'] - on_shelf
+
+
+class ReplenishmentQueue:
+    """Задания на пополнение полок с приоритетом по срочности.
+
+    Срочность - скорость продаж товара, умноженная на недостачу на полке.
+    Скорость оценивается по событиям продаж с экспоненциальным затуханием,
+    без обхода истории. Ожидающие задания магазина лежат в куче; при смене
+    приоритета в кучу кладется новая запись, а старая пропускается при
+    извлечении, поэтому взятие и выполнение задания стоят O(log n).
+    Свободные сотрудники смены ждут в очереди и получают новое задание
+    сразу при его появлении.
+    """
+
+    def __init__(self):
+        self.tasks = {}     # номер -> задание
+        self.open = {}      # (магазин, артикул) -> незавершенное задание
+        self.staff = {}     # id сотрудника на смене -> магазин
+        self.working = {}   # id сотрудника -> назначенное задание
+        self._heaps = {}    # магазин -> [(-срочность, порядок, задание)]
+        self._stale = {}    # магазин -> число устаревших записей в куче
+        self._idle = {}     # магазин -> deque свободных сотрудников
+        self._velocity = {}  # (магазин, артикул) -> (шт./день, время оценки)
+        self._ids = itertools.count(1)
+        self._order = itertools.count()
+
+    # ---------- скорость продаж ----------
+
+    def record_sale(self, product, quantity, now=None):
+        """Продажа с полки: уменьшает выкладку и обновляет скорость продаж"""
+        now = time.time() if now is None else now
+        if product.get('shelf_quantity'):
+            product['shelf_quantity'] = max(product['shelf_quantity'] - quantity, 0)
+        key = (product.get('store'), product['sku'])
+        rate, updated = self._velocity.get(key, (0.0, now))
+        # Затухающая сумма продаж, приведенная к штукам в день
+        rate = rate * math.exp(-_DECAY * (now - updated)) + quantity * _DECAY * 86400
+        self._velocity[key] = (rate, now)
+
+    def velocity(self, product, now=None):
+        """Оценка скорости продаж товара, шт./день"""
+        now = time.time() if now is None else now
+        rate, updated = self._velocity.get((product.get('store'), product['sku']), (0.0, now))
+        return rate * math.exp(-_DECAY * (now - updated))
+
+    # ---------- задания ----------
+
+    def check(self, product, now=None):
+        """Проверка полки после изменения товара.
+
+        Создает, обновляет или отменяет задание. Возвращает задание, если
+        оно только что назначено свободному сотруднику, иначе None.
+        """
+        key = (product.get('store'), product['sku'])
+        task = self.open.get(key)
+        shortfall, backstock = shelf_shortfall(product)
+        need = min(shortfall, backstock)
+        if task is None:
+            if need <= 0 or shortfall < product.get('shelf_capacity', 0) * REFILL_RATIO:
+                return None
+            task = ShelfTask(next(self._ids), product)
+            self.tasks[task.task_id] = task
+            self.open[key] = task
+        elif need <= 0:
+            if task.status == PENDING:
+                self._close(task, CANCELLED)
+            return None
+
+        task.quantity = need
+        task.priority = max(self.velocity(product, now), VELOCITY_FLOOR) * shortfall
+        if task.status == PENDING:
+            self._push(task)
+            return self._dispatch(task.store)
+        return None
+
+    def _push(self, task):
+        if task.entry is not None:
+            self._drop(task)
+        task.entry = next(self._order)
+        heapq.heappush(self._heaps.setdefault(task.store, []), (-task.priority, task.entry, task))
+
+    def _drop(self, task):
+        """Запись задания в куче становится устаревшей; куча сжимается, когда их больше половины"""
+        task.entry = None
+        heap = self._heaps.get(task.store)
+        if heap is None:
+            return
+        stale = self._stale[task.store] = self._stale.get(task.store, 0) + 1
+        if stale > 64 and stale * 2 > len(heap):
+            heap[:] = [item for item in heap if item[2].status == PENDING and item[2].entry == item[1]]
+            heapq.heapify(heap)
+            self._stale[task.store] = 0
+
+    def _pop(self, store):
+        """Самое срочное ожидающее задание магазина; устаревшие записи отбрасываются"""
+        heap = self._heaps.get(store)
+        while heap:
+            _, entry, task = heapq.heappop(heap)
+            if task.status == PENDING and task.entry == entry:
+                task.entry = None
+                return task
+            self._stale[store] -= 1
+        return None
+
+    def _close(self, task, status):
+        if task.entry is not None:
+            self._drop(task)
+        task.status = status
+        self.open.pop((task.store, task.product['sku']), None)
+        if task.assignee is not None and self.working.get(task.assignee) is task:
+            del self.working[task.assignee]
+
+    def _assign(self, task, user_id):
+        task.status = ASSIGNED
+        task.assignee = user_id
+        task.accepted = False
+        self.working[user_id] = task
+        return task
+
+    def _dispatch(self, store):
+        """Передает самое срочное задание первому свободному сотруднику магазина"""
+        idle = self._idle.get(store)
+        while idle:
+            user_id = idle[0]
+            if self.staff.get(user_id) != store or user_id in self.working:
+                idle.popleft()
+                continue
+            task = self._pop(store)
+            if task is None:
+                return None
+            idle.popleft()
+            return self._assign(task, user_id)
+        return None
+
+    # ---------- сотрудники ----------
+
+    def start_shift(self, user_id, store):
+        """Сотрудник на смене; возвращает назначенное задание или None"""
+        self.staff[user_id] = store
+        return self.working.get(user_id) or self.claim(user_id)
+
+    def end_shift(self, user_id):
+        """Конец смены: незавершенное задание возвращается в очередь.
+
+        Если его сразу получил свободный коллега, у возвращенного задания
+        статус ASSIGNED и новый исполнитель.
+        """
+        self.staff.pop(user_id, None)
+        task = self.working.pop(user_id, None)
+        if task is not None:
+            self._release(task)
+        return task
+
+    def claim(self, user_id):
+        """Следующее задание сотруднику; без заданий он ждет в очереди свободных"""
+        store = self.staff.get(user_id)
+        if store is None:
+            return None
+        task = self.working.get(user_id)
+        if task is not None:
+            return task
+        task = self._pop(store)
+        if task is None:
+            idle = self._idle.setdefault(store, deque())
+            if user_id not in idle:
+                idle.append(user_id)
+            return None
+        return self._assign(task, user_id)
+
+    def accept(self, user_id, task_id):
+        task = self.working.get(user_id)
+        if task is None or task.task_id != task_id:
+            return None
+        task.accepted = True
+        return task
+
+    def reject(self, user_id, reason):
+        """Отказ от задания: оно возвращается в очередь (как в end_shift), сотрудник берет следующее сам"""
+        task = self.working.pop(user_id, None)
+        if task is None:
+            return None
+        task.reason = reason
+        self._release(task)
+        return task
+
+    def complete(self, user_id, photo, quantity=None):
+        """Выполнение с фотоотчетом: товар выложен на полку"""
+        task = self.working.get(user_id)
+        if task is None:
+            return None
+        product = task.product
+        moved = task.quantity if quantity is None else quantity
+        on_shelf = min(product.get('shelf_quantity', 0) + moved, product['quantity'])
+        product['shelf_quantity'] = min(on_shelf, product.get('shelf_capacity', on_shelf))
+        task.photo = photo
+        task.quantity = moved
+        task.completed_at = datetime.now()
+        self._close(task, DONE)
+        return task
+
+    def _release(self, task):
+        task.status = PENDING
+        task.assignee = None
+        task.accepted = False
+        self._push(task)
+        self._dispatch(task.store)
+
+    def pending(self, store, limit=10):
+        """Ожидающие задания магазина по срочности (без извлечения из кучи)"""
+        tasks = [task for _, entry, task in self._heaps.get(store, ()) if task.status == PENDING and task.entry == entry]
+        return heapq.nsmallest(limit, tasks, key=lambda task: (-task.priority, task.entry)), len(tasks)
+
+
+def priority_label(task, velocity):
+    """Приоритет для сотрудника по времени до опустения полки"""
+    on_shelf = task.product.get('shelf_quantity', 0)
+    days_left = on_shelf / velocity if velocity > 0 else math.inf
+    if days_left < HIGH_PRIORITY_DAYS:
+        return 'Высокий'
+    if days_left < MEDIUM_PRIORITY_DAYS:
+        return 'Средний'
+    return 'Низкий'
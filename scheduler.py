@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+# ================== CRON-РАСПИСАНИЕ ==================
+_FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7),   # 0 и 7 - воскресенье, как в cron
+)
+
+
+def _parse_field(spec, low, high):
+    """Разбор поля cron: *, */n, a, a/n, a-b, a-b/n, списки через запятую.
+
+    Как в cron, a/n - значения от a до конца диапазона с шагом n.
+    """
+    values = set()
+    for part in spec.split(','):
+        try:
+            step = None
+            if '/' in part:
+                part, step_text = part.split('/')
+                step = int(step_text)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(x) for x in part.split('-'))
+            else:
+                start = int(part)
+                end = start if step is None else high
+        except ValueError:
+            raise ValueError(f"Недопустимое значение cron: {spec}") from None
+        if step is None:
+            step = 1
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Недопустимое значение cron: {spec}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Расписание в формате cron: "минута час день месяц день_недели" """
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Ожидается 5 полей cron: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(spec, low, high) for spec, (_, low, high) in zip(parts, _FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = parts[2] == '*'
+        self._any_weekday = parts[4] == '*'
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        # Как в cron: если заданы оба поля, достаточно совпадения любого
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment):
+        """Ближайшее время запуска строго после moment"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Расписание никогда не срабатывает: {self.expression}")
+
+
+# ================== ФОНОВЫЕ ЗАДАЧИ ==================
+class Job:
+    """Периодическая задача и ее метрики"""
+
+    def __init__(self, name, schedule, func, prepare=None, done=None, in_process=False):
+        self.name = name
+        self.schedule = schedule
+        self.func = func
+        self.prepare = prepare
+        self.done = done
+        self.in_process = in_process
+        self.running = False
+        self.next_run = None
+        self.last_run = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+
+    def metrics(self):
+        return {
+            'name': self.name,
+            'schedule': self.schedule.expression,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'last_run': self.last_run,
+            'next_run': self.next_run,
+            'last_duration': self.last_duration,
+            'avg_duration': self.total_duration / self.runs if self.runs else 0.0,
+            'max_duration': self.max_duration,
+            'last_error': self.last_error,
+        }
+
+
+class Scheduler:
+    """Планировщик задач в цикле событий бота.
+
+    Обычные задачи - корутины и выполняются в цикле событий. Задачи с
+    in_process=True - синхронные функции уровня модуля: prepare() собирает
+    аргументы в цикле событий, функция выполняется в пуле процессов, done()
+    получает результат снова в цикле событий. Если предыдущий запуск задачи
+    еще не завершился, очередной запуск пропускается.
+    """
+
+    def __init__(self, max_workers=2):
+        self.jobs = {}
+        self._max_workers = max_workers
+        self._pool = None
+        self._tasks = []
+        self._runs = set()   # выполняющиеся плановые запуски
+
+    def add_job(self, name, cron, func, prepare=None, done=None, in_process=False):
+        job = Job(name, CronSchedule(cron), func, prepare, done, in_process)
+        self.jobs[name] = job
+        return job
+
+    @property
+    def pool(self):
+        """Пул процессов для тяжелых вычислений, создается при первом обращении.
+
+        К этому моменту в процессе уже работают потоки (дашборд, журнал),
+        поэтому процессы пула не копируются fork, а запускаются через
+        forkserver (spawn, где его нет): копия захваченной блокировки
+        повесила бы процесс пула.
+        """
+        if self._pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self._max_workers, mp_context=context)
+        return self._pool
+
+    def start(self):
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job)))
+
+    async def stop(self, timeout=5):
+        """Остановка: новые запуски не начинаются, текущие получают timeout
+        секунд на завершение и затем отменяются; пул закрывается последним"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._runs:
+            _, unfinished = await asyncio.wait(self._runs, timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run_now(self, name):
+        """Внеплановый запуск задачи; False, если она уже выполняется"""
+        job = self.jobs[name]
+        if job.running:
+            job.skipped += 1
+            return False
+        await self._execute(job)
+        return True
+
+    def metrics(self):
+        return [job.metrics() for job in self.jobs.values()]
+
+    async def _loop(self, job):
+        while True:
+            job.next_run = job.schedule.next_after(datetime.now())
+            await asyncio.sleep(max((job.next_run - datetime.now()).total_seconds(), 0))
+            if job.running:
+                job.skipped += 1
+                logging.warning(f"Задача {job.name} еще выполняется, запуск пропущен")
+                continue
+            # Ссылка на задачу хранится до завершения, иначе ее может собрать сборщик мусора
+            task = asyncio.create_task(self._execute(job))
+            self._runs.add(task)
+            task.add_done_callback(self._runs.discard)
+
+    async def _execute(self, job):
+        job.running = True
+        job.last_run = datetime.now()
+        started = time.perf_counter()
+        try:
+            args = job.prepare() if job.prepare else ()
+            if job.in_process:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.pool, job.func, *args)
+            else:
+                result = await job.func(*args)
+            if job.done:
+                outcome = job.done(result)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logging.exception(f"Ошибка задачи {job.name}: {e}")
+        finally:
+            duration = time.perf_counter() - started
+            job.runs += 1
+            job.last_duration = duration
+            job.total_duration += duration
+            job.max_duration = max(job.max_duration, duration)
+            job.running = False
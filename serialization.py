@@ -0,0 +1,131 @@
+import base64
+import functools
+import gzip
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from dash.development.base_component import Component
+from flask import request
+from plotly.basedatatypes import BaseFigure
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него ответы сжимаются gzip
+    brotli = None
+
+# ================== ОТВЕТЫ ДАШБОРДА ==================
+COMPRESS_MIN_SIZE = 1400   # меньшие ответы помещаются в один пакет, сжимать незачем
+COMPRESS_LEVEL = 6
+BROTLI_QUALITY = 4         # быстрый режим: сжатие лучше gzip при сопоставимом времени
+COMPRESSIBLE = {'application/json', 'text/html', 'text/css', 'text/plain',
+                'application/javascript', 'text/javascript'}
+
+
+def add_compression(server, min_size=COMPRESS_MIN_SIZE, level=COMPRESS_LEVEL):
+    """Сжатие ответов Flask-сервера дашборда (brotli или gzip по Accept-Encoding).
+
+    Потоковые ответы (выгрузки) и файлы пропускаются как есть.
+    """
+    @server.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE):
+            return response
+        accepted = request.headers.get('Accept-Encoding', '')
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=level))
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return server
+
+
+def typed_array(values):
+    """Числовой массив в двоичном виде Plotly: {'dtype': 'f8', 'bdata': base64}"""
+    values = np.ascontiguousarray(values)
+    if values.dtype.byteorder == '>':
+        values = values.astype(values.dtype.newbyteorder('<'))
+    return {'dtype': values.dtype.str[1:], 'bdata': base64.b64encode(values).decode('ascii')}
+
+
+def _native(value):
+    """Дерево фигуры или компонента из типов, которые orjson пишет напрямую"""
+    if isinstance(value, dict):
+        return {key: _native(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Однородные списки скаляров (подписи, значения) копировать незачем
+        if not value or (isinstance(value[0], (str, int, float)) and isinstance(value[-1], (str, int, float))):
+            return value
+        return [_native(item) for item in value]
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind in 'iuf':
+            return typed_array(value)
+        if value.dtype.kind == 'M':
+            return np.datetime_as_string(value).tolist()
+        return _native(value.tolist())
+    if isinstance(value, (Component, BaseFigure)):
+        return _native(value.to_plotly_json())
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def native_output(value):
+    """Выход колбэка в виде, пригодном для прямой записи orjson.
+
+    Dash сериализует ответ через plotly.io.json: если orjson установлен,
+    ответ сначала пишется напрямую, а при первом незнакомом типе весь
+    ответ обходится на Python. Поэтому фигуры и компоненты разворачиваются
+    в словари заранее; остальные значения (таблицы из table_records,
+    числа, строки) уже должны быть простыми.
+    """
+    if isinstance(value, (Component, BaseFigure)):
+        return _native(value)
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], Component):
+        return [_native(item) for item in value]
+    return value
+
+
+def native_outputs(func):
+    """Декоратор колбэка Dash: все выходы через native_output"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if isinstance(result, tuple):
+            return tuple(native_output(value) for value in result)
+        return native_output(result)
+    return wrapper
+
+
+def table_records(df, columns, decimals=2):
+    """Строки DataTable только с показываемыми столбцами.
+
+    Даты переводятся в строки, дробные числа округляются: ответ меньше,
+    и orjson записывает его без обхода значений.
+    """
+    data = {}
+    for name in columns:
+        series = df[name]
+        if series.dtype.kind == 'M':
+            series = pd.Series(np.datetime_as_string(series.to_numpy('datetime64[D]')), index=series.index, dtype=object)
+        elif series.dtype.kind == 'f':
+            series = series.astype(np.float64).round(decimals)
+        elif series.dtype == object or series.dtype.kind not in 'iub':
+            series = series.astype(object).where(series.notna(), None)
+        data[name] = series
+    return pd.DataFrame(data, copy=False).to_dict('records')
@@ -0,0 +1,189 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from alerts import is_low_stock
+from barcodes import BarcodeIndex
+from costing import FIFO, CostBook
+
+# ================== МАГАЗИНЫ СЕТИ ==================
+DEFAULT_STORE = '1'
+EXPIRY_DAYS = 30   # "скоро истечет": срок в ближайшие 30 дней
+
+
+class SaleColumns:
+    """Продажи магазина по столбцам: код артикула, день, количество.
+
+    Пополняется при каждой продаже, поэтому планирование закупок получает
+    готовые массивы и не разбирает историю продаж построчно.
+    """
+
+    def __init__(self, capacity=1024):
+        self.skus = []    # код -> артикул
+        self.codes = {}   # артикул -> код
+        self.size = 0
+        self.sku = np.empty(capacity, dtype=np.int32)
+        self.day = np.empty(capacity, dtype=np.int32)   # дней от 1970-01-01
+        self.quantity = np.empty(capacity, dtype=np.float64)
+
+    def append(self, sku, date, quantity):
+        """Продажа с датой вида 'YYYY-MM-DD HH:MM:SS'"""
+        if self.size == len(self.sku):
+            capacity = 2 * len(self.sku)
+            for name in ('sku', 'day', 'quantity'):
+                values = getattr(self, name)
+                grown = np.empty(capacity, dtype=values.dtype)
+                grown[:self.size] = values[:self.size]
+                setattr(self, name, grown)
+        code = self.codes.get(sku)
+        if code is None:
+            code = self.codes[sku] = len(self.skus)
+            self.skus.append(sku)
+        i = self.size
+        self.sku[i] = code
+        self.day[i] = np.datetime64(date[:10], 'D').astype(np.int64)
+        self.quantity[i] = quantity
+        self.size += 1
+
+    def snapshot(self):
+        """(артикулы по кодам, коды, дни, количества) - копия для расчета в другом потоке или процессе"""
+        n = self.size
+        return list(self.skus), self.sku[:n].copy(), self.day[:n].copy(), self.quantity[:n].copy()
+
+
+class StorePartition:
+    """Данные одного магазина: товары, индексы и агрегаты.
+
+    Агрегаты по товарам пересчитываются только для измененного магазина
+    (после touch()), агрегаты продаж обновляются при каждой продаже.
+    Стоимость запасов считается по себестоимости партий (costs).
+    """
+
+    def __init__(self, store_id, cost_method=FIFO):
+        self.store_id = store_id
+        self.products = []
+        self.by_sku = {}
+        self.barcodes = BarcodeIndex()
+        self.costs = CostBook(cost_method)
+        self.sales = []
+        self.sale_columns = SaleColumns()
+        self.version = 0
+        self._stock = None
+        self.sales_count = 0
+        self.revenue = 0.0
+        self.profit = 0.0
+
+    def find(self, sku):
+        return self.by_sku.get(sku)
+
+    def add_product(self, product):
+        product['store'] = self.store_id
+        self.products.append(product)
+        self.by_sku[product['sku']] = product
+        self.touch()
+
+    def record_sale(self, sale):
+        sale['store'] = self.store_id
+        self.sales.append(sale)
+        self.sale_columns.append(sale['sku'], sale['date'], sale['quantity'])
+        self.sales_count += 1
+        self.revenue += sale['total']
+        self.profit += sale['profit']
+        self.touch()
+
+    def touch(self):
+        """Отметка об изменении данных магазина"""
+        self.version += 1
+        self._stock = None
+
+    def stock(self):
+        """Агрегаты остатков магазина (кешируются до следующего изменения)"""
+        stock = self._stock
+        if stock is None:
+            # Расчет может идти в потоке отчета: результат сохраняется,
+            # только если данные не менялись во время подсчета
+            version = self.version
+            statuses = Counter()
+            expiry = Counter()   # срок годности -> товаров; различных сроков немного
+            quantity = 0
+            value = 0.0
+            low_stock = 0
+            cost_value = self.costs.value
+            for product in self.products:
+                statuses[product['status']] += 1
+                expiry[product.get('expiry')] += 1
+                quantity += product['quantity']
+                value += cost_value(product)
+                low_stock += is_low_stock(product)
+            stock = {
+                'items': len(self.products),
+                'quantity': quantity,
+                'value': value,
+                'statuses': statuses,
+                'low_stock': low_stock,
+                'expiry': expiry,
+            }
+            if version == self.version:
+                self._stock = stock
+        return stock
+
+    def aggregates(self):
+        stock = self.stock()
+        return dict(stock, sales_count=self.sales_count, revenue=self.revenue, profit=self.profit)
+
+
+class StoreRegistry:
+    """Разделы магазинов и привязка пользователей бота к магазинам"""
+
+    def __init__(self, default_store=DEFAULT_STORE, cost_method=FIFO):
+        self.default_store = default_store
+        self.cost_method = cost_method
+        self.partitions = {}
+        self.user_store = {}
+
+    def get(self, store_id):
+        partition = self.partitions.get(store_id)
+        if partition is None:
+            partition = self.partitions[store_id] = StorePartition(store_id, self.cost_method)
+        return partition
+
+    def for_user(self, user_id):
+        return self.get(self.user_store.get(user_id, self.default_store))
+
+    def bind(self, user_id, store_id):
+        self.user_store[user_id] = store_id
+        return self.get(store_id)
+
+    @property
+    def version(self):
+        return sum(p.version for p in self.partitions.values())
+
+    def totals(self):
+        """Сводные показатели сети слиянием агрегатов магазинов"""
+        total = {'stores': len(self.partitions), 'items': 0, 'quantity': 0, 'value': 0.0, 'low_stock': 0,
+                 'statuses': Counter(), 'expiry': Counter(), 'sales_count': 0, 'revenue': 0.0, 'profit': 0.0}
+        for partition in self.partitions.values():
+            aggregates = partition.aggregates()
+            for key in ('items', 'quantity', 'value', 'low_stock', 'sales_count', 'revenue', 'profit'):
+                total[key] += aggregates[key]
+            total['statuses'] += aggregates['statuses']
+            total['expiry'].update(aggregates['expiry'])
+        return total
+
+
+def expiring_count(expiry, now=None, days=EXPIRY_DAYS):
+    """Товаров, у которых до конца срока от 0 до days полных дней, по счетчику сроков.
+
+    Разбираются только различные даты счетчика, а не карточки товаров.
+    """
+    now = now or datetime.now()
+    count = 0
+    for value, products in expiry.items():
+        try:
+            days_left = (datetime.strptime(value, '%Y-%m-%d') - now).days
+        except (TypeError, ValueError):
+            continue
+        if 0 <= days_left <= days:
+            count += products
+    return count
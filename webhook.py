@@ -0,0 +1,242 @@
+import asyncio
+import hmac
+import io
+import logging
+import sys
+from collections import deque
+
+from aiohttp import web
+from aiogram import types
+
+# ================== НАСТРОЙКИ WEBHOOK ==================
+MAX_CONCURRENT_UPDATES = 64   # одновременно обрабатываемых обновлений
+MAX_PENDING_UPDATES = 10000   # при переполнении Telegram получит 503 и повторит позже
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+_END = object()
+
+
+def _chat_key(update):
+    """Ключ упорядочивания: чат, иначе пользователь"""
+    for event in (update.message, update.edited_message, update.channel_post):
+        if event is not None:
+            return event.chat.id
+    if update.callback_query is not None:
+        message = update.callback_query.message
+        return message.chat.id if message is not None else update.callback_query.from_user.id
+    return update.update_id
+
+
+class UpdateProcessor:
+    """Параллельная обработка обновлений с сохранением порядка внутри чата.
+
+    Обновления разных чатов обрабатываются одновременно (не более
+    max_concurrent), обновления одного чата - строго по очереди.
+    """
+
+    def __init__(self, dp, bot, max_concurrent=MAX_CONCURRENT_UPDATES, max_pending=MAX_PENDING_UPDATES):
+        self.dp = dp
+        self.bot = bot
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._chats = {}
+        self._tasks = set()
+        self.pending = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+
+    def submit(self, update):
+        """Постановка обновления в очередь; False при переполнении"""
+        if self.pending >= self.max_pending:
+            return False
+        key = _chat_key(update)
+        self.pending += 1
+        queue = self._chats.get(key)
+        if queue is not None:
+            queue.append(update)
+            return True
+        self._chats[key] = deque([update])
+        task = asyncio.create_task(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _drain(self, key):
+        queue = self._chats[key]
+        while queue:
+            update = queue[0]
+            async with self._slots:
+                self.in_flight += 1
+                try:
+                    await self.dp.feed_update(self.bot, update)
+                    self.processed += 1
+                except Exception as e:
+                    self.failed += 1
+                    logging.exception(f"Ошибка обработки обновления {update.update_id}: {e}")
+                finally:
+                    self.in_flight -= 1
+                    self.pending -= 1
+            queue.popleft()
+        del self._chats[key]
+
+    async def join(self):
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'in_flight': self.in_flight,
+            'processed': self.processed,
+            'failed': self.failed,
+            'chats': len(self._chats),
+        }
+
+
+# ================== WSGI (ДАШБОРД В ТОМ ЖЕ ПРОЦЕССЕ) ==================
+class WSGIHandler:
+    """Обслуживание WSGI-приложения (Flask сервер Dash) из aiohttp.
+
+    Вызов приложения выполняется в пуле потоков, чтобы колбэки дашборда
+    не блокировали обработку обновлений бота.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def _environ(self, request, body):
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': request.path,
+            'QUERY_STRING': request.query_string,
+            'SERVER_NAME': request.host.split(':')[0],
+            'SERVER_PORT': str(request.url.port or 80),
+            'SERVER_PROTOCOL': f"HTTP/{request.version.major}.{request.version.minor}",
+            'REMOTE_ADDR': request.remote or '',
+            'CONTENT_TYPE': request.content_type if body else '',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': request.scheme,
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in request.headers.items():
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+                environ[key] = value
+        return environ
+
+    def _start(self, environ):
+        status_headers = []
+
+        def start_response(status, headers, exc_info=None):
+            status_headers[:] = [status, headers]
+
+        result = self.wsgi_app(environ, start_response)
+        chunks = iter(result)
+        first = next(chunks, _END)
+        return status_headers[0], status_headers[1], result, chunks, first
+
+    async def __call__(self, request):
+        body = await request.read()
+        loop = asyncio.get_running_loop()
+        status, headers, result, chunks, chunk = await loop.run_in_executor(
+            None, self._start, self._environ(request, body)
+        )
+        response = web.StreamResponse(status=int(status.split()[0]))
+        for name, value in headers:
+            if name.lower() not in ('content-length', 'transfer-encoding', 'connection'):
+                response.headers.add(name, value)
+        await response.prepare(request)
+        try:
+            # Потоковые ответы (выгрузки) передаются по блокам без буферизации
+            while chunk is not _END:
+                if chunk:
+                    await response.write(chunk)
+                chunk = await loop.run_in_executor(None, next, chunks, _END)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        await response.write_eof()
+        return response
+
+
+# ================== СЕРВЕР ==================
+def build_webhook_app(dp, bot, path, secret=None, max_concurrent=MAX_CONCURRENT_UPDATES, metrics=None):
+    """aiohttp-приложение: webhook бота и его статистика; других путей нет"""
+    processor = UpdateProcessor(dp, bot, max_concurrent=max_concurrent)
+    if metrics is not None:
+        metrics.gauge('webhook_updates', processor.stats, 'Очередь обработки обновлений webhook')
+
+    def authorized(request):
+        # Секрет проверяется для всех путей webhook, включая статистику
+        return not secret or hmac.compare_digest(request.headers.get(SECRET_HEADER, '').encode(), secret.encode())
+
+    async def handle_update(request):
+        if not authorized(request):
+            return web.Response(status=401)
+        try:
+            update = types.Update.model_validate(await request.json(), context={'bot': bot})
+        except ValueError:
+            # Тело не JSON или не обновление Telegram (ValidationError) - ошибка клиента, а не 500
+            return web.Response(status=400)
+        if not processor.submit(update):
+            return web.Response(status=503)
+        # Ответ сразу: обработка идет в фоне, Telegram не ждет хендлер
+        return web.Response()
+
+    async def handle_stats(request):
+        if not authorized(request):
+            return web.Response(status=401)
+        return web.json_response(processor.stats())
+
+    app = web.Application()
+    app['processor'] = processor
+    app.router.add_post(path, handle_update)
+    app.router.add_get(path + '/stats', handle_stats)
+    return app
+
+
+def build_dashboard_app(wsgi_app):
+    """aiohttp-приложение дашборда: все пути передаются WSGI-приложению"""
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', WSGIHandler(wsgi_app))
+    return app
+
+
+async def run_webhook(dp, bot, base_url, path, host, port, secret=None, wsgi_app=None,
+                      max_concurrent=MAX_CONCURRENT_UPDATES, metrics=None,
+                      dashboard_host='127.0.0.1', dashboard_port=None):
+    """Регистрация webhook в Telegram и запуск сервера до отмены.
+
+    Дашборд (выгрузки, метрики, журнал) работает без авторизации, поэтому
+    слушает отдельный адрес dashboard_host:dashboard_port - по умолчанию
+    только локальный, - а не порт webhook.
+    """
+    app = build_webhook_app(dp, bot, path, secret=secret, max_concurrent=max_concurrent, metrics=metrics)
+    runners = [web.AppRunner(app)]
+    if wsgi_app is not None and dashboard_port is not None:
+        runners.append(web.AppRunner(build_dashboard_app(wsgi_app)))
+    for runner, (site_host, site_port) in zip(runners, ((host, port), (dashboard_host, dashboard_port))):
+        await runner.setup()
+        await web.TCPSite(runner, site_host, site_port).start()
+
+    await bot.set_webhook(
+        base_url.rstrip('/') + path,
+        secret_token=secret,
+        max_connections=min(max_concurrent, 100),
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    await dp.emit_startup(bot=bot)
+    logging.info(f"Webhook сервер запущен: http://{host}:{port}{path}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await app['processor'].join()
+        await dp.emit_shutdown(bot=bot)
+        for runner in runners:
+            await runner.cleanup()